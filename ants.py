@@ -6,10 +6,13 @@ TA: Julia Oh
 Section: 11
 """
 
+import bisect
 import random
 import sys
+import weakref
 from ucb import main, interact, trace
-from collections import OrderedDict
+from collections import OrderedDict, namedtuple
+from itertools import accumulate
 
 
 ################
@@ -20,6 +23,9 @@ from collections import OrderedDict
 class Place(object):
     """A Place holds insects and has an exit to another Place."""
 
+    __slots__ = ('name', 'exit', 'bees', 'ant', 'entrance', 'colony', 'id',
+                 'tunnel', 'depth')
+
     def __init__(self, name, exit=None):
         """Create a Place with the given exit.
 
@@ -31,6 +37,10 @@ class Place(object):
         self.bees = []        # A list of Bees
         self.ant = None       # An Ant
         self.entrance = None  # A Place
+        self.colony = None    # The AntColony that registered this Place
+        self.id = None        # Index of this Place in the order it was registered
+        self.tunnel = None    # Index of the tunnel that contains this Place
+        self.depth = None     # Number of entrances between this Place and the queen
         # If a place has an exit then the entrance is set to that place 
         if exit: 
             self.exit.entrance = self 
@@ -44,6 +54,7 @@ class Place(object):
 
         There can be any number of Bees in a Place.
         """
+        old_ant = self.ant
         if insect.is_ant():
             # Phase 2: Special handling for BodyguardAnt
             "*** YOUR CODE HERE ***"
@@ -61,9 +72,12 @@ class Place(object):
         else:
             self.bees.append(insect)
         insect.place = self
+        if self.colony is not None:
+            self.colony.update_indexes(self, old_ant, insect)
 
     def remove_insect(self, insect):
         """Remove an Insect from this Place."""
+        old_ant = self.ant
         if not insect.is_ant():
             self.bees.remove(insect)
         else:
@@ -71,24 +85,79 @@ class Place(object):
             if insect.__class__ == QueenAnt: # We can't remove the true QueenAnt 
                 if insect.imposter is True: # Allow removal of imposter QueenAnt 
                     self.ant = None           
+                else: 
+                    return # The true QueenAnt stays in her place 
             else: 
                 self.ant = None
 
         insect.place = None
+        if self.colony is not None:
+            self.colony.update_indexes(self, old_ant, insect)
+
+    def __getstate__(self):
+        """Pickle the slots of this Place.  The exit and entrance of a place
+        in a colony are left out and linked again by the colony, so that a
+        long tunnel is not pickled one recursive call per place."""
+        state = dict((name, getattr(self, name))
+                     for name in slot_names(type(self)) if hasattr(self, name))
+        if self.colony is not None:
+            del state['exit'], state['entrance']
+        return None, state
 
     def __str__(self):
         return self.name
 
 
+class Stat(object):
+    """A class attribute of an Insect, such as damage or watersafe, that a
+    single insect can override.  Insects have no __dict__, so an insect keeps
+    the stats it overrides in its own overrides dict, which is None until the
+    first override.  Overriding replaces the dict rather than changing it, so
+    that a snapshot can share it.
+
+    >>> ant = ShortThrower()
+    >>> ant.max_range = 10
+    >>> ant.max_range, ant.overrides, ShortThrower().max_range
+    (10, {'max_range': 10}, 2)
+    """
+
+    def __init__(self, default):
+        self.default = default
+
+    def __set_name__(self, cls, name):
+        self.name = name
+
+    def __get__(self, insect, cls):
+        if insect is not None and insect.overrides is not None:
+            return insect.overrides.get(self.name, self.default)
+        return self.default
+
+    def __set__(self, insect, value):
+        overrides = dict(insect.overrides or ())
+        overrides[self.name] = value
+        insect.overrides = overrides
+
+
+def slot_names(cls, cache={}):
+    """Return the names of the attributes that instances of cls keep in the
+    slots of cls and its base classes."""
+    if cls not in cache:
+        cache[cls] = [name for base in reversed(cls.__mro__)
+                      for name in base.__dict__.get('__slots__', ())]
+    return cache[cls]
+
+
 class Insect(object):
     """An Insect, the base class of Ant and Bee, has armor and a Place."""
-    watersafe = False # Class attribute all insects are not watersafe unless they override as instance attribute 
+
+    __slots__ = ('armor', 'place', 'overrides')
+    watersafe = Stat(False)  # Insects are not watersafe unless they override it
 
     def __init__(self, armor, place=None):
         """Create an Insect with an armor amount and a starting Place."""
         self.armor = armor
         self.place = place  # set by Place.add_insect and Place.remove_insect
-        self.effects = {"stun": 0, "slow": 0}
+        self.overrides = None  # Stats of this insect that differ from its class
 
     def reduce_armor(self, amount):   
         """Reduce armor by amount, and remove the insect from its place if it
@@ -100,8 +169,14 @@ class Insect(object):
         3
         """
         self.armor -= amount
+        colony = self.place and self.place.colony
+        if colony:
+            colony.changed.add(self.place)
+            if colony.listeners:
+                colony.emit(Damage(colony.time, self, amount))
         if self.armor <= 0:
-            print('{0} ran out of armor and expired'.format(self))
+            if colony and colony.listeners:
+                colony.emit(Expire(colony.time, self, self.place))
             self.place.remove_insect(self)
 
     def action(self, colony):
@@ -120,27 +195,69 @@ class Insect(object):
 
 
 class Bee(Insect):
-    """A Bee moves from place to place, following exits and stinging ants."""
+    """A Bee moves from place to place, following exits and stinging ants.
 
+    Status effects are data: effect is the name of the effect that controls
+    the bee, the one applied last, and its action is looked up by name in
+    EFFECT_ACTIONS.  A bee counts the actions it takes while affected in
+    ticks, and each effect lasts until ticks reaches its stun_until or
+    slow_until, so an effect does no work on the turns it does not expire.
+    """
+
+    __slots__ = ('effect', 'ticks', 'stun_until', 'slow_until')
     name = 'Bee'
-    watersafe = True
+    watersafe = Stat(True)
+    count = 1  # The number of bees this Bee stands for; see Swarm
+
+    def __init__(self, armor, place=None):
+        Insect.__init__(self, armor, place)
+        self.effect = None
+        self.ticks = self.stun_until = self.slow_until = 0
 
+    @property
+    def stun(self):
+        """The remaining turns of the stun effect of this Bee."""
+        return max(self.stun_until - self.ticks, 0)
+
+    @property
+    def slow(self):
+        """The remaining turns of the slow effect of this Bee."""
+        return max(self.slow_until - self.ticks, 0)
+
+    @property
+    def affected(self):
+        """The action that replaces the default action, or None."""
+        if self.effect is None:
+            return None
+        return EFFECT_ACTIONS[self.effect]
+
+    @property
+    def effects(self):
+        """The remaining turns of each status effect of this Bee."""
+        return {'stun': self.stun, 'slow': self.slow}
 
     def sting(self, ant):
         """Attack an Ant, reducing the Ant's armor by 1."""
+        colony = self.place.colony
+        if colony and colony.listeners:
+            colony.emit(Sting(colony.time, self, ant))
         ant.reduce_armor(1)
 
     def move_to(self, place):
         """Move from the Bee's current Place to a new Place."""
-        self.place.remove_insect(self)
+        origin = self.place
+        origin.remove_insect(self)
         place.add_insect(self)
+        colony = place.colony
+        if colony and colony.listeners:
+            colony.emit(Move(colony.time, self, origin, place))
 
     def blocked(self):
         """Return True if this Bee cannot advance to the next Place."""
         ant = self.place.ant 
         return ant is not None and ant.blocks_path is True 
 
-    def action(self, colony):
+    def default_action(self, colony):
         """A Bee's action stings the Ant that blocks its exit if it is blocked,
         or moves to the exit of its current place otherwise.
 
@@ -152,13 +269,137 @@ class Bee(Insect):
             if self.place.name != 'Hive' and self.armor > 0:
                 self.move_to(self.place.exit)
 
-    default_action = action   #required to remember old action
+    def action(self, colony):
+        """Take the default action, unless a status effect replaces it."""
+        effect = self.effect
+        if effect is None:
+            self.default_action(colony)
+            return
+        # Effects count down before the action, so that the bees a Swarm
+        # splits off while acting are counted down as well
+        self.ticks += 1
+        if self.place.colony is not None:
+            self.place.colony.changed.add(self.place)
+        if self.ticks >= (self.slow_until if effect == 'slow'
+                          else self.stun_until):
+            expire_effect(self)
+        EFFECT_ACTIONS[effect](self, colony)
+
+
+class Swarm(Bee):
+    """A Swarm is a group of count bees in one Place with the same armor and
+    status effects, which act as count Bees would in its place.
+
+    Bees in swarm mode stay grouped while they are treated alike: they move
+    together, and a NinjaAnt or a burning FireAnt damages a whole Swarm at
+    once.  A bee that is singled out by a throw or a HungryAnt is split off
+    into a Swarm of its own, and neighboring Swarms in a place that are alike
+    again are joined at the end of each turn.  The bees of a place keep the
+    order they would have one by one, so a game in swarm mode makes the same
+    random choices, and has the same outcome, as the same game without it.
+
+    >>> plan = AssaultPlan(swarm=True).add_wave(2, 1000)
+    >>> plan, plan.bee_count
+    ({2: [Swarm(3, None, count=1000)]}, 1000)
+    """
+
+    __slots__ = ('count',)
+
+    def __init__(self, armor, count=1, place=None):
+        Bee.__init__(self, armor, place)
+        self.count = count
+
+    def split(self, n):
+        """Keep the first n bees of this Swarm, and return a new Swarm of the
+        rest, placed right after this one."""
+        rest = Swarm(self.armor, self.count - n)
+        for name in slot_names(Bee):
+            setattr(rest, name, getattr(self, name))
+        self.count = n
+        if self.place is not None:
+            bees = self.place.bees
+            bees.insert(bees.index(self) + 1, rest)
+        return rest
+
+    def copy(self):
+        """Return a new Swarm of the same bees as this one, in no place."""
+        swarm = Swarm(self.armor, self.count)
+        for name in slot_names(Bee):
+            setattr(swarm, name, getattr(self, name))
+        swarm.place = None
+        return swarm
+
+    def single_out(self, i):
+        """Return a Swarm of just the bee at index i of this Swarm."""
+        bee = self.split(i) if i else self
+        if bee.count > 1:
+            bee.split(1)
+        return bee
+
+    def joins(self, other):
+        """Whether the bees of other are indistinguishable from these."""
+        if type(other) is not Swarm or other.overrides != self.overrides:
+            return False
+        if (self.armor, self.stun, self.slow) != \
+                (other.armor, other.stun, other.slow):
+            return False
+        return self.effect == other.effect
+
+    def sting(self, ant, times=1):
+        """Attack an Ant times, reducing the Ant's armor by times."""
+        colony = self.place.colony
+        if colony and colony.listeners:
+            colony.emit(Sting(colony.time, self, ant))
+        ant.reduce_armor(times)
+
+    def default_action(self, colony):
+        """The bees of a Swarm sting the Ant that blocks their exit one after
+        another until it expires, and the rest move to the exit."""
+        acting = self.count
+        while acting and self.blocked():
+            ant = self.place.ant
+            stings = min(acting, max(ant.armor, 1))
+            acting -= stings
+            self.sting(ant, stings)
+            if self.armor <= 0:
+                return  # Burned by a FireAnt
+            if acting and ant is self.place.ant and ant.armor <= 0:
+                self.sting(ant, acting)  # The true QueenAnt stays
+                return
+        if acting and self.place.name != 'Hive':
+            movers = self.split(self.count - acting) if acting < self.count \
+                else self
+            movers.move_to(self.place.exit)
+
+    def __repr__(self):
+        return 'Swarm({0}, {1}, count={2})'.format(self.armor, self.place,
+                                                   self.count)
+
+
+def join_swarms(bees):
+    """Join each Swarm of the list bees with the Swarms alike that follow it."""
+    i = 0
+    while i < len(bees) - 1:
+        bee, other = bees[i], bees[i + 1]
+        if type(bee) is Swarm and bee.joins(other):
+            bee.count += other.count
+            other.place = None
+            del bees[i + 1]
+        else:
+            i += 1
+
+
+def count_bees(bees):
+    """Return the number of bees that the Bees in the list bees stand for."""
+    return sum(bee.count for bee in bees)
+
 
 class Ant(Insect):
     """An Ant occupies a place and does work for the colony."""
 
+    __slots__ = ()
     implemented = True  # Only implemented Ant classes should be instantiated
-    damage = 0
+    damage = Stat(0)
     food_cost = 0
     blocks_path = True 
     container = False 
@@ -181,6 +422,10 @@ class Ant(Insect):
         # self.place -- Somehow compare ant's position relative to queen's position and they must be in the same place
         check = self.place      
         assert check != None, "Check is equal to none"   
+        if check.colony is not None and check.tunnel is not None:
+            if check.colony.queen_behind(check):
+                return 2 * self.damage
+            return self.damage
         while check != None and check.entrance != None and check.entrance.name != 'Hive':
             check = check.entrance
             if check.ant.__class__ == QueenAnt:
@@ -190,6 +435,7 @@ class Ant(Insect):
 class HarvesterAnt(Ant):
     """HarvesterAnt produces 1 additional food per turn for the colony."""
 
+    __slots__ = ()
     name = 'Harvester'
     implemented = True
     food_cost = 2    
@@ -201,20 +447,42 @@ class HarvesterAnt(Ant):
         """
         colony.food += 1 
 
-def random_or_none(l):
-    """Return a random element of list l, or return None if l is empty."""
-    return random.choice(l) if l else None
+def random_or_none(l, rng=random):
+    """Return a random element of list l, or return None if l is empty.
+
+    rng -- the source of randomness, such as the random of an AntColony
+    """
+    return rng.choice(l) if l else None
+
+
+def random_swarm_bee(bees, rng=random):
+    """Return a random bee of the list bees, or None if bees is empty.  Each
+    Swarm stands for count bees, and the bee chosen from a Swarm is split off
+    into a Swarm of its own.
+
+    The choice draws from rng as random_or_none would from the list of the
+    bees one by one.
+    """
+    total = count_bees(bees)
+    if not total:
+        return None
+    i = rng.randrange(total)
+    for bee in bees:
+        if i < bee.count:
+            return bee.single_out(i) if bee.count > 1 else bee
+        i -= bee.count
 
 
 class ThrowerAnt(Ant):
     """ThrowerAnt throws a leaf each turn at the nearest Bee in its range."""
 
+    __slots__ = ()
     name = 'Thrower'
     implemented = True
-    damage = 1
+    damage = Stat(1)
     food_cost = 4
-    min_range = 0
-    max_range = 10
+    min_range = Stat(0)
+    max_range = Stat(10)
     
     def nearest_bee(self, hive):
         """Return the nearest Bee in a Place that is not the Hive, connected to
@@ -224,6 +492,11 @@ class ThrowerAnt(Ant):
 
         Problem B5: This method returns None if there is no Bee in range.
         """        
+        colony = self.place.colony
+        if colony is not None and self.place.tunnel is not None:
+            near = self.min_range
+            bees = colony.bees_in_range(self.place, near, near + self.max_range)
+            return colony.random_bee(bees)
         check = self.place
         for i in range(self.min_range):
             check = check.entrance
@@ -236,6 +509,7 @@ class ThrowerAnt(Ant):
     def throw_at(self, target):
         """Throw a leaf at the target Bee, reducing its armor."""
         if target is not None:
+            emit_throw(self, target)
             target.reduce_armor(self.adjusted_damage)
 
     def action(self, colony):
@@ -247,25 +521,69 @@ class Hive(Place):
     """The Place from which the Bees launch their assault.
 
     assault_plan -- An AssaultPlan; when & where bees enter the colony.
+    bees_pending -- the number of bees of a lazy plan not yet launched
+    waves -- the bees launched at each time, which are those of the plan
+             except in swarm mode
     """
 
-    name = 'Hive'
+    __slots__ = ('assault_plan', 'bees_pending', 'waves')
 
     def __init__(self, assault_plan):
-        self.name = 'Hive'
+        # The exit, entrance and ant of a Hive are always None
+        Place.__init__(self, 'Hive')
         self.assault_plan = assault_plan
-        self.bees = []
-        for bee in assault_plan.all_bees:
-            self.add_insect(bee)
-        # The following attributes are always None for a Hive
-        self.entrance = None
-        self.ant = None
-        self.exit = None
+        self.bees_pending = 0
+        self.waves = assault_plan
+        if assault_plan.lazy:
+            self.bees_pending = assault_plan.bee_count
+            return
+        if assault_plan.swarm:  # Swarms split and join as the game is played
+            self.waves = dict((time, [swarm.copy() for swarm in wave])
+                              for time, wave in assault_plan.items())
+        for wave in self.waves.values():
+            for bee in wave:
+                self.add_insect(bee)
 
     def strategy(self, colony):
-        exits = [p for p in colony.places.values() if p.entrance is self]
-        for bee in self.assault_plan.get(colony.time, []):
-            bee.move_to(random.choice(exits))
+        plan = self.assault_plan
+        wave = self.waves.get(colony.time, [])
+        if wave and plan.lazy:
+            wave = plan.make_wave(colony.time)
+            for bee in wave:
+                self.add_insect(bee)
+            self.bees_pending -= count_bees(wave)
+        for bee, target in plan.targeted(colony.time, wave):
+            exits = self.choose_exits(colony, target, bee.count)
+            if bee.count == 1:
+                bee.move_to(exits[0])
+                continue
+            counts = OrderedDict()  # Bees of the Swarm for each exit chosen
+            for exit in exits:
+                counts[exit] = counts.get(exit, 0) + 1
+            for exit, count in counts.items():
+                rest = bee.split(count) if count < bee.count else None
+                bee.move_to(exit)
+                bee = rest
+        if wave and colony.listeners:
+            colony.emit(Wave(colony.time, wave))
+
+    def choose_exits(self, colony, target, count):
+        """Return an entrance of colony for each of count bees with target, a
+        target of AssaultPlan.add_wave."""
+        exits = colony.bee_entrances
+        if target is None:
+            return [colony.random.choice(exits) for _ in range(count)]
+        if isinstance(target, int):
+            return [exits[target]] * count
+        return colony.random.choices(exits, cum_weights=target, k=count)
+
+
+# The state of an AntColony, taken by AntColony.snapshot
+Snapshot = namedtuple('Snapshot', 'counters random places insects indexes')
+
+# A summary of a game that engines can compare, taken by AntColony.state
+GameState = namedtuple('GameState',
+                       'time food breached deployed removed hive places')
 
 
 class AntColony(object):
@@ -274,11 +592,52 @@ class AntColony(object):
     Attributes:
     time -- elapsed time
     food -- the colony's available food total
-    queen -- the place where the queen resides
+    queen -- a QueenPlace; the places where the queen resides
     places -- A list of all places in the colony (including a Hive)
     bee_entrances -- A list of places that bees can enter
+    graph -- the LayoutGraph of the colony's layout, shared with every colony
+             built from the same layout
+    bee_count -- the number of Bees in places (including the Hive)
+    bees_remaining -- bee_count and the bees of the Hive not yet launched
+    bee_total -- bees_remaining when the game started, the bees of the game
+
+    The ants and bees of the colony are indexed as Places add and remove
+    insects, so they are found without scanning every place.  Set debug to
+    True to check the indexes against a full scan on every access.
+
+    Each place has an integer id, its index in the LayoutGraph, and
+    deploy_ant, remove_ant and find_place take either ids or names.
+
+    Game events are delivered to listeners registered with subscribe.  Nothing
+    is built or delivered for an event type without listeners.
+
+    Every random choice in a game is made by the colony's random, a
+    random.Random seeded with the colony's seed, so a game played with the
+    same seed and the same deployments has the same outcome.
+
+    Between turns, snapshot records the state of the game and restore returns
+    to it, so that a strategy can try out deployments and take them back.
+
+    state_hash returns a hash of the position of the game, kept up to date as
+    insects change, by which a TranspositionTable memoizes what a search
+    learns about positions.
+
+    If the assault plan of the hive is in swarm mode, the Bees in places are
+    Swarms that each stand for several bees; see Swarm.  bee_count still
+    counts bees, not Swarms.
+
+    simulate(fast_forward=True) skips the turns in which nothing can happen,
+    for a strategy that acts only when bees are in play or when food reaches
+    an amount passed to watch_food.
+
+    A Profiler from ants_profile times the phases of each turn once it is
+    attached.  Without one, a turn costs a single extra attribute check.
     """
-    def __init__(self, strategy, hive, ant_types, create_places, food=4):
+
+    debug = False
+    profiler = None  # An ants_profile.Profiler that plays and times turns
+    def __init__(self, strategy, hive, ant_types, create_places, food=4,
+                 seed=None):
         """Create an AntColony for simulating a game.
 
         Arguments:
@@ -286,69 +645,470 @@ class AntColony(object):
         hive -- a Hive full of bees
         ant_types -- a list of ant constructors
         create_places -- a function that creates the set of places
+        seed -- an integer seed for the colony's random; chosen if None
         """
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.seed = seed
+        self.random = random.Random(seed)
         self.time = 0
         self.food = food
+        self.ants_deployed = 0
+        self.ants_removed = 0
+        self.queen_count = 0  # QueenAnts deployed; every one after the first
+                              # is an imposter
+        self.listeners = {}  # Event type -> list of listener functions
         self.strategy = strategy
+        self.food_watched = []  # Amounts of food passed to watch_food
         self.hive = hive
+        self._wave_times = None  # Sorted times of waves; see wave_times
+        self.swarm = hive.assault_plan.swarm
         self.ant_types = OrderedDict((a.name, a) for a in ant_types)
         self.configure(hive, create_places)
 
     def configure(self, hive, create_places):
-        """Configure the places in the colony."""
-        self.queen = Place('AntQueen')
-        self.places = OrderedDict()
-        self.bee_entrances = []
-        def register_place(place, is_bee_entrance):
-            self.places[place.name] = place
-            if is_bee_entrance:
-                place.entrance = hive
-                self.bee_entrances.append(place)
-        register_place(self.hive, False)
-        create_places(self.queen, register_place)
-
-    def simulate(self):
-        """Simulate an attack on the ant colony (i.e., play the game)."""
-        while len(self.queen.bees) == 0 and len(self.bees) > 0:
-            self.hive.strategy(self)    # Bees invade
-            self.strategy(self)         # Ants deploy
-            for ant in self.ants:       # Ants take actions
-                if ant.armor > 0:
-                    ant.action(self)
-            for bee in self.bees:       # Bees take actions
-                if bee.armor > 0:
-                    bee.action(self)
-            self.time += 1
-        if len(self.queen.bees) > 0:
-            print('The ant queen has perished. Please try again.')
-        else:
-            print('All bees are vanquished. You win!')
+        """Configure the places in the colony, as recreated from the
+        LayoutGraph of create_places.
+
+        A tunnel is a chain of places linked by entrances, starting from a
+        place that is not the entrance of any other, and the depth of a place
+        is its index in its tunnel; see compile_layout.
+        """
+        self.graph = graph = compile_layout(create_places)
+        self.queen = QueenPlace(Place('AntQueen'), self)
+        self._places = places = [hive]  # Registered places, indexed by id
+        for kind, name in zip(graph.kinds[1:], graph.names[1:]):
+            places.append(kind(name))
+        self._link_places()
+        for i, place in enumerate(places):
+            place.colony, place.id = self, i
+            if graph.tunnel[i] >= 0:
+                place.tunnel, place.depth = graph.tunnel[i], graph.depth[i]
+        self.places = OrderedDict(zip(graph.names, places))
+        self.bee_entrances = [places[i] for i in graph.bee_entrances]
+        hive.assault_plan.check_targets(len(self.bee_entrances))
+        self.bee_count = count_bees(hive.bees)
+        self.bee_total = self.bee_count + hive.bees_pending
+        self._ant_ids = []  # Sorted ids of places that hold an ant
+        self._bee_ids = [0] if hive.bees else []  # Sorted ids of places
+                                                  # that hold bees
+        self._tunnels = [[places[i] for i in tunnel]  # Places of each tunnel
+                         for tunnel in graph.tunnels]
+        self._tunnel_bees = [[] for _ in graph.tunnels]  # Sorted depths of
+                                                 # each tunnel's places with bees
+        self._tunnel_queens = [[] for _ in graph.tunnels]  # Sorted depths of
+                                                   # each tunnel's QueenAnts
+        self.changed = set()  # Places changed since state_hash was updated
+        self._place_hashes = {}  # Place -> hash of the state of a place
+                                 # that holds insects
+        self._places_hash = 0  # Sum of _place_hashes, modulo 2 ** 64
+
+    def _link_places(self):
+        """Set the exit and entrance of each place from the LayoutGraph."""
+        graph = self.graph
+        linked = self._places + [self.queen.colony_location]
+        for i, place in enumerate(linked):
+            exit, entrance = graph.exits[i], graph.entrances[i]
+            place.exit = linked[exit] if exit >= 0 else None
+            place.entrance = linked[entrance] if entrance >= 0 else None
+
+    def __getstate__(self):
+        """Pickle the game without its strategy, listeners and profiler, which
+        play the game rather than being part of it, and may not pickle."""
+        state = dict(self.__dict__, strategy=None, listeners={})
+        state.pop('profiler', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._link_places()  # Places are pickled without links
+
+    def find_place(self, place):
+        """Return the Place with the id or the name place."""
+        if isinstance(place, int):
+            return self._places[place]
+        return self.places[place]
+
+    def bees_in_range(self, place, near, far):
+        """Return the bees of the nearest place that holds bees and is between
+        near and far entrances (inclusive) from place in its tunnel.  Returns
+        an empty list if there is no such place."""
+        depths = self._tunnel_bees[place.tunnel]
+        i = bisect.bisect_left(depths, place.depth + near)
+        if i < len(depths) and depths[i] <= place.depth + far:
+            return self._tunnels[place.tunnel][depths[i]].bees
+        return []
+
+    def queen_behind(self, place):
+        """Return whether a QueenAnt holds a place deeper in the tunnel of
+        place, so that ants in place deal double damage."""
+        queens = self._tunnel_queens[place.tunnel]
+        return len(queens) > 0 and queens[-1] > place.depth
+
+    def update_indexes(self, place, old_ant, insect):
+        """Update the ant and bee indexes after insect was added to or
+        removed from place, which held old_ant beforehand."""
+        if place in self.queen.places and not insect.is_ant():
+            self.queen.bee_count += insect.count if insect.place is place \
+                else -insect.count
+        if place.id is None:
+            return
+        self.changed.add(place)
+        if place.ant is not old_ant:
+            if old_ant is None:
+                bisect.insort(self._ant_ids, place.id)
+            elif place.ant is None:
+                self._ant_ids.remove(place.id)
+            if place.tunnel is not None:
+                queens = self._tunnel_queens[place.tunnel]
+                if type(old_ant) is QueenAnt:
+                    queens.remove(place.depth)
+                if type(place.ant) is QueenAnt:
+                    bisect.insort(queens, place.depth)
+        if not insect.is_ant():
+            if insect.place is place:
+                self.bee_count += insect.count
+                if len(place.bees) == 1:
+                    bisect.insort(self._bee_ids, place.id)
+                    if place.tunnel is not None:
+                        bisect.insort(self._tunnel_bees[place.tunnel],
+                                      place.depth)
+            else:
+                self.bee_count -= insect.count
+                if not place.bees:
+                    self._bee_ids.remove(place.id)
+                    if place.tunnel is not None:
+                        self._tunnel_bees[place.tunnel].remove(place.depth)
+
+    def check_indexes(self):
+        """Assert that the ant and bee indexes agree with a full scan."""
+        places = self.places.values()
+        ants = [p.ant for p in places if p.ant is not None]
+        bees = [b for p in places for b in p.bees]
+        assert self._index_ants() == ants, 'Ant index is out of date'
+        assert self._index_bees() == bees, 'Bee index is out of date'
+        assert self.bee_count == count_bees(bees), 'Bee count is out of date'
+        for tunnel, depths, queens in zip(self._tunnels, self._tunnel_bees,
+                                          self._tunnel_queens):
+            assert depths == [p.depth for p in tunnel if p.bees], \
+                'Tunnel index is out of date'
+            assert queens == [p.depth for p in tunnel
+                              if type(p.ant) is QueenAnt], \
+                'Queen index is out of date'
+
+    def _index_ants(self):
+        return [self._places[i].ant for i in self._ant_ids]
+
+    def _index_bees(self):
+        return [b for i in self._bee_ids for b in self._places[i].bees]
+
+    def simulate(self, fast_forward=False):
+        """Simulate an attack on the ant colony (i.e., play the game).
+
+        With fast_forward, the quiet turns after each turn are skipped; see
+        the fast_forward method.
+        """
+        while not self.game_over:
+            self.turn()
+            if fast_forward and not self.game_over:
+                self.fast_forward()
+        if self.listeners:
+            winner = 'bees' if self.queen.breached else 'ants'
+            self.emit(GameOver(self.time, winner))
+
+    @property
+    def game_over(self):
+        """Whether the bees have reached the queen or all bees are gone."""
+        return self.queen.breached or self.bees_remaining == 0
+
+    @property
+    def bees_remaining(self):
+        """The number of bees in places or still to be launched by the Hive."""
+        return self.bee_count + self.hive.bees_pending
+
+    def watch_food(self, amount):
+        """Stop fast_forward at the first turn that starts with at least
+        amount of food, such as the cost of an ant the strategy wants."""
+        self.food_watched.append(amount)
+
+    def fast_forward(self):
+        """Skip the turns in which nothing can happen and return the number
+        of turns skipped.  The strategy is not called for skipped turns.
+
+        A turn is quiet if no wave launches, no bee is out of the Hive and
+        every ant would do nothing but harvest.  Skipping stops at the next
+        wave, or at the first turn with enough food for an amount passed to
+        watch_food.  The food harvested in the skipped turns is added at once.
+        """
+        if self._bee_ids and self._bee_ids != [0]:
+            return 0
+        income = self._idle_income()
+        if income is None:
+            return 0
+        wave_times = self.wave_times
+        i = bisect.bisect_left(wave_times, self.time)
+        if i == len(wave_times):
+            return 0
+        stop = wave_times[i]
+        for amount in self.food_watched:
+            if income and amount > self.food:
+                stop = min(stop, self.time - (self.food - amount) // income)
+        skipped = stop - self.time
+        self.food += income * skipped
+        self.time = stop
+        return skipped
+
+    @property
+    def wave_times(self):
+        """The sorted times of the waves of the assault plan."""
+        if self._wave_times is None:
+            plan = self.hive.assault_plan
+            self._wave_times = sorted(t for t, wave in plan.items() if wave)
+        return self._wave_times
+
+    def _idle_income(self):
+        """Return the food that the ants make in a turn without bees in play,
+        or None if any ant would do something other than harvest."""
+        income = 0
+        for ant in self._index_ants():
+            if ant.container and ant.ant is not None:
+                ant = ant.ant
+            action = type(ant).action
+            if action is HarvesterAnt.action:
+                income += 1
+            elif action is HungryAnt.action:
+                if ant.digesting:
+                    return None
+            elif action is QueenAnt.action:
+                if ant.imposter or ant.place not in self.queen.places:
+                    return None
+            elif action not in (Insect.action, ThrowerAnt.action,
+                                NinjaAnt.action, BodyguardAnt.action):
+                return None
+        return income
+
+    def turn(self):
+        """Play one turn of the game."""
+        if self.profiler is not None:
+            self.profiler.turn(self)
+            return
+        for _ in self.phases():
+            pass
+
+    def phases(self, actions=False):
+        """Play one turn of the game, yielding the name of each phase of the
+        turn as it ends, so that a Profiler can time them; see
+        ants_profile.PHASES.  With actions, each insect is also yielded after
+        its action."""
+        self.hive.strategy(self)    # Bees invade
+        yield 'hive'
+        self.strategy(self)         # Ants deploy
+        yield 'strategy'
+        yield from self.action_phases(actions)
+
+    def insects_act(self):
+        """Finish a turn after the strategy: the ants and then the bees take
+        their actions."""
+        for _ in self.action_phases():
+            pass
+
+    def action_phases(self, actions=False):
+        """The phases of a turn after the strategy; see phases."""
+        ants = self.ants
+        yield 'ants_list'
+        for ant in ants:            # Ants take actions
+            if ant.armor > 0:
+                ant.action(self)
+                if actions:
+                    yield ant
+        yield 'ants'
+        bees = self.bees
+        yield 'bees_list'
+        for bee in bees:            # Bees take actions
+            if bee.armor > 0:
+                bee.action(self)
+                if actions:
+                    yield bee
+        self.end_turn()
+        yield 'bees'
+
+    def end_turn(self):
+        """Finish a turn after the bees have acted."""
+        if self.swarm:
+            for i in self._bee_ids:
+                if i:  # The Hive keeps its waves apart
+                    join_swarms(self._places[i].bees)
+        self.time += 1
+
+    def random_bee(self, bees):
+        """Return a random bee of the list bees, or None if it is empty."""
+        if self.swarm:
+            return random_swarm_bee(bees, self.random)
+        return random_or_none(bees, self.random)
 
     def deploy_ant(self, place_name, ant_type_name):
         """Place an ant if enough food is available.
 
-        This method is called by the current strategy to deploy ants.
+        This method is called by the current strategy to deploy ants.  A place
+        is given by its name or by its id.
         """
         constructor = self.ant_types[ant_type_name]
         if self.food < constructor.food_cost:
-            print('Not enough food remains to place ' + ant_type_name)
+            if self.listeners:
+                self.emit(NoFood(self.time, ant_type_name, self.food))
         else:
-            self.places[place_name].add_insect(constructor())           
+            queen = issubclass(constructor, QueenAnt)
+            ant = constructor(self.queen_count > 0) if queen else constructor()
+            place = self.find_place(place_name)
+            place.add_insect(ant)
+            if queen:  # Counted once she is in place, so that a failed
+                self.queen_count += 1  # deploy changes nothing
             self.food -= constructor.food_cost
+            self.ants_deployed += 1
+            if self.listeners:
+                self.emit(Deploy(self.time, ant, place))
             
     def remove_ant(self, place_name):
         """Remove an Ant from the Colony."""
-        place = self.places[place_name]
+        place = self.find_place(place_name)
         if place.ant is not None:
-            place.remove_insect(place.ant)
+            ant = place.ant
+            place.remove_insect(ant)
+            if place.ant is None:
+                self.ants_removed += 1
+                if ant.container and ant.ant is not None:
+                    self.ants_removed += 1  # The contained ant leaves too
+                if self.listeners:
+                    self.emit(Remove(self.time, ant, place))
+
+    def snapshot(self):
+        """Return a Snapshot of the game state, from which restore continues
+        the game exactly as it would have continued from now.
+
+        Places and insects are not copied.  A snapshot holds the contents of
+        each place and the values of the slots of each insect in play, so
+        taking one costs about as much as copying those lists.
+        """
+        contents, insects = [], {}
+        for place in self._places + [self.queen.colony_location]:
+            contents.append((place, place.ant, place.bees[:]))
+            for bee in place.bees:
+                insects[bee] = None
+            ant = place.ant
+            if ant is not None:
+                insects[ant] = None
+                if ant.container and ant.ant is not None:
+                    insects[ant.ant] = None
+        for insect in insects:
+            insects[insect] = [getattr(insect, name)
+                               for name in slot_names(type(insect))]
+        counters = (self.time, self.food, self.ants_deployed,
+                    self.ants_removed, self.bee_count, self.queen.bee_count,
+                    self.queen_count, self.hive.bees_pending)
+        indexes = (self._ant_ids[:], self._bee_ids[:],
+                   [depths[:] for depths in self._tunnel_bees],
+                   [depths[:] for depths in self._tunnel_queens],
+                   self.queen.places[:], self._places_hash,
+                   dict(self._place_hashes), set(self.changed))
+        return Snapshot(counters, self.random.getstate(), contents, insects,
+                        indexes)
+
+    def restore(self, snapshot):
+        """Return the game to the state recorded by snapshot, which was taken
+        from this colony.  A snapshot can be restored any number of times."""
+        (self.time, self.food, self.ants_deployed, self.ants_removed,
+         self.bee_count, self.queen.bee_count,
+         self.queen_count, self.hive.bees_pending) = snapshot.counters
+        self.random.setstate(snapshot.random)
+        for place, ant, bees in snapshot.places:
+            place.ant, place.bees = ant, bees[:]
+        for insect, state in snapshot.insects.items():
+            for name, value in zip(slot_names(type(insect)), state):
+                setattr(insect, name, value)
+        (ant_ids, bee_ids, tunnel_bees, tunnel_queens, queens, places_hash,
+         place_hashes, changed) = snapshot.indexes
+        self._ant_ids, self._bee_ids = ant_ids[:], bee_ids[:]
+        self._tunnel_bees = [depths[:] for depths in tunnel_bees]
+        self._tunnel_queens = [depths[:] for depths in tunnel_queens]
+        self.queen.places = queens[:]
+        self._places_hash = places_hash
+        self._place_hashes, self.changed = dict(place_hashes), set(changed)
+
+    def state(self):
+        """Return a GameState that summarizes the game, for comparing the
+        games of two engines turn by turn.
+
+        The hive is the number of bees still to launch, and the other places
+        are each a (name, ant, bees) triple.  An ant is a (name, armor,
+        digesting, imposter, contained ant) tuple, or None.  Bees are counted
+        by (armor, stun, slow, effect), where effect is the name of the effect
+        that controls the bee or '', and listed in order with their counts,
+        so a Swarm and the bees it stands for have the same state.
+        """
+        places = [place_state(place) for place in self._places[1:]]
+        hive = count_bees(self.hive.bees) + self.hive.bees_pending
+        return GameState(self.time, self.food, self.queen.breached,
+                         self.ants_deployed, self.ants_removed, hive,
+                         tuple(places))
+
+    def state_hash(self):
+        """Return a hash of the position of the game, for a
+        TranspositionTable.  Positions with equal GameStates, food and queen
+        places have equal hashes at equal times, and at any times with the
+        same parity once no waves remain.
+
+        The hash is a sum of the hashes of the places that hold insects, kept
+        up to date incrementally: adding, removing, damaging and affecting
+        insects marks their place changed, and only changed places are hashed
+        again.  Hashes are only comparable within one process.
+        """
+        hashes, total = self._place_hashes, self._places_hash
+        for place in self.changed:
+            if place.colony is self and place.id:  # Not the Hive
+                new = 0
+                if place.ant is not None or place.bees:
+                    new = mix_hash(hash(place_state(place)))
+                total += new - hashes.pop(place, 0)
+                if new:
+                    hashes[place] = new
+        self.changed.clear()
+        self._places_hash = total = total % 2 ** 64
+        if self.debug:
+            full = sum(mix_hash(hash(place_state(p))) for p in self._places[1:]
+                       if p.ant is not None or p.bees)
+            assert total == full % 2 ** 64, 'State hash is out of date'
+        time = self.time
+        if bisect.bisect_left(self.wave_times, time) == len(self.wave_times):
+            time %= 2  # Only the parity of slowed bees remains
+        return hash((total, self.food, time, self.queen.bee_count > 0,
+                     tuple(place.id for place in self.queen.places)))
+
+    def subscribe(self, event_type, listener):
+        """Call listener with every event of event_type, such as Throw."""
+        self.listeners.setdefault(event_type, []).append(listener)
+
+    def unsubscribe(self, event_type, listener):
+        """Stop calling listener with events of event_type."""
+        self.listeners[event_type].remove(listener)
+        if not self.listeners[event_type]:
+            del self.listeners[event_type]
+
+    def emit(self, event):
+        """Deliver event to the listeners for its type."""
+        for listener in self.listeners.get(type(event), ()):
+            listener(event)
 
     @property
     def ants(self):
-        return [p.ant for p in self.places.values() if p.ant is not None]
+        if self.debug:
+            self.check_indexes()
+        return self._index_ants()
 
     @property
     def bees(self):
-        return [b for p in self.places.values() for b in p.bees]
+        if self.debug:
+            self.check_indexes()
+        return self._index_bees()
 
     @property
     def insects(self):
@@ -358,6 +1118,97 @@ class AntColony(object):
         status = ' (Food: {0}, Time: {1})'.format(self.food, self.time)
         return str([str(i) for i in self.ants + self.bees]) + status
 
+def mix_hash(h):
+    """Return a 64-bit hash that mixes the bits of the hash h, so that sums
+    of hashes of similar tuples do not collide (the splitmix64 finalizer)."""
+    h &= 0xffffffffffffffff
+    h = (h ^ (h >> 30)) * 0xbf58476d1ce4e5b9 & 0xffffffffffffffff
+    h = (h ^ (h >> 27)) * 0x94d049bb133111eb & 0xffffffffffffffff
+    return h ^ (h >> 31)
+
+def place_state(place):
+    """Return the (name, ant, bees) triple of place for a GameState."""
+    counts = {}
+    for bee in place.bees:
+        key = (bee.armor, bee.stun, bee.slow, bee.effect or '')
+        counts[key] = counts.get(key, 0) + bee.count
+    return (place.name, ant_state(place.ant), tuple(sorted(counts.items())))
+
+def ant_state(ant):
+    """Return the (name, armor, digesting, imposter, contained ant) tuple of
+    ant for a GameState, or None if ant is None."""
+    if ant is None:
+        return None
+    contained = ant_state(ant.ant) if ant.container else None
+    return (ant.name, ant.armor, getattr(ant, 'digesting', 0),
+            getattr(ant, 'imposter', False), contained)
+
+class TranspositionTable(object):
+    """A bounded memo of values for positions of games, keyed by
+    AntColony.state_hash, so that a search that reaches a position again
+    looks up what it found there instead of simulating it again.  When the
+    table is full, storing a value forgets the least recently used one.
+
+    >>> table = TranspositionTable(2)
+    >>> table[1], table[2] = 'one', 'two'
+    >>> table.get(1)
+    'one'
+    >>> table[3] = 'three'
+    >>> 2 in table, 1 in table, len(table), table.hits, table.misses
+    (False, True, 2, 1, 0)
+    """
+
+    def __init__(self, capacity=100000):
+        self.capacity = capacity
+        self.hits = self.misses = 0  # Lookups of get that found a value
+        self._values = OrderedDict()  # Key -> value, least recent first
+
+    def get(self, key, default=None):
+        """Return the value stored for key, or default if there is none."""
+        values = self._values
+        if key in values:
+            self.hits += 1
+            values.move_to_end(key)
+            return values[key]
+        self.misses += 1
+        return default
+
+    def __setitem__(self, key, value):
+        values = self._values
+        values[key] = value
+        values.move_to_end(key)
+        if len(values) > self.capacity:
+            values.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def __len__(self):
+        return len(self._values)
+
+    def clear(self):
+        self._values.clear()
+        self.hits = self.misses = 0
+
+    def lookup(self, colony, evaluate):
+        """Return evaluate(colony), or the value that it returned for an
+        earlier colony in the same position.
+
+        >>> table = TranspositionTable()
+        >>> colony = AntColony(None, Hive(make_test_assault_plan()),
+        ...                    ant_types(), test_layout)
+        >>> calls = []
+        >>> evaluate = lambda colony: calls.append(colony.time) or len(calls)
+        >>> table.lookup(colony, evaluate), table.lookup(colony, evaluate)
+        (1, 1)
+        """
+        key = colony.state_hash()
+        value = self.get(key, self)  # The table is never a value
+        if value is self:
+            value = self[key] = evaluate(colony)
+        return value
+
+
 def ant_types():
     """Return a list of all implemented Ant classes."""
     all_ant_types = []
@@ -378,6 +1229,24 @@ def interactive_strategy(colony):
     msg = '<Control>-D (<Control>-Z <Enter> on Windows) completes a turn.\n'
     interact(msg)
 
+def read_options(args):
+    """Return the layout, assault plan constructor and seed chosen by the
+    command line args of start_with_strategy."""
+    seed = None
+    for flag in ('-s', '--seed'):
+        if flag in args:
+            seed = int(args[args.index(flag) + 1])
+    make_plan = make_test_assault_plan
+    layout = test_layout
+    if '-f' in args or '--full' in args:
+        make_plan = make_full_assault_plan
+        layout = dry_layout
+    if '-w' in args or '--water' in args:
+        layout = mixed_layout
+    if '-i' in args or '--insane' in args:
+        make_plan = make_insane_assault_plan
+    return layout, make_plan, seed
+
 def start_with_strategy(args, strategy):
     usage = """python3 [ants.py|ants_gui.py] [OPTIONS]
     Run the Ants vs. SomeBees project.
@@ -386,26 +1255,212 @@ def start_with_strategy(args, strategy):
     -f, --full      Loads a full layout and assault plan
     -w, --water     Loads a full map with water.
     -i, --insane    Loads an insane assault plan. Good luck!
+    -s, --seed N    Seeds the random choices of the game with integer N
+    -p, --profile FILE  Saves the time spent in each phase of each turn
+                    to FILE, as CSV if it ends with .csv and JSON otherwise
     """
     if "-h" in args or "--help" in args:
         print(usage)
         return
-    assault_plan = make_test_assault_plan()
-    layout = test_layout
-    if '-f' in args or '--full' in args:
-        assault_plan = make_full_assault_plan()
-        layout = dry_layout
-    if '-w' in args or '--water' in args:
-        layout = mixed_layout
-    if '-i' in args or '--insane' in args:
-        assault_plan = make_insane_assault_plan()
-    AntColony(strategy, Hive(assault_plan), ant_types(), layout).simulate()
+    layout, make_plan, seed = read_options(args)
+    colony = AntColony(strategy, Hive(make_plan()), ant_types(), layout,
+                       seed=seed)
+    profile = None
+    for flag in ('-p', '--profile'):
+        if flag in args:
+            import ants_profile
+            profile = args[args.index(flag) + 1]
+            profiler = ants_profile.Profiler(colony)
+    print('Seed: {0}'.format(colony.seed))
+    print_events(colony)
+    colony.simulate()
+    if profile is not None:
+        profiler.save(profile)
+
+
+##########
+# Events #
+##########
+
+# Each event records the colony time at which it happened.
+Deploy = namedtuple('Deploy', 'time ant place')
+Remove = namedtuple('Remove', 'time ant place')
+NoFood = namedtuple('NoFood', 'time ant_type_name food')
+Move = namedtuple('Move', 'time bee origin destination')
+Sting = namedtuple('Sting', 'time bee ant')
+Throw = namedtuple('Throw', 'time ant bee')
+Damage = namedtuple('Damage', 'time insect amount')
+Expire = namedtuple('Expire', 'time insect place')
+Effect = namedtuple('Effect', 'time bee effect duration')
+Wave = namedtuple('Wave', 'time bees')
+GameOver = namedtuple('GameOver', 'time winner')
+
+EVENT_TYPES = (Deploy, Remove, NoFood, Move, Sting, Throw, Damage, Expire,
+               Effect, Wave, GameOver)
+
+
+def emit_throw(ant, bee):
+    """Report that ant threw a leaf at bee, if anyone is listening."""
+    colony = ant.place.colony
+    if colony and colony.listeners:
+        colony.emit(Throw(colony.time, ant, bee))
+
+
+def print_events(colony):
+    """Print messages about expired insects, missing food and the end of
+    the game in colony, for a player to read."""
+    def expire(event):
+        print('{0} ran out of armor and expired'.format(event.insect))
+    def no_food(event):
+        print('Not enough food remains to place ' + event.ant_type_name)
+    def game_over(event):
+        if event.winner == 'bees':
+            print('The ant queen has perished. Please try again.')
+        else:
+            print('All bees are vanquished. You win!')
+    colony.subscribe(Expire, expire)
+    colony.subscribe(NoFood, no_food)
+    colony.subscribe(GameOver, game_over)
+
+
+####################
+# Batch Simulation #
+####################
+
+GameResult = namedtuple('GameResult',
+                        'scenario winner turns food ants_lost bees_killed')
+
+
+def play_game(layout, make_plan, strategy, scenario=None, seed=None):
+    """Play one game to completion and return its GameResult.
+
+    layout -- a layout function such as dry_layout
+    make_plan -- a function of no arguments that returns a new AssaultPlan
+    strategy -- a function to deploy ants to places; it must not interact
+    seed -- the seed of the colony's random
+    """
+    colony = AntColony(strategy, Hive(make_plan()), ant_types(), layout,
+                       seed=seed)
+    colony.simulate()
+    bees_alive = colony.bees_remaining + \
+        count_bees(colony.queen.colony_location.bees)
+    ants_alive = 0
+    for ant in colony.ants:
+        ants_alive += 1
+        if ant.container and ant.ant is not None:
+            ants_alive += 1
+    ants_lost = colony.ants_deployed - colony.ants_removed - ants_alive
+    winner = 'bees' if colony.queen.breached else 'ants'
+    return GameResult(scenario, winner, colony.time, colony.food, ants_lost,
+                      colony.bee_total - bees_alive)
+
+
+def run_batch(scenarios, strategy, n_games=1, seed=None):
+    """Play n_games headless games of each scenario and return a list of
+    GameResults, in order.  If seed is given, game i of each scenario is
+    seeded with seed + i.
+
+    Nothing listens for game events, so the cost of a game is the
+    simulation alone.
+
+    scenarios -- names from SCENARIOS, or (layout, make_plan) pairs
+    strategy -- a function to deploy ants to places; it must not interact
+
+    >>> results = run_batch(['test'], lambda colony: None, 2)
+    >>> [(r.winner, r.bees_killed) for r in results]
+    [('bees', 0), ('bees', 0)]
+    """
+    results = []
+    for scenario in scenarios:
+        if isinstance(scenario, str):
+            name, (layout, make_plan) = scenario, SCENARIOS[scenario]
+        else:
+            name, (layout, make_plan) = None, scenario
+        for i in range(n_games):
+            game_seed = None if seed is None else seed + i
+            results.append(play_game(layout, make_plan, strategy, name,
+                                     game_seed))
+    return results
 
 
 ###########
 # Layouts #
 ###########
 
+# The places of a layout, compiled by compile_layout.  Places are numbered in
+# the order they are registered, after the Hive with id 0, and the queen's
+# location has id len(names).  Other fields are tuples indexed by id, with
+# exits and entrances also giving those of the queen's location, except:
+#   ids -- a dict from place names to ids
+#   tunnels -- the ids of the places of each tunnel, in order of depth
+#   bee_entrances -- the ids of the places that bees enter from the Hive
+# An exit, entrance, tunnel or depth of -1 means None.
+LayoutGraph = namedtuple('LayoutGraph', 'names kinds ids exits entrances '
+                         'tunnel depth tunnels bee_entrances')
+
+_layout_graphs = weakref.WeakKeyDictionary()  # Layout function -> LayoutGraph
+
+
+def compile_layout(create_places):
+    """Return the LayoutGraph of the places that create_places registers.
+
+    A layout is compiled the first time it is used, and its graph is shared
+    by every colony built from it afterwards, so create_places must register
+    the same places each time it is called.  Each place is recreated for a
+    colony by calling its class with its name, as Place and Water are.
+
+    >>> graph = compile_layout(test_layout)
+    >>> graph.names[:3], graph.exits[:3], graph.entrances[:3]
+    (('Hive', 'tunnel_0_0', 'tunnel_0_1'), (-1, 9, 1), (-1, 2, 3))
+    >>> graph.tunnels, graph.bee_entrances
+    (((1, 2, 3, 4, 5, 6, 7, 8),), (8,))
+    """
+    graph = _layout_graphs.get(create_places)
+    if graph is None:
+        graph = _compile_layout(create_places)
+        try:
+            _layout_graphs[create_places] = graph
+        except TypeError:  # Cannot be weakly referenced
+            pass
+    return graph
+
+
+def _compile_layout(create_places):
+    hive, queen = Place('Hive'), Place('AntQueen')
+    registered, bee_entrances = [hive], []
+    def register_place(place, is_bee_entrance):
+        if is_bee_entrance:
+            place.entrance = hive
+            bee_entrances.append(len(registered))
+        registered.append(place)
+    create_places(queen, register_place)
+    n = len(registered)
+    ids = dict((place, i) for i, place in enumerate(registered))
+    ids[queen] = n
+    # A tunnel is a chain of places linked by entrances, starting from a
+    # place that is not the entrance of any other.  Depth increases by one
+    # with each entrance followed, and the tunnel ends at the Hive.
+    entered = set(p.entrance for p in registered[1:])
+    tunnel, depth, tunnels = [-1] * n, [-1] * n, []
+    for start in registered[1:]:
+        if start in entered:
+            continue
+        chain, place = [], start
+        while ids.get(place, 0) not in (0, n):
+            tunnel[ids[place]], depth[ids[place]] = len(tunnels), len(chain)
+            chain.append(ids[place])
+            place = place.entrance
+        tunnels.append(tuple(chain))
+    def id_of(place):
+        return -1 if place is None else ids[place]
+    return LayoutGraph(tuple(p.name for p in registered),
+                       tuple(type(p) for p in registered),
+                       dict((p.name, i) for i, p in enumerate(registered)),
+                       tuple(id_of(p.exit) for p in registered + [queen]),
+                       tuple(id_of(p.entrance) for p in registered + [queen]),
+                       tuple(tunnel), tuple(depth), tuple(tunnels),
+                       tuple(bee_entrances))
+
 def mixed_layout(queen, register_place, length=8, tunnels=3, moat_frequency=3):
     """Register Places with the colony."""
     for tunnel in range(tunnels):
@@ -430,27 +1485,178 @@ def dry_layout(queen, register_place, length=8, tunnels=3):
 #################
 
 
+# A wave of bees in a lazy AssaultPlan, made when the wave is launched
+WaveSpec = namedtuple('WaveSpec', 'time count armor')
+
+
 class AssaultPlan(dict):
     """The Bees' plan of attack for the Colony.  Attacks come in timed waves.
 
     An AssaultPlan is a dictionary from times (int) to waves (list of Bees).
+    In swarm mode, each wave added is a single Swarm.
 
     >>> AssaultPlan().add_wave(4, 2)
     {4: [Bee(3, None), Bee(3, None)]}
+
+    In lazy mode, a wave is a list of WaveSpecs, and its bees are made by
+    make_wave when the Hive launches it.  Bees not yet launched take no
+    memory, so a long game holds only the bees in play.
+
+    >>> plan = AssaultPlan(lazy=True).add_wave(4, 2)
+    >>> plan
+    {4: [WaveSpec(time=4, count=2, armor=3)]}
+    >>> plan.make_wave(4)
+    [Bee(3, None), Bee(3, None)]
+
+    The bees of a wave enter the colony at entrances chosen at random, each
+    with the same chance, unless the wave has a target; see add_wave.  The
+    targets of the bees added at each time are kept in targets as (count,
+    target) runs, for times at which some bees have a target.
+
+    >>> AssaultPlan().add_wave(4, 2).add_wave(4, 1, target=0).targets
+    {4: [(2, None), (1, 0)]}
     """
 
-    def __init__(self, bee_armor=3):
+    def __init__(self, bee_armor=3, swarm=False, lazy=False):
         self.bee_armor = bee_armor
+        self.swarm = swarm
+        self.lazy = lazy
+        self.targets = {}  # time -> [(count, target)] runs of bees added
+
+    def add_wave(self, time, count, target=None):
+        """Add a wave at time with count Bees that have the specified armor.
 
-    def add_wave(self, time, count):
-        """Add a wave at time with count Bees that have the specified armor."""
-        bees = [Bee(self.bee_armor) for _ in range(count)]
-        self.setdefault(time, []).extend(bees)
+        target -- where the bees enter: None for any bee entrance at random,
+                  the index of an entrance in colony.bee_entrances, or a
+                  weight for each entrance, by which entrances are chosen
+
+        A target is checked against the entrances of a layout by
+        check_targets when a colony is built with the plan.
+
+        >>> AssaultPlan().add_wave(4, 2, target=-1)
+        Traceback (most recent call last):
+        ...
+        ValueError: target -1 is not the index of an entrance
+        """
+        if isinstance(target, bool) or isinstance(target, int) and target < 0:
+            raise ValueError(
+                'target {0} is not the index of an entrance'.format(target))
+        if target is not None and not isinstance(target, int):
+            target = tuple(target)
+            if any(weight < 0 for weight in target) or sum(target) <= 0:
+                raise ValueError('weights {0} of a target must not be '
+                                 'negative or all zero'.format(target))
+            target = tuple(accumulate(target))  # Cumulative weights
+        self._add(time, count, self.bee_armor, target)
         return self
 
+    def check_targets(self, entrances):
+        """Raise ValueError unless every target of this plan fits a layout
+        with entrances bee entrances.
+
+        >>> AssaultPlan().add_wave(4, 2, target=(1, 2)).check_targets(3)
+        Traceback (most recent call last):
+        ...
+        ValueError: wave at time 4 has 2 weights for 3 entrances
+        """
+        for time, runs in sorted(self.targets.items()):
+            for _, target in runs:
+                if target is None:
+                    continue
+                if isinstance(target, int):
+                    if target >= entrances:
+                        raise ValueError('wave at time {0} targets entrance '
+                                         '{1} of {2}'.format(time, target,
+                                                             entrances))
+                elif len(target) != entrances:
+                    raise ValueError('wave at time {0} has {1} weights for '
+                                     '{2} entrances'.format(time, len(target),
+                                                            entrances))
+
+    def _add(self, time, count, armor, target=None):
+        wave = self.setdefault(time, [])
+        if count and (target is not None or time in self.targets):
+            runs = self.targets.get(time)
+            if runs is None:
+                runs = self.targets[time] = []
+                if wave:
+                    runs.append((count_bees(wave), None))
+            runs.append((count, target))
+        if self.lazy:
+            if count:
+                wave.append(WaveSpec(time, count, armor))
+        elif self.swarm:
+            if count:
+                wave.append(Swarm(armor, count))
+        else:
+            wave.extend(Bee(armor) for _ in range(count))
+
+    def make_wave(self, time):
+        """Return new Bees for the WaveSpecs of the lazy wave at time."""
+        bees = []
+        for spec in self.get(time, ()):
+            if self.swarm:
+                bees.append(Swarm(spec.armor, spec.count))
+            else:
+                bees.extend(Bee(spec.armor) for _ in range(spec.count))
+        return bees
+
+    def targeted(self, time, bees):
+        """Yield each of bees, the wave at time or the Bees made for it, with
+        its target."""
+        runs = self.targets.get(time)
+        if runs is None:
+            for bee in bees:
+                yield bee, None
+            return
+        runs, left = iter(runs), 0
+        for bee in bees:
+            if not left:
+                left, target = next(runs)
+            left -= bee.count
+            yield bee, target
+
+    def as_swarm(self):
+        """Return a copy of this plan in swarm mode, with a Swarm for each
+        run of bees with the same armor in a wave."""
+        return self._regroup(True, self.lazy)
+
+    def as_lazy(self):
+        """Return a copy of this plan in lazy mode, with a WaveSpec for each
+        run of bees with the same armor in a wave."""
+        return self._regroup(self.swarm, True)
+
+    def _regroup(self, swarm, lazy):
+        plan = AssaultPlan(self.bee_armor, swarm, lazy)
+        for time, wave in self.items():
+            runs = []  # [armor, target, count] of each run of alike bees
+            for bee, target in self.targeted(time, wave):
+                if runs and runs[-1][:2] == [bee.armor, target]:
+                    runs[-1][2] += bee.count
+                else:
+                    runs.append([bee.armor, target, bee.count])
+            plan.setdefault(time, [])
+            for armor, target, count in runs:
+                plan._add(time, count, armor, target)
+        return plan
+
+    @property
+    def bee_count(self):
+        """The number of bees in the plan."""
+        return sum(count_bees(wave) for wave in self.values())
+
     @property
     def all_bees(self):
-        """Place all Bees in the hive and return the list of Bees."""
+        """Place all Bees in the hive and return the list of Bees.
+
+        The waves of a lazy plan hold no Bees, so new Bees are made for them
+        by make_wave each time.
+
+        >>> AssaultPlan(lazy=True).add_wave(4, 2).all_bees
+        [Bee(3, None), Bee(3, None)]
+        """
+        if self.lazy:
+            return [bee for time in self for bee in self.make_wave(time)]
         return [bee for wave in self.values() for bee in wave]
 
 def make_test_assault_plan():
@@ -468,6 +1674,15 @@ def make_insane_assault_plan():
         plan.add_wave(time, 1)
     return plan.add_wave(15, 20)
 
+# Named (layout, assault plan constructor) pairs, matching the command line
+SCENARIOS = OrderedDict([
+    ('test', (test_layout, make_test_assault_plan)),
+    ('full', (dry_layout, make_full_assault_plan)),
+    ('water', (mixed_layout, make_full_assault_plan)),
+    ('insane', (dry_layout, make_insane_assault_plan)),
+    ('insane_water', (mixed_layout, make_insane_assault_plan)),
+])
+
 
 
 ##############
@@ -478,6 +1693,8 @@ def make_insane_assault_plan():
 class Water(Place):
     """Water is a place that can only hold 'watersafe' insects."""
 
+    __slots__ = ()
+
     def add_insect(self, insect):
         """Add insect if it is watersafe, otherwise reduce its armor to 0."""
         # Call the add_insect method of parent Place 
@@ -488,26 +1705,47 @@ class Water(Place):
             insect.reduce_armor(insect.armor)
             
 class QueenPlace(object): 
-    """QueenPlace is a place where the QueenAnt is"""
+    """QueenPlace is a place where the QueenAnt is
+
+    It holds the places that count as the queen's location: the original
+    colony location and the place of the QueenAnt once she has acted.  The
+    colony counts the bees in these places as they come and go, so a breach
+    is detected without collecting their bees.
+    """
+
+    __slots__ = ('colony_location', 'places', 'bee_count')
     
-    def __init__(self, queen, colony_location): 
+    def __init__(self, colony_location, colony): 
         """Do set the lists of bees to construct the QueenPlace"""  
-        self.queen = queen # Store the passed in queen as an inst. var 
         self.colony_location = colony_location # Store the orig. colony location as an inst. var 
+        self.places = [colony_location]
+        self.bee_count = count_bees(colony_location.bees)
+        colony_location.colony = colony # Report bees entering the colony location 
+
+    def add_place(self, place):
+        """Count place as a location of the queen from now on."""
+        if place not in self.places:
+            self.places.append(place)
+            self.bee_count += count_bees(place.bees)
+
+    @property
+    def breached(self):
+        """Whether any bee has reached the queen."""
+        return self.bee_count > 0
     
     @property 
     def bees(self): 
         """The bees that are either in the original colony.queen locaction or QueenAnt.place location"""    
-        return self.queen.place.bees + self.colony_location.bees # Return the two bee lists concat. together 
+        return [bee for place in self.places for bee in place.bees]
 
 
 class FireAnt(Ant):
     """FireAnt cooks any Bee in its Place when it expires."""
 
+    __slots__ = ()
     name = 'Fire'
-    damage = 3
+    damage = Stat(3)
     food_cost = 4
-    armor = 1
     implemented = True
 
     def reduce_armor(self, amount):
@@ -529,25 +1767,28 @@ class FireAnt(Ant):
 class LongThrower(ThrowerAnt):
     """A ThrowerAnt that only throws leaves at Bees at least 3 places away."""
 
+    __slots__ = ()
     name = 'Long'
     food_cost = 3
     implemented = True
-    min_range = 4
+    min_range = Stat(4)
 
 
 
 class ShortThrower(ThrowerAnt):
     """A ThrowerAnt that only throws leaves at Bees within 3 places."""
 
+    __slots__ = ()
     name = 'Short'
     food_cost = 3
     implemented = True
-    max_range = 2
+    max_range = Stat(2)
 
 
 class WallAnt(Ant):
     """WallAnt is an Ant which has a large amount of armor."""
 
+    __slots__ = ()
     name = 'Wall'    
     food_cost = 4 
     implemented = True
@@ -561,10 +1802,10 @@ class NinjaAnt(Ant):
     """NinjaAnt is an Ant which does not block the path and does 1 damage to
     all Bees in the exact same Place."""
 
+    __slots__ = ()
     name = 'Ninja'
-    armor = 1 
     food_cost = 6 
-    damage = 1
+    damage = Stat(1)
     blocks_path = False 
     implemented = True    
 
@@ -576,20 +1817,22 @@ class NinjaAnt(Ant):
 class ScubaThrower(ThrowerAnt):
     """ScubaThrower is a ThrowerAnt which is watersafe."""
 
+    __slots__ = ()
     name = 'Scuba'
     food_cost = 5
     implemented = True
-    watersafe = True
+    watersafe = Stat(True)
 
 
 class HungryAnt(Ant):
     """HungryAnt will take three "turns" to eat a Bee in the same space as it.
     While eating, the HungryAnt can't eat another Bee.
     """
+    __slots__ = ('digesting',)
     name = 'Hungry'
     food_cost = 4
     implemented = True
-    time_to_digest = 3
+    time_to_digest = Stat(3)
 
     def __init__(self):
         Ant.__init__(self)        
@@ -599,17 +1842,20 @@ class HungryAnt(Ant):
         if bee != None:
             bee.reduce_armor(bee.armor)
             self.digesting = self.time_to_digest
+            if self.place.colony is not None:
+                self.place.colony.changed.add(self.place)
             
     def action(self, colony):        
         if self.digesting: # If Ant isn't done digesting when action is called
             self.digesting -= 1 # Decrement the digesting attribute 
+            colony.changed.add(self.place)
         else:
-            self.eat_bee(random_or_none(self.place.bees))
+            self.eat_bee(colony.random_bee(self.place.bees))
 
 class BodyguardAnt(Ant):
     """BodyguardAnt provides protection to other Ants."""
+    __slots__ = ('ant',)
     name = 'Bodyguard'
-    armor = 2
     food_cost = 4
     container = True 
     implemented = True    
@@ -627,7 +1873,7 @@ class BodyguardAnt(Ant):
             transfer_ant = self.ant
             transfer_place = self.place
             Insect.reduce_armor(self, amount)
-            transfer_place.ant = transfer_ant
+            transfer_place.add_insect(transfer_ant)
         else:
             Insect.reduce_armor(self, amount)
 
@@ -640,18 +1886,21 @@ class BodyguardAnt(Ant):
 class QueenAnt(ThrowerAnt):
     """The Queen of the colony.  The game is over if a bee enters her place."""
 
+    __slots__ = ('imposter',)
     name = 'Queen'
     queen_count = 0 
     food_cost = 2
-    armor = 1
-    imposter = False 
     implemented = True     
 
-    def __init__(self):
+    def __init__(self, imposter=None):
+        """A colony passes imposter, since it counts the queens deployed to
+        it; a queen made outside a colony is counted by queen_count."""
         ThrowerAnt.__init__(self, 1)
-        QueenAnt.queen_count += 1 # Keep a count of how many QueenAnts have been constructed 
-        if QueenAnt.queen_count > 1: # We have an imposter 
-            self.imposter = True # Mark as imposter! 
+        if imposter is None:
+            QueenAnt.queen_count += 1 # Keep a count of how many QueenAnts have been constructed 
+            # Every QueenAnt after the first is an imposter 
+            imposter = QueenAnt.queen_count > 1
+        self.imposter = imposter
 
     def action(self, colony):
         """A queen ant throws a leaf, but also doubles the damange of ants
@@ -659,13 +1908,14 @@ class QueenAnt(ThrowerAnt):
         if self.imposter: 
             self.reduce_armor(self.armor) # Kill the imposter immediately 
         else: 
-            colony.queen = QueenPlace(self, colony.queen) # Queen's place (self.place) and the orig. colony.queen place 
+            colony.queen.add_place(self.place) # Queen's place (self.place) and the orig. colony.queen place 
             ThrowerAnt.action(self, colony) # Queen is a thrower ant and performs action 
         
 
 class AntRemover(Ant):
     """Allows the player to remove ants from the board in the GUI."""
 
+    __slots__ = ()
     name = 'Remover'
     implemented = True
 
@@ -677,78 +1927,81 @@ class AntRemover(Ant):
 # Status Effects #
 ##################
 
-def make_slow(action):
-    """Return a new action method that calls action every other turn.
+def slowed_action(bee, colony):
+    """The action of a slowed Bee: its default action every other turn."""
+    if colony.time % 2 == 0:
+        bee.default_action(colony)
 
-    action -- An action method of some Bee
-    """
-    "*** YOUR CODE HERE ***"
-    def slow_action(bee, colony):
-        if colony.time % 2 == 0:
-            Bee.action(bee, colony)
-    def getName():
-        return "slow"
-    return slow_action, getName()
-
-def make_stun(action):
-    """Return a new action method that does nothing.
-
-    action -- An action method of some Bee
-    """
-    "*** YOUR CODE HERE ***"
-    def stunned_action(bee, colony):
-        pass
-    def getName():
-        return "stun"
-    return stunned_action, getName()
 
-def other_effect(effect, bee):
-    if effect == "stun":
-        return make_slow(Bee.action)
-    return make_stun(Bee.action)
+def stunned_action(bee, colony):
+    """The action of a stunned Bee, which does nothing."""
+
+
+# The action of a Bee controlled by each status effect, by name
+EFFECT_ACTIONS = {'slow': slowed_action, 'stun': stunned_action}
 
 
 def apply_effect(effect, bee, duration):
-    """Apply a status effect to a Bee that lasts for duration turns."""
-    "*** YOUR CODE HERE ***"
-    current_effect, name = effect(Bee.action)
-    bee.effects[name] = duration
+    """Apply a status effect to a Bee that lasts for duration turns.
 
-    def affected(colony):          #this method essentially replaces bee's action method until all effects are gone
-        nonlocal current_effect, name
-        current_effect(bee, colony)
-        for ef in bee.effects:      #decrements time for each effect on the bee
-            if bee.effects[ef] >= 1:
-                bee.effects[ef] -= 1
-        if bee.effects["stun"] == 0 and bee.effects["slow"] == 0:
-            bee.action = bee.default_action     
-        elif bee.effects[name] == 0:
-            current_effect, name = other_effect(name, bee)   #if effect runs out, then switch to previous effect
+    effect -- the name of the effect, 'slow' or 'stun'
 
-    bee.action = affected
+    The effect applied last controls the bee, and applying an effect again
+    restarts its duration.  When it expires, the other effect controls the
+    bee if it has turns remaining.
+
+    >>> bee = Bee(3)
+    >>> apply_effect('slow', bee, 3)
+    >>> apply_effect('stun', bee, 1)
+    >>> bee.effect, bee.effects
+    ('stun', {'stun': 1, 'slow': 3})
+    """
+    if effect not in EFFECT_ACTIONS:
+        raise ValueError('{0} is not a status effect'.format(effect))
+    if effect == 'stun':
+        bee.stun_until = bee.ticks + duration
+    else:
+        bee.slow_until = bee.ticks + duration
+    bee.effect = effect
+    colony = bee.place and bee.place.colony
+    if colony:
+        colony.changed.add(bee.place)
+        if colony.listeners:
+            colony.emit(Effect(colony.time, bee, effect, duration))
+
+
+def expire_effect(bee):
+    """The effect that controls bee has expired: hand control to the other
+    effect if it has turns remaining, or end the bee's effects."""
+    other = 'stun' if bee.effect == 'slow' else 'slow'
+    bee.effect = other if getattr(bee, other) else None
 
 
 class SlowThrower(ThrowerAnt):
     """ThrowerAnt that causes Slow on Bees."""
 
+    __slots__ = ()
     name = 'Slow'    
     implemented = True
 
     def throw_at(self, target):
         if target:
-            apply_effect(make_slow, target, 3)
+            emit_throw(self, target)
+            apply_effect('slow', target, 3)
 
 
 class StunThrower(ThrowerAnt):
     """ThrowerAnt that causes Stun on Bees."""
 
+    __slots__ = ()
     name = 'Stun'
     food_cost = 6 
     implemented = True
 
     def throw_at(self, target):
         if target:
-            apply_effect(make_stun, target, 1)
+            emit_throw(self, target)
+            apply_effect('stun', target, 1)
 
 @main
 def run(*args):
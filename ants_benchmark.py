@@ -0,0 +1,227 @@
+"""The ants_benchmark module measures the cost of simulating Ants games.
+
+The suite plays seeded games of each scenario in SUITE with a Script, a
+strategy that deploys ants in a fixed order, and reports turns per second,
+games per second and the peak memory of a game.  SUITE holds the scenarios
+of ants.SCENARIOS and stress scenarios with many tunnels or long tunnels.
+
+Scaling curves play the same games while one of the number of tunnels, the
+length of the tunnels and the number of bees grows, so that a cost that
+grows faster than it should shows up as a drop in turns per second.
+
+Memory is measured with tracemalloc as the bytes allocated per object while
+building many of them, so it includes the lists that hold them.  For example,
+
+    python3 ants_benchmark.py suite -n 10
+    python3 ants_benchmark.py scaling -n 3
+    python3 ants_benchmark.py memory -n 1000000
+"""
+
+import ants
+import time
+import tracemalloc
+from collections import OrderedDict, namedtuple
+from functools import partial
+from ucb import main
+
+
+##############
+# Game Suite #
+##############
+
+class Script(object):
+    """A strategy that deploys the ants of ORDER in turn, each as soon as
+    there is food for it, in the dry places of the colony nearest to the
+    queen first.  Each game needs a Script of its own.
+    """
+
+    ORDER = ('Harvester', 'Thrower', 'Queen', 'Harvester', 'Wall', 'Ninja',
+             'Long', 'Short', 'Fire', 'Slow', 'Stun', 'Hungry', 'Bodyguard')
+
+    def __init__(self):
+        self.places = None  # Names of the places to deploy to, in order
+
+    def __call__(self, colony):
+        if self.places is None:
+            places = [p for p in colony.places.values()
+                      if p is not colony.hive and not isinstance(p, ants.Water)]
+            places.sort(key=lambda p: (p.depth, p.tunnel))
+            self.places = [p.name for p in places]
+        n = colony.ants_deployed
+        if n < len(self.places):
+            name = self.ORDER[n % len(self.ORDER)]
+            if colony.ant_types[name].food_cost <= colony.food:
+                colony.deploy_ant(self.places[n], name)
+
+
+def wide_layout(queen, register_place):
+    """Register 128 tunnels of 8 places."""
+    ants.dry_layout(queen, register_place, tunnels=128)
+
+
+def long_layout(queen, register_place):
+    """Register 3 tunnels of 1000 places."""
+    ants.dry_layout(queen, register_place, length=1000)
+
+
+def make_stress_plan(bees=300, waves=10):
+    """Return an AssaultPlan of bees in waves, one every other turn."""
+    plan = ants.AssaultPlan()
+    for wave in range(waves):
+        plan.add_wave(2 + 2 * wave, bees // waves + (wave < bees % waves))
+    return plan
+
+
+# Named (layout, assault plan constructor) pairs played by the suite
+SUITE = OrderedDict(ants.SCENARIOS)
+SUITE['wide'] = (wide_layout, make_stress_plan)
+SUITE['long'] = (long_layout, make_stress_plan)
+
+# The number of games, turns and seconds played, and the peak bytes of a game
+Result = namedtuple('Result', 'games turns seconds peak')
+
+
+def play(layout, make_plan, seed):
+    """Play a game with a Script and return the finished colony."""
+    colony = ants.AntColony(Script(), ants.Hive(make_plan()), ants.ant_types(),
+                            layout, seed=seed)
+    colony.simulate()
+    return colony
+
+
+def benchmark(layout, make_plan, games=10, seed=0):
+    """Play games seeded seed, seed + 1, ... and return their Result.
+
+    Peak memory is measured in one more game with the first seed, so that
+    tracemalloc does not slow the games that are timed.
+    """
+    turns, start = 0, time.perf_counter()
+    for i in range(games):
+        turns += play(layout, make_plan, seed + i).time
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        play(layout, make_plan, seed)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return Result(games, turns, seconds, peak)
+
+
+def suite(games=10, scenarios=SUITE):
+    """Return an OrderedDict from the names of scenarios to Results."""
+    return OrderedDict((name, benchmark(layout, make_plan, games))
+                       for name, (layout, make_plan) in scenarios.items())
+
+
+# The values of each variable of the scaling curves
+CURVES = OrderedDict([
+    ('tunnels', (1, 4, 16, 64, 256)),
+    ('length', (8, 32, 128, 512, 2048)),
+    ('bees', (10, 100, 1000, 10000)),
+])
+
+
+def scaling(variable, values, games=3):
+    """Return an OrderedDict from each value of variable to the Result of
+    games played with it on a dry layout of 3 tunnels of length 8 with 300
+    bees, except for the variable ('tunnels', 'length' or 'bees')."""
+    results = OrderedDict()
+    for value in values:
+        sizes = {'tunnels': 3, 'length': 8, 'bees': 300}
+        sizes[variable] = value
+        layout = partial(ants.dry_layout, length=sizes['length'],
+                         tunnels=sizes['tunnels'])
+        make_plan = partial(make_stress_plan, sizes['bees'])
+        results[value] = benchmark(layout, make_plan, games)
+    return results
+
+
+def report(name, result):
+    """Return a line describing a Result for a person to read."""
+    return '{0:14} {1:10.0f} turns/s {2:9.2f} games/s {3:9.0f} KiB'.format(
+        name, result.turns / result.seconds, result.games / result.seconds,
+        result.peak / 1024)
+
+
+##########
+# Memory #
+##########
+
+
+def bytes_per(make, count):
+    """Return the bytes allocated per object by make(count), which returns
+    count objects that are kept alive while they are measured."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        objects = make(count)
+        return (tracemalloc.get_traced_memory()[0] - before) / count
+    finally:
+        tracemalloc.stop()
+
+
+def make_hive(count):
+    """Return a Hive full of count bees, as a scenario would build it."""
+    return ants.Hive(ants.AssaultPlan().add_wave(1, count))
+
+
+def make_lazy_hive(count):
+    """Return a Hive with a lazy plan of count bees in waves of 100."""
+    plan = ants.AssaultPlan(lazy=True)
+    for wave in range(count // 100):
+        plan.add_wave(wave, 100)
+    return ants.Hive(plan.add_wave(count // 100, count % 100))
+
+
+def make_slowed_bees(count):
+    """Return count bees under a status effect."""
+    tunnel = ants.Place('tunnel_0_0')
+    bees = [ants.Bee(3) for _ in range(count)]
+    for bee in bees:
+        tunnel.add_insect(bee)
+        ants.apply_effect('slow', bee, 3)
+    return tunnel
+
+
+def make_tunnel(count):
+    """Return the last of count places of a tunnel."""
+    place = None
+    for step in range(count):
+        place = ants.Place('tunnel_0_{0}'.format(step), place)
+    return place
+
+
+def memory(count=100000):
+    """Return an OrderedDict of the bytes per object of the objects of a
+    game, measured by building count of each."""
+    return OrderedDict([
+        ('bee', bytes_per(make_hive, count)),
+        ('lazy bee', bytes_per(make_lazy_hive, count)),
+        ('slowed bee', bytes_per(make_slowed_bees, count)),
+        ('place', bytes_per(make_tunnel, count)),
+        ('thrower', bytes_per(lambda n: [ants.ThrowerAnt()
+                                         for _ in range(n)], count)),
+    ])
+
+
+@main
+def run(*args):
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark Ants games')
+    parser.add_argument('benchmark', choices=['suite', 'scaling', 'memory'])
+    parser.add_argument('--count', '-n', type=int, default=None,
+                        help='games per scenario, or objects to build for '
+                             'each memory measurement')
+    args = parser.parse_args(args)
+    if args.benchmark == 'suite':
+        for name, result in suite(args.count or 10).items():
+            print(report(name, result))
+    elif args.benchmark == 'scaling':
+        for variable, values in CURVES.items():
+            for value, result in scaling(variable, values,
+                                         args.count or 3).items():
+                print(report('{0} {1}'.format(variable, value), result))
+    else:
+        for name, size in memory(args.count or 100000).items():
+            print('{0:12} {1:7.1f} bytes'.format(name, size))
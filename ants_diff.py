@@ -0,0 +1,256 @@
+"""The ants_diff module checks that other engines play the same games as
+ants.AntColony.
+
+An engine is a function with the arguments (strategy, plan, layout, food,
+seed) that returns a colony with turn, game_over and state methods.  ENGINES
+holds the engines of this project:
+
+    colony  ants.AntColony, the reference
+    swarm   AntColony with the plan in swarm mode
+    lazy    AntColony with a lazy plan
+    array   ants_numpy.ArrayColony, if NumPy is installed
+
+A Case is a fuzzed game: a scenario, the starting food, a seed for the
+colony's random, and the deployments and removals made on each turn, which
+are chosen at random from the seed of the case by fuzz_case.  Check plays a
+case with the reference and with an engine, compares their GameStates after
+every turn, and returns the first Divergence.  Shrink then removes moves,
+turns and food from the case for as long as it still diverges, so that the
+Divergence reported is small enough to read.
+
+Fuzzing plays many cases in a pool of worker processes.  For example,
+
+    python3 ants_diff.py array -n 5000
+    python3 ants_diff.py swarm lazy -n 1000 --turns 100
+"""
+
+import ants
+import ants_tournament
+import functools
+import os
+import random
+from collections import OrderedDict, namedtuple
+from ucb import main
+try:
+    import ants_numpy
+except ImportError:  # NumPy is not installed
+    ants_numpy = None
+
+# A game to play: moves are (time, 'deploy', place, ant type) and
+# (time, 'remove', place) tuples, in the order they are made
+Case = namedtuple('Case', 'scenario food seed moves')
+
+# The first turn after which an engine's state differed from the reference
+Divergence = namedtuple('Divergence', 'engine case turn expected actual')
+
+FOODS = (4, 10, 30, 100)
+
+
+###########
+# Engines #
+###########
+
+def object_engine(strategy, plan, layout, food, seed):
+    return ants.AntColony(strategy, ants.Hive(plan), ants.ant_types(), layout,
+                          food, seed)
+
+
+def swarm_engine(strategy, plan, layout, food, seed):
+    return object_engine(strategy, plan.as_swarm(), layout, food, seed)
+
+
+def lazy_engine(strategy, plan, layout, food, seed):
+    return object_engine(strategy, plan.as_lazy(), layout, food, seed)
+
+
+def array_engine(strategy, plan, layout, food, seed):
+    return ants_numpy.ArrayColony(strategy, ants.Hive(plan), ants.ant_types(),
+                                  layout, food, seed)
+
+
+ENGINES = OrderedDict([('colony', object_engine), ('swarm', swarm_engine),
+                       ('lazy', lazy_engine)])
+if ants_numpy is not None:
+    ENGINES['array'] = array_engine
+
+
+############
+# Checking #
+############
+
+def place_names(layout):
+    """Return the names of the places that layout registers."""
+    names = []
+    layout(ants.Place('AntQueen'), lambda place, _: names.append(place.name))
+    return names
+
+
+def fuzz_case(seed, turns=60, remove=0.3):
+    """Return a random Case chosen by seed, with up to 2 moves per turn.
+
+    remove -- the chance that a move removes the ant of an occupied place
+    """
+    rng = random.Random(seed)
+    scenario = rng.choice(list(ants.SCENARIOS))
+    names = place_names(ants.SCENARIOS[scenario][0])
+    kinds = [t.name for t in ants.ant_types()]
+    moves = []
+    for time in range(turns):
+        for _ in range(rng.randrange(3)):
+            name = rng.choice(names)
+            if rng.random() < remove:
+                moves.append((time, 'remove', name))
+            else:
+                moves.append((time, 'deploy', name, rng.choice(kinds)))
+    return Case(scenario, rng.choice(FOODS), seed, tuple(moves))
+
+
+def case_strategy(case):
+    """Return a strategy that makes the moves of case.  A move that raises
+    an AssertionError, such as a second ant in a place, is skipped."""
+    moves = {}
+    for move in case.moves:
+        moves.setdefault(move[0], []).append(move)
+    def strategy(colony):
+        for move in moves.get(colony.time, ()):
+            try:
+                if move[1] == 'deploy':
+                    colony.deploy_ant(move[2], move[3])
+                else:
+                    colony.remove_ant(move[2])
+            except AssertionError:
+                pass
+    return strategy
+
+
+def trace(case, engine, turns):
+    """Play case with engine and return the state after each turn.  The
+    trace ends with 'game over', or with the type of an exception raised."""
+    layout, make_plan = ants.SCENARIOS[case.scenario]
+    colony = engine(case_strategy(case), make_plan(), layout, case.food,
+                    case.seed)
+    states = []
+    for _ in range(turns):
+        if colony.game_over:
+            states.append('game over')
+            break
+        try:
+            colony.turn()
+        except Exception as e:
+            states.append(type(e).__name__)
+            break
+        states.append(colony.state())
+    return states
+
+
+def check(case, engine_name, turns=200):
+    """Return the first Divergence of engine_name from the reference engine
+    in playing case, or None if they agree on every turn."""
+    expected = trace(case, object_engine, turns)
+    actual = trace(case, ENGINES[engine_name], turns)
+    for turn, (a, b) in enumerate(zip(expected, actual)):
+        if a != b:
+            return Divergence(engine_name, case, turn, a, b)
+    if len(expected) != len(actual):
+        turn = min(len(expected), len(actual))
+        return Divergence(engine_name, case, turn, expected[turn:turn+1],
+                          actual[turn:turn+1])
+    return None
+
+
+def shrink(divergence, turns=200):
+    """Return a Divergence for the smallest case found that still diverges,
+    by removing moves and lowering the starting food."""
+    def diverges(case):
+        return check(case, divergence.engine, turns)
+    best = divergence
+    # Moves after the turn of the divergence cannot cause it
+    moves = [m for m in best.case.moves if m[0] <= best.turn]
+    best = diverges(best.case._replace(moves=tuple(moves))) or best
+    chunk = len(best.case.moves) // 2
+    while chunk >= 1:
+        moves, i, shrunk = list(best.case.moves), 0, False
+        while i < len(moves):
+            case = best.case._replace(moves=tuple(moves[:i] + moves[i+chunk:]))
+            found = diverges(case)
+            if found:
+                best, moves, shrunk = found, list(case.moves), True
+            else:
+                i += chunk
+        if not shrunk:
+            chunk //= 2
+    for food in FOODS:
+        if food < best.case.food:
+            found = diverges(best.case._replace(food=food))
+            if found:
+                return found
+    return best
+
+
+def check_seeds(engine_names, seeds, turns):
+    """Return the Divergences of each engine for the fuzzed cases of seeds.
+    Runs in a worker process."""
+    found = []
+    for seed in seeds:
+        case = fuzz_case(seed)
+        for name in engine_names:
+            divergence = check(case, name, turns)
+            if divergence is not None:
+                found.append(divergence)
+    return found
+
+
+def fuzz(engine_names, seeds, workers=None, chunk_size=50, turns=200):
+    """Check engine_names on the fuzzed case of each seed, yielding each
+    Divergence as it is found.
+
+    workers -- number of worker processes; 0 checks in this process
+    """
+    check_chunk = functools.partial(check_seeds, engine_names, turns=turns)
+    return ants_tournament.map_chunks(check_chunk, seeds, workers, chunk_size,
+                                      ordered=True)
+
+
+def describe(divergence):
+    """Return a description of divergence for a person to read."""
+    lines = ['{0} diverges after turn {1} of'.format(divergence.engine,
+                                                     divergence.turn),
+             '  ' + repr(divergence.case._replace(moves=()))]
+    lines.extend('  ' + repr(move) for move in divergence.case.moves)
+    expected, actual = divergence.expected, divergence.actual
+    if isinstance(expected, ants.GameState) and \
+            isinstance(actual, ants.GameState):
+        for field, a, b in zip(expected._fields, expected, actual):
+            if field == 'places':
+                for place_a, place_b in zip(a, b):
+                    if place_a != place_b:
+                        lines.append('  colony: {0}'.format(place_a))
+                        lines.append('  {0}: {1}'.format(divergence.engine,
+                                                          place_b))
+            elif a != b:
+                lines.append('  {0}: colony {1}, {2} {3}'.format(
+                    field, a, divergence.engine, b))
+    else:
+        lines.append('  colony: {0}'.format(expected))
+        lines.append('  {0}: {1}'.format(divergence.engine, actual))
+    return '\n'.join(lines)
+
+
+@main
+def run(*args):
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Compare Ants engines on fuzzed games')
+    parser.add_argument('engine', nargs='+', choices=list(ENGINES)[1:])
+    parser.add_argument('--games', '-n', type=int, default=1000)
+    parser.add_argument('--turns', type=int, default=200,
+                        help='turns to compare in each game')
+    parser.add_argument('--workers', '-j', type=int, default=os.cpu_count())
+    parser.add_argument('--show', type=int, default=3,
+                        help='divergences to shrink and describe')
+    args = parser.parse_args(args)
+    found = list(fuzz(args.engine, range(args.games), args.workers,
+                      turns=args.turns))
+    print('{0} divergences in {1} games'.format(len(found), args.games))
+    for divergence in found[:args.show]:
+        print(describe(shrink(divergence, args.turns)))
@@ -68,20 +68,31 @@ LEAF_COLORS = {'Thrower': 'ForestGreen',
 
 
 class AntsGUI(object):
-    """GUI-based interactive strategy that logs all colony updates."""
+    """GUI-based interactive strategy that logs all colony updates.
 
-    def __init__(self):
+    driver -- a strategy that deploys ants each turn instead of the player,
+              such as a replay; clicks on places are ignored while driven
+    seconds -- the physical time each turn lasts
+    """
+
+    def __init__(self, driver=None, seconds=STRATEGY_SECONDS):
         self.initialized = False
+        self.driver = driver
+        self.seconds = seconds
 
     def initialize_colony_graphics(self, colony):
         """Create canvas, control panel, places, and labels."""
         self.initialized = True
+        # Drawing has its own random so that it never changes the game
+        self.random = random.Random(colony.seed)
         self.canvas = graphics.Canvas()
         self.food_text = self.canvas.draw_text('Food: 1  Time: 0', (20, 20))
         self.ant_text = self.canvas.draw_text('Ant selected: None', (20, 140))
         self._click_rectangles = list()
         self._init_control_panel(colony)
         self._init_places(colony)
+        self._throws = []
+        colony.subscribe(ants.Throw, self._record_throw)
 
         start_text = self.canvas.draw_text('CLICK TO START', MESSAGE_POS)
         self.canvas.wait_for_click()
@@ -170,23 +181,24 @@ class AntsGUI(object):
         """The strategy function is called by the ants.AntColony each turn."""
         if not self.initialized:
             self.initialize_colony_graphics(colony)
+        # Throw the leaves thrown during the last turn
+        for ant_name, start, end in self._throws:
+            animate_leaf(self.canvas, start, end, color=LEAF_COLORS[ant_name])
+        self._throws = []
+        if self.driver is not None:
+            self.driver(colony)
         elapsed = 0  # Physical time elapsed this turn
-        while elapsed < STRATEGY_SECONDS:
+        while elapsed < self.seconds:
             self._update_control_panel(colony)
             self._update_places(colony)
-            msg = 'Food: {0}  Time: {1}'.format(colony.food, colony.time)
+            msg = 'Food: {0}  Time: {1}  Bees: {2}'.format(
+                colony.food, colony.time, colony.bees_remaining)
             self.canvas.edit_text(self.food_text, text=msg)
-            pos, el = self.canvas.wait_for_click(STRATEGY_SECONDS - elapsed)
+            pos, el = self.canvas.wait_for_click(self.seconds - elapsed)
             elapsed += el
-            if pos is not None:
+            if pos is not None and self.driver is None:
                 self._interpret_click(pos, colony)
 
-        # Throw leaves at the end of the turn
-        has_ant = lambda a: hasattr(a, 'ant') and a.ant
-        for ant in colony.ants + [a.ant for a in colony.ants if has_ant(a)]:
-            if ant.name in LEAF_COLORS:
-                self._throw(ant, colony)
-
     def _interpret_click(self, pos, colony):
         """Interpret a click position by finding its click rectangle."""
         x, y = pos
@@ -236,9 +248,12 @@ class AntsGUI(object):
                             break
                     else:
                         other_place = colony.hive
+                        if bee not in self.images[other_place.name]:
+                            # A bee of a lazy plan, made as it launched
+                            self._draw_insect(bee, other_place.name, True)
                     image = self.images[other_place.name].pop(bee)
                     pos = shift_point(self.place_points[name], PLACE_PADDING)
-                    self.canvas.slide_shape(image, pos, STRATEGY_SECONDS)
+                    self.canvas.slide_shape(image, pos, self.seconds)
                     self.images[name][bee] = image
 
             # Remove expired insects
@@ -250,24 +265,24 @@ class AntsGUI(object):
                 if not place.exit or insect not in self.images[place.exit.name]:
                     image = self.images[name].pop(insect)
                     pos = (self.place_points[name][0], CRYPT)
-                    self.canvas.slide_shape(image, pos, STRATEGY_SECONDS)
+                    self.canvas.slide_shape(image, pos, self.seconds)
 
     def _draw_insect(self, insect, place_name, random_offset=False, behind=0):
         """Draw an insect and store the ID of its image."""
         image_file = INSECT_FILES[insect.name]
         pos = shift_point(self.place_points[place_name], PLACE_PADDING)
         if random_offset:
-            pos = shift_point(pos, (random.randint(-10, 10), random.randint(-50, 50)))
+            pos = shift_point(pos, (self.random.randint(-10, 10), self.random.randint(-50, 50)))
         image = self.canvas.draw_image(pos, image_file, behind=behind)
         self.images[place_name][insect] = image
 
-    def _throw(self, ant, colony):
-        """Animate a leaf thrown at a Bee."""
-        bee = ant.nearest_bee(colony.hive)  # nearest_bee logic from ants.py
-        if bee:
+    def _record_throw(self, event):
+        """Remember where a leaf was thrown, to animate it next turn."""
+        ant, bee = event.ant, event.bee
+        if ant.name in LEAF_COLORS and bee.place.name in self.place_points:
             start = shift_point(self.place_points[ant.place.name], LEAF_START_OFFSET)
             end = shift_point(self.place_points[bee.place.name], LEAF_END_OFFSET)
-            animate_leaf(self.canvas, start, end, color=LEAF_COLORS[ant.name])
+            self._throws.append((ant.name, start, end))
 
 def leaf_coords(pos, angle, length):
     """Return the coordinates of a leaf polygon."""
@@ -0,0 +1,113 @@
+"""The ants_layout module generates large layouts from a seed and a spec.
+
+A generated layout is a tree of tunnels.  Tunnels leave the queen, and each
+segment of a tunnel may branch at its far end into several segments, up to
+a number of levels.  Bees enter at the far end of every segment of the last
+level, so a map has many entrances, and the paths of bees from different
+entrances merge on their way to the queen.  Places are Water at a regular
+interval along each segment, like the moats of mixed_layout, or at random.
+
+A LayoutSpec describes a layout:
+
+    tunnels   the number of tunnels that leave the queen
+    length    (shortest, longest) number of places in a segment
+    branches  the most segments that a segment branches into
+    levels    the number of segments from the queen to an entrance
+    moat      every moat-th place of a segment is Water; 0 for none
+    water     the chance that any other place is Water
+
+Places are named as in mixed_layout, with segments numbered like tunnels,
+so the default spec makes the same places as dry_layout.  The layout is
+chosen by the seed alone, and it registers its places with the same
+register_place callback as the layouts of ants.py.  For example,
+
+    python3 ants_layout.py 'tunnels=100 length=50-150 branches=3 levels=3'
+"""
+
+import ants
+import random
+import time
+from collections import namedtuple
+from ucb import main
+
+LayoutSpec = namedtuple('LayoutSpec',
+                        'tunnels length branches levels moat water',
+                        defaults=(3, (8, 8), 1, 1, 0, 0.0))
+
+
+def generate(spec, seed=0):
+    """Return a layout function that registers the places of a layout
+    chosen at random from spec by seed.
+
+    >>> layout = generate(LayoutSpec(tunnels=2, length=(2, 3), branches=2,
+    ...                              levels=2, water=0.3), seed=1)
+    >>> names = []
+    >>> layout(ants.Place('AntQueen'), lambda p, entrance:
+    ...        names.append(p.name + ('*' if entrance else '')))
+    >>> names
+    ['tunnel_0_0', 'tunnel_0_1', 'water_1_0', 'tunnel_1_1', 'tunnel_1_2*', \
+'tunnel_2_0', 'water_2_1', 'water_2_2', 'tunnel_3_0', 'tunnel_3_1', \
+'tunnel_3_2*', 'tunnel_4_0', 'water_4_1', 'tunnel_4_2*']
+    """
+    low, high = spec.length
+    moat, water = spec.moat, spec.water
+    Place, Water = ants.Place, ants.Water
+    def layout(queen, register_place):
+        rng = random.Random(seed)
+        segments = [(queen, 1)] * spec.tunnels  # (exit, level) still to build
+        number = 0
+        while segments:
+            exit, level = segments.pop()
+            length = low + rng.randrange(high - low + 1)
+            last = level == spec.levels
+            suffix = '_{0}_'.format(number)
+            for step in range(length):
+                if moat and (step + 1) % moat == 0 or \
+                        water and rng.random() < water:
+                    exit = Water('water' + suffix + str(step), exit)
+                else:
+                    exit = Place('tunnel' + suffix + str(step), exit)
+                register_place(exit, last and step == length - 1)
+            number += 1
+            if not last:
+                branches = 1 + rng.randrange(spec.branches)
+                segments.extend([(exit, level + 1)] * branches)
+    return layout
+
+
+def parse_spec(text):
+    """Return the LayoutSpec described by text, a list of field=value pairs.
+    A length is a number or a low-high range.
+
+    >>> parse_spec('tunnels=100 length=5-20 water=0.1')
+    LayoutSpec(tunnels=100, length=(5, 20), branches=1, levels=1, moat=0, water=0.1)
+    """
+    fields = {}
+    for pair in text.split():
+        name, _, value = pair.partition('=')
+        if name == 'length':
+            low, _, high = value.partition('-')
+            fields[name] = (int(low), int(high or low))
+        elif name == 'water':
+            fields[name] = float(value)
+        else:
+            fields[name] = int(value)
+    return LayoutSpec(**fields)
+
+
+@main
+def run(*args):
+    import argparse
+    parser = argparse.ArgumentParser(description='Generate an Ants layout')
+    parser.add_argument('spec', nargs='?', default='',
+                        help="LayoutSpec fields, such as 'tunnels=10 levels=2'")
+    parser.add_argument('--seed', '-s', type=int, default=0)
+    args = parser.parse_args(args)
+    layout = generate(parse_spec(args.spec), args.seed)
+    start = time.perf_counter()
+    colony = ants.AntColony(None, ants.Hive(ants.AssaultPlan()),
+                            ants.ant_types(), layout)
+    seconds = time.perf_counter() - start
+    water = sum(isinstance(p, ants.Water) for p in colony.places.values())
+    print('{0} places ({1} water) and {2} entrances in {3:.3f}s'.format(
+        len(colony.places) - 1, water, len(colony.bee_entrances), seconds))
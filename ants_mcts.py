@@ -0,0 +1,354 @@
+"""The ants_mcts module plays Ants with a Monte Carlo tree search.
+
+MCTS is a strategy, so it is passed to start_with_strategy like
+interactive_strategy or AntsGUI.strategy.  Each turn it searches for a move
+for a time budget and then makes the move that it tried most.  A move is
+None, to do nothing, ('deploy', place id, ant name) or ('remove', place id),
+and the search makes one move per turn.
+
+The search plays the game forward on a fork of the colony, a copy made by
+pickling it, so the real game is never touched.  Each rollout restores the
+fork to the position of the real game from a snapshot, reseeds its random,
+and plays moves chosen by UCT down the tree of moves tried so far.  The tree
+is open-loop: a node stands for the moves that lead to it, whatever the bees
+did in between, so the random choices of the game are sampled anew by every
+rollout.  Below the tree, a playout policy plays the ants' side until the
+game ends or depth turns have passed since the real game's turn, and the
+rollout is valued from the ants' side, by whether they won and by the
+fraction of the bees that they killed:
+
+    1             the bees are all gone
+    0.25 to 0.75  the game goes on
+    0 to 0.25     the bees have reached the queen
+
+A playout policy is any strategy that does not interact.  PLAYOUTS holds
+those of this module:
+
+    random  make a random legal move each turn
+    idle    make no moves; quiet turns are skipped with fast_forward
+
+The search is anytime: it stops when the budget runs out, or after a number
+of rollouts if one is given, and the rollouts made so far choose the move.
+With workers, each worker process searches a tree of its own from the same
+fork for the whole budget, and the visits of their moves are added up.  The
+rollouts per second of every turn are reported, which measures the speed of
+the engine end to end.  For example,
+
+    python3 ants_mcts.py -f --budget 0.5 --workers 4
+    python3 ants_mcts.py -w --playout random --seed 3
+"""
+
+import ants
+import math
+import pickle
+import random
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from ucb import main
+
+# The move chosen on the turn at time, the rollouts and seconds of its search,
+# and the mean value of the rollouts that began with the move
+SearchReport = namedtuple('SearchReport', 'time move rollouts seconds value')
+
+
+#########
+# Moves #
+#########
+
+def legal_moves(colony):
+    """Return the moves that can be made in colony: None, the deployments
+    that the food of colony affords and the removals of ants.
+
+    An ant is not deployed into Water unless it is watersafe, and a Remover
+    or a second QueenAnt is never deployed, since removals are moves of their
+    own and an imposter queen expires.
+
+    >>> colony = ants.AntColony(None, ants.Hive(ants.AssaultPlan()),
+    ...                         ants.ant_types(), ants.test_layout, food=2)
+    >>> colony.deploy_ant('tunnel_0_0', 'Harvester')
+    >>> legal_moves(colony)
+    [None, ('remove', 1)]
+    """
+    kinds = [kind for kind in colony.ant_types.values()
+             if kind.food_cost <= colony.food and kind is not ants.AntRemover
+             and not (kind is ants.QueenAnt and colony.queen_count)]
+    moves = [None]
+    for place in colony.places.values():
+        if place is colony.hive:
+            continue
+        ant, water = place.ant, isinstance(place, ants.Water)
+        for kind in kinds:
+            if water and not kind.watersafe:
+                continue
+            if ant is None or (kind.container and not ant.container) or \
+                    (ant.container and ant.ant is None and not kind.container):
+                moves.append(('deploy', place.id, kind.name))
+        if ant is not None and \
+                not (type(ant) is ants.QueenAnt and not ant.imposter):
+            moves.append(('remove', place.id))
+    return moves
+
+
+def play_move(colony, move):
+    """Make move in colony."""
+    if move is None:
+        return
+    if move[0] == 'deploy':
+        colony.deploy_ant(move[1], move[2])
+    else:
+        colony.remove_ant(move[1])
+
+
+def step(colony, move):
+    """Make move in colony and finish its turn, and then launch the bees of
+    the next turn if the game goes on, so that colony waits for a move."""
+    play_move(colony, move)
+    colony.insects_act()
+    if not colony.game_over:
+        colony.hive.strategy(colony)
+
+
+############
+# Rollouts #
+############
+
+def random_playout(colony):
+    """A playout policy that makes a random legal move each turn."""
+    play_move(colony, colony.random.choice(legal_moves(colony)))
+
+
+def idle_playout(colony):
+    """A playout policy that makes no moves."""
+
+
+PLAYOUTS = OrderedDict([('random', random_playout), ('idle', idle_playout)])
+
+
+def outcome(colony):
+    """Return the value of colony for the ants, between 0 and 1."""
+    alive = colony.bees_remaining + \
+        ants.count_bees(colony.queen.colony_location.bees)
+    killed = (colony.bee_total - alive) / colony.bee_total
+    if colony.queen.breached:
+        return 0.25 * killed
+    if colony.bees_remaining == 0:
+        return 1.0
+    return 0.25 + 0.5 * killed
+
+
+def rollout(colony, horizon, playout, fast_forward=False):
+    """Play colony, which waits for a move, with playout until the game ends
+    or its time reaches horizon.
+
+    fast_forward -- skip quiet turns, for a playout that acts only when bees
+                    are in play; see AntColony.fast_forward
+    """
+    while not colony.game_over and colony.time < horizon:
+        playout(colony)
+        colony.insects_act()
+        if colony.game_over:
+            break
+        if fast_forward:
+            colony.fast_forward()
+        colony.hive.strategy(colony)
+
+
+##########
+# Search #
+##########
+
+class Node(object):
+    """The rollouts made through a sequence of moves from the root."""
+
+    __slots__ = ('children', 'visits', 'value')
+
+    def __init__(self):
+        self.children = {}  # Move -> Node
+        self.visits = 0
+        self.value = 0.0    # Sum of the values of the rollouts
+
+    def select(self, moves, rng, exploration):
+        """Return the move to make from this node, one of moves, and whether
+        it is new to the tree.  Moves not yet tried are tried first, in a
+        random order, and then the move with the greatest UCT bound."""
+        children = self.children
+        untried = [move for move in moves if move not in children]
+        if untried:
+            return rng.choice(untried), True
+        scale = exploration * math.sqrt(math.log(self.visits))
+        def bound(move):
+            child = children[move]
+            return child.value / child.visits + scale / math.sqrt(child.visits)
+        return max(moves, key=bound), False
+
+
+def search(data, seed, budget, rollouts=None, depth=20, playout=random_playout,
+           exploration=1.4, fast_forward=False, table=None):
+    """Search the colony pickled in data for budget seconds, or until it has
+    made rollouts rollouts, and return an OrderedDict from each move tried at
+    the root to its (visits, value), and the number of rollouts made.  Runs
+    in a worker process.
+
+    seed -- the seed of the random choices of the search and of the game
+    table -- the capacity of a TranspositionTable that memoizes the values
+             of the positions reached at the leaves of the tree, or None
+    """
+    colony = pickle.loads(data)
+    start, horizon = colony.snapshot(), colony.time + depth
+    rng = random.Random(seed)
+    memo = ants.TranspositionTable(table) if table else None
+    def evaluate(colony):
+        rollout(colony, horizon, playout, fast_forward)
+        return outcome(colony)
+    root, made = Node(), 0
+    deadline = time.perf_counter() + budget
+    while rollouts is None or made < rollouts:
+        if made and time.perf_counter() >= deadline:
+            break
+        colony.restore(start)
+        colony.random.seed(rng.getrandbits(64))
+        node, path = root, [root]
+        while not colony.game_over and colony.time < horizon:
+            move, new = node.select(legal_moves(colony), rng, exploration)
+            if new:
+                node.children[move] = Node()
+            node = node.children[move]
+            path.append(node)
+            step(colony, move)
+            if new:
+                break
+        if memo is None:
+            value = evaluate(colony)
+        else:
+            value = memo.lookup(colony, evaluate)
+        for node in path:
+            node.visits += 1
+            node.value += value
+        made += 1
+    stats = OrderedDict((move, (child.visits, child.value))
+                        for move, child in root.children.items())
+    return stats, made
+
+
+class MCTS(object):
+    """A strategy that makes the move found by a Monte Carlo tree search of
+    budget seconds each turn, and keeps a SearchReport of each turn in
+    reports.
+
+    budget -- seconds to search each turn
+    workers -- number of worker processes; 0 searches in this process
+    playout -- the playout policy of rollouts, a strategy
+    depth -- turns after the real game's turn at which rollouts stop
+    rollouts -- the most rollouts of each worker each turn, or None
+    exploration -- the exploration constant of UCT
+    seed -- the seed of the random choices of the search
+    fast_forward -- whether rollouts skip quiet turns; by default, only
+                    when playout is idle_playout
+    table -- the capacity of a TranspositionTable for the values of
+             positions in each search, or None
+
+    Searches that make a fixed number of rollouts in this process make the
+    same moves for the same seed.
+
+    >>> strategy = MCTS(rollouts=200, seed=0)
+    >>> result = ants.play_game(ants.test_layout, ants.make_test_assault_plan,
+    ...                         strategy, seed=1)
+    >>> result.winner, result.turns == len(strategy.reports)
+    ('ants', True)
+    """
+
+    def __init__(self, budget=0.1, workers=0, playout=random_playout, depth=20,
+                 rollouts=None, exploration=1.4, seed=None, fast_forward=None,
+                 table=None):
+        self.budget = budget
+        self.workers = workers
+        self.playout = playout
+        self.depth = depth
+        self.rollouts = rollouts
+        self.exploration = exploration
+        self.random = random.Random(seed)
+        if fast_forward is None:
+            fast_forward = playout is idle_playout
+        self.fast_forward = fast_forward
+        self.table = table
+        self.reports = []  # A SearchReport for each turn
+        self._pool = None  # A ProcessPoolExecutor, made by the first search
+
+    def __call__(self, colony):
+        play_move(colony, self.choose(colony))
+
+    def choose(self, colony):
+        """Search colony and return the move to make."""
+        start = time.perf_counter()
+        data = pickle.dumps(colony, pickle.HIGHEST_PROTOCOL)
+        options = (self.budget, self.rollouts, self.depth, self.playout,
+                   self.exploration, self.fast_forward, self.table)
+        if self.workers == 0:
+            results = [search(data, self.random.getrandbits(64), *options)]
+        else:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers)
+            futures = [self._pool.submit(search, data, self.random.getrandbits(64),
+                                         *options)
+                       for _ in range(self.workers)]
+            results = [future.result() for future in futures]
+        totals, made = OrderedDict(), 0
+        for stats, rollouts in results:
+            made += rollouts
+            for move, (visits, value) in stats.items():
+                total = totals.setdefault(move, [0, 0.0])
+                total[0] += visits
+                total[1] += value
+        move, value = None, None
+        if totals:
+            move, (visits, value) = max(totals.items(), key=lambda m: m[1])
+            value /= visits
+        self.reports.append(SearchReport(colony.time, move, made,
+                                         time.perf_counter() - start, value))
+        return move
+
+    @property
+    def rollouts_per_second(self):
+        """The rollouts made per second of search, over every turn."""
+        seconds = sum(r.seconds for r in self.reports)
+        rollouts = sum(r.rollouts for r in self.reports)
+        return rollouts / seconds if seconds else 0.0
+
+    def report(self):
+        """Return a summary of the searches made, for a person to read."""
+        return '{0} turns searched with {1} rollouts ({2:.0f} rollouts/s)' \
+            .format(len(self.reports), sum(r.rollouts for r in self.reports),
+                    self.rollouts_per_second)
+
+    def close(self):
+        """Shut down the worker processes, if any."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+@main
+def run(*args):
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Play Ants with a Monte Carlo tree search',
+        epilog='Other options, such as -f and --seed, are those of ants.py')
+    parser.add_argument('--budget', '-b', type=float, default=0.1,
+                        help='seconds to search each turn')
+    parser.add_argument('--workers', '-j', type=int, default=0)
+    parser.add_argument('--depth', '-d', type=int, default=20,
+                        help='turns ahead at which rollouts stop')
+    parser.add_argument('--playout', choices=list(PLAYOUTS), default='random')
+    parser.add_argument('--rollouts', '-r', type=int, default=None,
+                        help='most rollouts of each worker each turn')
+    parser.add_argument('--table', '-t', type=int, default=None,
+                        help='capacity of a transposition table')
+    options, rest = parser.parse_known_args(args)
+    strategy = MCTS(options.budget, options.workers, PLAYOUTS[options.playout],
+                    options.depth, options.rollouts, table=options.table)
+    try:
+        ants.start_with_strategy(rest, strategy)
+    finally:
+        strategy.close()
+    print(strategy.report())
@@ -0,0 +1,1163 @@
+"""The ants_numpy module simulates Ants Vs. SomeBees with NumPy arrays.
+
+An ArrayColony plays the same game as an ants.AntColony built from the same
+arguments, but it keeps no Insect objects.  The state of the bees (armor,
+place, arrival order and status effect timers) is kept in arrays indexed by
+bee, and the state of the ants (type, armor, digestion and a contained ant)
+in arrays indexed by integer place ids.  Each turn,
+
+  - the hive launches its wave with one random choice per bee,
+  - ants act one at a time, since each throw can change the next ant's target,
+  - bees act together: bees in places without a blocking ant advance in one
+    array operation, and only the bees of blocked places are handled place
+    by place, one sting or death at a time.
+
+Games of an ArrayColony and an AntColony with the same seed and the same
+deployments have the same outcome, so the array engine can stand in for the
+object engine in large sweeps.  It is much faster when there are thousands
+of bees; with a few dozen, AntColony is about as fast.
+
+Like play_game, each ArrayColony has its own true QueenAnt: the first Queen
+deployed in it is never an imposter.  ArrayColony emits no game events.
+
+A ColonyBatch plays many games of one layout and assault plan together,
+stepping all of them with each array operation, for strategies that learn
+from the dense observations it returns.
+
+>>> import ants
+>>> def strategy(colony):
+...     if colony.time == 0:
+...         colony.deploy_ant('tunnel_0_0', 'Thrower')
+>>> hive = ants.Hive(ants.make_test_assault_plan())
+>>> colony = ArrayColony(strategy, hive, ants.ant_types(), ants.test_layout)
+>>> colony.simulate()
+>>> colony.time, colony.breached, colony.places['tunnel_0_0'].ant
+(8, False, ArrayAnt(name='Thrower', armor=1, ant=None))
+"""
+
+import ants
+import bisect
+import random
+import numpy as np
+from collections import OrderedDict, namedtuple
+
+# How an ant type acts, and how it takes damage
+NONE, HARVEST, THROW, SLOW, STUN, QUEEN, NINJA, HUNGRY, GUARD = range(9)
+FIRE = 1
+
+# The current status effect of a bee
+SLOWED, STUNNED = 1, 2
+
+ArrayAnt = namedtuple('ArrayAnt', 'name armor ant')
+ArraySnapshot = namedtuple('ArraySnapshot', 'counters random arrays queens')
+
+
+def choices(rng, n, count):
+    """Return an array of count random indices below n, drawn from rng just
+    as count calls of rng.choice on a sequence of length n would draw them.
+
+    A random.Random chooses an index with getrandbits(k), for the k bits of
+    n, which takes the top k bits of one 32-bit output of its Mersenne
+    Twister, and draws again while the index is out of range.  getrandbits
+    of a multiple of 32 bits packs as many outputs, the first in the lowest
+    bits, so one call draws a batch of outputs that give the same indices at
+    once.  Both must stay in sync with the random module; the doctest below
+    checks that they do.
+
+    >>> rng, copy = random.Random(1), random.Random(1)
+    >>> choices(rng, 3, 500).tolist() == [copy.choice(range(3)) for _ in range(500)]
+    True
+    >>> rng.random() == copy.random()
+    True
+    """
+    if type(rng) is not random.Random or count < 16 or n >= 2 ** 32:
+        return np.array([rng.choice(range(n)) for _ in range(count)], np.int64)
+    start = rng.getstate()
+    shift = 32 - n.bit_length()
+    outputs, accepted = [], 0
+    while accepted < count:  # At least half of all outputs are accepted
+        size = 2 * (count - accepted) + 64
+        raw = rng.getrandbits(32 * size).to_bytes(4 * size, 'little')
+        drawn = np.frombuffer(raw, '<u4') >> shift
+        outputs.append(drawn)
+        accepted += int((drawn < n).sum())
+    drawn = np.concatenate(outputs)
+    used = np.flatnonzero(drawn < n)[:count]
+    rng.setstate(start)
+    rng.getrandbits(32 * (int(used[-1]) + 1))  # The outputs that were used
+    return drawn[used].astype(np.int64)
+
+
+class AntKind(object):
+    """The behavior and attributes shared by all ants of one type."""
+
+    actions = [(ants.Insect.action, NONE),
+               (ants.HarvesterAnt.action, HARVEST),
+               (ants.NinjaAnt.action, NINJA),
+               (ants.HungryAnt.action, HUNGRY),
+               (ants.BodyguardAnt.action, GUARD)]
+    throws = [(ants.ThrowerAnt.throw_at, THROW),
+              (ants.SlowThrower.throw_at, SLOW),
+              (ants.StunThrower.throw_at, STUN)]
+    reduce_armors = [(ants.Insect.reduce_armor, NONE),
+                     (ants.FireAnt.reduce_armor, FIRE),
+                     (ants.BodyguardAnt.reduce_armor, GUARD)]
+
+    def __init__(self, ant_type):
+        """Describe ant_type, which must behave like one of the ant types of
+        the ants module; otherwise a ValueError is raised."""
+        self.name = ant_type.name
+        self.food_cost = ant_type.food_cost
+        self.damage = ant_type.damage
+        self.blocks_path = ant_type.blocks_path
+        self.container = ant_type.container
+        self.watersafe = ant_type.watersafe
+        self.is_queen = ant_type is ants.QueenAnt
+        self.armor = (ant_type(False) if self.is_queen else ant_type()).armor
+        if self.is_queen or ant_type.action is ants.ThrowerAnt.action:
+            self.action = self.lookup(ant_type, 'throw_at', self.throws)
+            self.lookup(ant_type, 'nearest_bee', [(ants.ThrowerAnt.nearest_bee,
+                                                   None)])
+            self.min_range = ant_type.min_range
+            self.max_range = ant_type.max_range
+            if self.is_queen:
+                self.action = QUEEN
+        else:
+            self.action = self.lookup(ant_type, 'action', self.actions)
+        if self.action == HUNGRY:
+            self.lookup(ant_type, 'eat_bee', [(ants.HungryAnt.eat_bee, None)])
+            self.time_to_digest = ant_type.time_to_digest
+        self.reduce_armor = self.lookup(ant_type, 'reduce_armor',
+                                        self.reduce_armors)
+        self.lookup(ant_type, 'adjusted_damage',
+                    [(ants.Ant.adjusted_damage, None)])
+
+    @staticmethod
+    def lookup(ant_type, method_name, choices):
+        """Return the behavior of the known method that ant_type uses."""
+        method = getattr(ant_type, method_name)
+        for known, behavior in choices:
+            if method is known:
+                return behavior
+        raise ValueError('ArrayColony cannot simulate {0}.{1}'.format(
+                         ant_type.__name__, method_name))
+
+
+class ArrayPlace(object):
+    """A view of one place of an ArrayColony.
+
+    ant -- an ArrayAnt for the ant in this place, or None
+    bees -- the ids of the bees in this place, in the order they arrived
+    """
+
+    def __init__(self, colony, id, name):
+        self.colony = colony
+        self.id = id
+        self.name = name
+        self.exit = self.entrance = None
+
+    @property
+    def ant(self):
+        return self.colony._ant_at(self.id)
+
+    @property
+    def bees(self):
+        return self.colony._bees_at(self.id)
+
+    def __str__(self):
+        return self.name
+
+
+class ArrayColony(object):
+    """An ant colony whose game state is kept in NumPy arrays.
+
+    An ArrayColony is created with the same arguments as an ants.AntColony,
+    and strategies can use the same attributes: time, food, random,
+    ant_types, places (of ArrayPlaces), deploy_ant and remove_ant.
+
+    Place ids follow the order in which places are registered: the Hive is
+    0, the registered places follow, and the queen's own location is last.
+    """
+
+    # The arrays that change during a game, copied by snapshot
+    state_arrays = ('_queen_places', '_ant_kind', '_ant_armor',
+                    '_ant_digesting', '_ant_imposter', '_inner_kind',
+                    '_inner_armor', '_inner_digesting', '_inner_imposter',
+                    '_blocks', '_bee_armor', '_bee_place', '_bee_order',
+                    '_stun', '_slow', '_effect', '_affected', '_bee_counts')
+
+    def __init__(self, strategy, hive, ant_types, create_places, food=4,
+                 seed=None):
+        """Create an ArrayColony for simulating a game.
+
+        Arguments:
+        strategy -- a function to deploy ants to places
+        hive -- a Hive full of bees
+        ant_types -- a list of ant constructors
+        create_places -- a function that creates the set of places
+        seed -- an integer seed for the colony's random; chosen if None
+        """
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.time = 0
+        self.food = food
+        self.ants_deployed = 0
+        self.ants_removed = 0
+        self.queen_count = 0
+        self.strategy = strategy
+        self.ant_types = OrderedDict((a.name, a) for a in ant_types)
+        self.kinds = [AntKind(a) for a in ant_types]
+        self._codes = dict((kind.name, i) for i, kind in enumerate(self.kinds))
+        self.configure(hive, create_places)
+        self.load_plan(hive.assault_plan)
+
+    def configure(self, hive, create_places):
+        """Compile the places created by create_places into arrays, from the
+        LayoutGraph shared with AntColony; see ants.compile_layout."""
+        self.graph = graph = ants.compile_layout(create_places)
+        self.queen_id = n = len(graph.names)
+        self.places = OrderedDict()
+        self._places = views = [ArrayPlace(self, i, name)  # Indexed by id
+                                for i, name in enumerate(graph.names)]
+        for view in views:
+            self.places[view.name] = view
+        self._exit = np.array(graph.exits, np.int64)
+        self._water = np.array([issubclass(kind, ants.Water)
+                                for kind in graph.kinds] + [False])
+        for view in views[1:]:
+            exit, entrance = graph.exits[view.id], graph.entrances[view.id]
+            view.exit = views[exit] if 0 <= exit < n else None
+            view.entrance = views[entrance] if entrance >= 0 else None
+        self._hive_exits = list(graph.bee_entrances)
+        self._tunnel = np.array(graph.tunnel + (-1,), np.int64)
+        self._depth = np.array(graph.depth + (-1,), np.int64)
+        self._tunnels = [list(tunnel) for tunnel in graph.tunnels]
+        if (self._tunnel[1:n] < 0).any():
+            raise ValueError('ArrayColony needs every place in a tunnel')
+        self._tunnel_queens = [[] for _ in self._tunnels]  # Sorted depths
+        self._queen_places = np.zeros(n + 1, bool)
+        self._queen_places[n] = True
+        # Ants, indexed by place; the ant in a place and the ant it contains
+        self._ant_kind = np.full(n + 1, -1, np.int64)
+        self._ant_armor = np.zeros(n + 1, np.int64)
+        self._ant_digesting = np.zeros(n + 1, np.int64)
+        self._ant_imposter = np.zeros(n + 1, bool)
+        self._inner_kind = np.full(n + 1, -1, np.int64)
+        self._inner_armor = np.zeros(n + 1, np.int64)
+        self._inner_digesting = np.zeros(n + 1, np.int64)
+        self._inner_imposter = np.zeros(n + 1, bool)
+        self._blocks = np.zeros(n + 1, bool)
+
+    def load_plan(self, plan):
+        """Put the bees of an AssaultPlan in the hive, as arrays indexed in
+        the order of plan.all_bees.  Each Swarm adds count bees."""
+        plan.check_targets(len(self._hive_exits))
+        waves, armor = {}, []
+        for time, wave in plan.items():
+            start = len(armor)
+            for bee in wave:
+                armor.extend([bee.armor] * bee.count)
+            waves[time] = np.arange(start, len(armor))
+        self._waves = waves
+        self._targets = plan.targets
+        self._bee_armor = np.array(armor, np.int64)
+        self._bee_place = np.zeros(len(armor), np.int64)  # -1 once expired
+        self._bee_order = np.arange(len(armor), dtype=np.int64)
+        self._next_order = len(armor)  # Order of the next bee to arrive
+        self._stun = np.zeros(len(armor), np.int64)
+        self._slow = np.zeros(len(armor), np.int64)
+        self._effect = np.zeros(len(armor), np.int64)  # SLOWED or STUNNED
+        self._affected = np.zeros(len(armor), bool)
+        self._moved_from = None
+        self._count_bees()
+
+    def _count_bees(self):
+        """Count the bees in each place."""
+        alive = self._bee_place[self._bee_place >= 0]
+        self._bee_counts = np.bincount(alive, minlength=self.queen_id + 1)
+
+    # Playing
+
+    @property
+    def breached(self):
+        """Whether any bee has reached the queen."""
+        return bool(self._bee_counts[self._queen_places].any())
+
+    @property
+    def bee_count(self):
+        """The number of bees in the hive and the tunnels."""
+        return int(self._bee_counts[:self.queen_id].sum())
+
+    @property
+    def game_over(self):
+        return self.breached or self.bee_count == 0
+
+    def simulate(self):
+        """Simulate an attack on the ant colony (i.e., play the game)."""
+        while not self.game_over:
+            self.turn()
+
+    def turn(self):
+        """Play one turn of the game."""
+        self._launch()              # Bees invade
+        self.strategy(self)         # Ants deploy
+        self._ants_act()            # Ants take actions
+        self._bees_act()            # Bees take actions
+        self.time += 1
+
+    def _launch(self):
+        """Move the bees of this turn's wave to the entrances of their
+        targets, as Hive.choose_exits chooses them."""
+        wave = self._waves.get(self.time)
+        if wave is not None and len(wave):
+            exits = np.array(self._hive_exits, np.int64)
+            start = 0
+            for count, target in self._targets.get(self.time,
+                                                   [(len(wave), None)]):
+                bees = wave[start:start+count]
+                start += count
+                if target is None:
+                    chosen = choices(self.random, len(exits), count)
+                elif isinstance(target, int):
+                    chosen = target
+                else:
+                    chosen = self.random.choices(range(len(exits)),
+                                                 cum_weights=target, k=count)
+                self._bee_place[bees] = exits[chosen]
+            self._bee_order[wave] = self._next_order + np.arange(len(wave))
+            self._next_order += len(wave)
+            self._count_bees()
+
+    def _ants_act(self):
+        """Each ant with armor takes its action, in order of place."""
+        for place in np.flatnonzero(self._ant_kind >= 0).tolist():
+            if self._ant_armor[place] > 0:
+                self._act(place, self._ant_kind[place], False)
+
+    def _act(self, place, code, inner):
+        """The ant of kind code in place takes its action; inner is whether
+        it is contained in a BodyguardAnt."""
+        kind = self.kinds[code]
+        action = kind.action
+        if action == HARVEST:
+            self.food += 1
+        elif action == GUARD:
+            if self._inner_kind[place] >= 0:
+                self._act(place, self._inner_kind[place], True)
+        elif action == NINJA:
+            self._hurt_bees(place, kind.damage)
+        elif action == HUNGRY:
+            digesting = self._inner_digesting if inner else self._ant_digesting
+            if digesting[place]:
+                digesting[place] -= 1
+            else:
+                bee = self._random_bee(place)
+                if bee is not None:
+                    self._hurt_bee(bee, self._bee_armor[bee])
+                    digesting[place] = kind.time_to_digest
+        elif action != NONE:
+            if action == QUEEN:
+                imposter = self._inner_imposter if inner else self._ant_imposter
+                if imposter[place]:
+                    if inner:  # As when a contained ant expires in AntColony
+                        raise AssertionError('Ant is not in ' +
+                                             self._name(place))
+                    self._hurt(place, self._ant_armor[place])
+                    return
+                self._queen_places[place] = True
+            bee = self._nearest_bee(place, kind)
+            if bee is not None:
+                if action == SLOW:
+                    self._apply_effect(bee, SLOWED, 3)
+                elif action == STUN:
+                    self._apply_effect(bee, STUNNED, 1)
+                else:
+                    self._hurt_bee(bee, self._adjusted(place, kind.damage))
+
+    def _bees_act(self):
+        """Each bee in a tunnel takes its action, in order of place and then
+        of arrival.  Bees that move this turn arrive in that order too."""
+        places = self._bee_place
+        acting = np.flatnonzero((places > 0) & (places < self.queen_id))
+        if not len(acting):
+            return
+        acting = acting[np.argsort(self._by_place(places[acting], acting))]
+        at = places[acting]
+        affected = self._affected[acting]
+        effect = self._effect[acting]
+        moves = ~affected | ((effect == SLOWED) & (self.time % 2 == 0))
+        movers = acting[moves & ~self._blocks[at]]
+        self._moved_from = np.zeros(len(places), np.int64)
+        self._moved_from[movers] = places[movers]
+        places[movers] = self._exit[places[movers]]
+        stingers = acting[moves & self._blocks[at]]
+        if len(stingers):
+            at = places[stingers]
+            starts = np.flatnonzero(np.r_[True, at[1:] != at[:-1]])
+            ends = np.r_[starts[1:], len(at)]
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                self._sting(int(at[start]), stingers[start:end])
+        moved = np.flatnonzero(self._moved_from)
+        moved = moved[np.argsort(self._by_place(self._moved_from[moved],
+                                                moved))]
+        self._bee_order[moved] = self._next_order + np.arange(len(moved))
+        self._next_order += len(moved)
+        self._moved_from = None
+        self._tick_effects(acting[affected])
+        self._count_bees()
+
+    def _by_place(self, places, bees):
+        """Return keys that sort bees by place, then by order of arrival."""
+        return places * self._next_order + self._bee_order[bees]
+
+    def _sting(self, place, bees):
+        """The bees of a blocked place take their turns, in order.  Each
+        stings the ant in place until it expires; after that, they advance
+        unless another ant blocks their path."""
+        armor, places = self._ant_armor, self._bee_place
+        while len(bees):
+            if not self._blocks[place]:
+                self._moved_from[bees] = place
+                places[bees] = self._exit[place]
+                return
+            stings = int(armor[place])
+            if stings <= 0:
+                if self.kinds[self._ant_kind[place]].is_queen and \
+                        not self._ant_imposter[place]:
+                    armor[place] -= len(bees)  # The true QueenAnt stays
+                    return
+                stings = 1
+            if len(bees) < stings:
+                armor[place] -= len(bees)
+                return
+            armor[place] -= stings - 1
+            self._hurt(place, 1)
+            bees = bees[stings:]
+            bees = bees[places[bees] == place]
+
+    def _tick_effects(self, bees):
+        """Count down the status effects of bees that acted while affected,
+        switching to the other effect when the current one runs out."""
+        stun, slow = self._stun[bees], self._slow[bees]
+        stun -= stun >= 1
+        slow -= slow >= 1
+        self._stun[bees], self._slow[bees] = stun, slow
+        effect = self._effect[bees]
+        done = (stun == 0) & (slow == 0)
+        switch = ~done & (np.where(effect == SLOWED, slow, stun) == 0)
+        self._affected[bees[done]] = False
+        self._effect[bees[switch]] = SLOWED + STUNNED - effect[switch]
+
+    def _apply_effect(self, bee, effect, duration):
+        timers = self._slow if effect == SLOWED else self._stun
+        timers[bee] = duration
+        self._effect[bee] = effect
+        self._affected[bee] = True
+
+    # Bees
+
+    def _bees_at(self, place):
+        """Return the ids of the bees in place, in the order they arrived."""
+        bees = np.flatnonzero(self._bee_place == place)
+        return bees[np.argsort(self._bee_order[bees])].tolist()
+
+    def _present(self, place):
+        """Return the ids of the bees in place.  While bees act, bees that
+        have moved in from places that have not yet acted do not count."""
+        present = self._bee_place == place
+        if self._moved_from is not None:
+            present &= self._moved_from < place
+        return np.flatnonzero(present)
+
+    def _random_bee(self, place):
+        """Return a random bee in place, chosen as random_or_none would."""
+        count = self._bee_counts[place]
+        if count == 0:
+            return None
+        return self._bees_at(place)[self.random.choice(range(count))]
+
+    def _nearest_bee(self, place, kind):
+        tunnel = self._tunnels[self._tunnel[place]]
+        depth = self._depth[place]
+        near = depth + kind.min_range
+        far = min(near + kind.max_range, len(tunnel) - 1)
+        for depth in range(near, far + 1):
+            if self._bee_counts[tunnel[depth]]:
+                return self._random_bee(tunnel[depth])
+        return None
+
+    def _hurt_bee(self, bee, amount):
+        self._bee_armor[bee] -= amount
+        if self._bee_armor[bee] <= 0:
+            self._bee_counts[self._bee_place[bee]] -= 1
+            self._bee_place[bee] = -1
+
+    def _hurt_bees(self, place, amount):
+        """Reduce the armor of every bee in place by amount."""
+        bees = self._present(place)
+        self._bee_armor[bees] -= amount
+        expired = bees[self._bee_armor[bees] <= 0]
+        self._bee_place[expired] = -1
+        self._bee_counts[place] -= len(expired)
+
+    # Ants
+
+    def _adjusted(self, place, damage):
+        """The damage of an ant in place, doubled if a queen is behind it."""
+        queens = self._tunnel_queens[self._tunnel[place]]
+        if queens and queens[-1] > self._depth[place]:
+            return 2 * damage
+        return damage
+
+    def _ant_state(self, place, inner=False):
+        if inner:
+            return (self._inner_kind[place], self._inner_armor[place],
+                    self._inner_digesting[place], self._inner_imposter[place])
+        return (self._ant_kind[place], self._ant_armor[place],
+                self._ant_digesting[place], self._ant_imposter[place])
+
+    def _set_ant(self, place, state, inner=False):
+        """Set the ant (or contained ant) of place from a (kind, armor,
+        digesting, imposter) state; a kind of -1 leaves no ant."""
+        code, armor, digesting, imposter = state
+        if inner:
+            self._inner_kind[place], self._inner_armor[place] = code, armor
+            self._inner_digesting[place] = digesting
+            self._inner_imposter[place] = imposter
+            return
+        old = self._ant_kind[place]
+        self._ant_kind[place], self._ant_armor[place] = code, armor
+        self._ant_digesting[place] = digesting
+        self._ant_imposter[place] = imposter
+        self._blocks[place] = code >= 0 and self.kinds[code].blocks_path
+        was_queen = old >= 0 and self.kinds[old].is_queen
+        is_queen = code >= 0 and self.kinds[code].is_queen
+        if was_queen != is_queen:
+            queens = self._tunnel_queens[self._tunnel[place]]
+            if was_queen:
+                queens.remove(self._depth[place])
+            else:
+                bisect.insort(queens, self._depth[place])
+
+    def _remove(self, place):
+        self._set_ant(place, (-1, 0, 0, False))
+        self._set_ant(place, (-1, 0, 0, False), True)
+
+    def _add(self, place, state):
+        """Add an ant to place, as Place.add_insect and Water.add_insect."""
+        code, inner = state[0], False
+        outer = self._ant_kind[place]
+        if outer < 0:
+            self._set_ant(place, state)
+        elif (self.kinds[outer].container and self._inner_kind[place] < 0
+              and not self.kinds[code].container):
+            self._set_ant(place, state, True)
+            inner = True
+        elif self.kinds[code].container and not self.kinds[outer].container:
+            self._set_ant(place, self._ant_state(place), True)
+            self._set_ant(place, state)
+        else:
+            raise AssertionError('Two ants in ' + self._name(place))
+        if self._water[place] and not self.kinds[code].watersafe:
+            if inner:  # As when a contained ant expires in AntColony
+                raise AssertionError('Ant is not in ' + self._name(place))
+            self._hurt(place, self._ant_armor[place])
+
+    def _hurt(self, place, amount):
+        """Reduce the armor of the ant in place by amount, and remove it if
+        it has no armor remaining, as its reduce_armor method would."""
+        kind = self.kinds[self._ant_kind[place]]
+        if kind.reduce_armor == GUARD and self._inner_kind[place] >= 0 \
+                and amount >= self._ant_armor[place]:
+            inner = self._ant_state(place, True)
+            self._remove(place)
+            self._add(place, inner)
+            return
+        if kind.reduce_armor == FIRE and self._ant_armor[place] <= amount:
+            self._hurt_bees(place, self._adjusted(place, kind.damage))
+        self._ant_armor[place] -= amount
+        if self._ant_armor[place] <= 0:
+            if not kind.is_queen or self._ant_imposter[place]:
+                self._remove(place)
+
+    def _ant_at(self, place):
+        code = self._ant_kind[place]
+        if code < 0:
+            return None
+        inner = self._inner_kind[place]
+        contained = None
+        if inner >= 0:
+            contained = ArrayAnt(self.kinds[inner].name,
+                                 int(self._inner_armor[place]), None)
+        return ArrayAnt(self.kinds[code].name, int(self._ant_armor[place]),
+                        contained)
+
+    def _name(self, place):
+        return list(self.places)[place]
+
+    # Strategies
+
+    def find_place(self, place):
+        """Return the ArrayPlace with the id or the name place."""
+        if isinstance(place, int):
+            return self._places[place]
+        return self.places[place]
+
+    def deploy_ant(self, place_name, ant_type_name):
+        """Place an ant if enough food is available."""
+        code = self._codes[ant_type_name]
+        kind = self.kinds[code]
+        if self.food < kind.food_cost:
+            return
+        imposter = kind.is_queen and self.queen_count > 0
+        place = self.find_place(place_name).id
+        self._add(place, (code, kind.armor, 0, imposter))
+        if kind.is_queen:
+            self.queen_count += 1
+        self.food -= kind.food_cost
+        self.ants_deployed += 1
+
+    def remove_ant(self, place_name):
+        """Remove an Ant from the Colony."""
+        place = self.find_place(place_name).id
+        code = self._ant_kind[place]
+        if code >= 0:
+            if self.kinds[code].is_queen and not self._ant_imposter[place]:
+                return  # The true QueenAnt stays in her place
+            self.ants_removed += 1 if self._inner_kind[place] < 0 else 2
+            self._remove(place)
+
+    @property
+    def ants(self):
+        """The ants in places, in place order, as ArrayAnts."""
+        return [self._ant_at(p) for p in np.flatnonzero(self._ant_kind >= 0)]
+
+    def snapshot(self):
+        """Return an ArraySnapshot of the game state, from which restore
+        continues the game exactly as it would have continued from now."""
+        counters = (self.time, self.food, self.ants_deployed,
+                    self.ants_removed, self.queen_count, self._next_order)
+        arrays = dict((name, getattr(self, name).copy())
+                      for name in self.state_arrays)
+        queens = [depths[:] for depths in self._tunnel_queens]
+        return ArraySnapshot(counters, self.random.getstate(), arrays, queens)
+
+    def restore(self, snapshot):
+        """Return the game to the state recorded by snapshot."""
+        (self.time, self.food, self.ants_deployed, self.ants_removed,
+         self.queen_count, self._next_order) = snapshot.counters
+        self.random.setstate(snapshot.random)
+        for name, value in snapshot.arrays.items():
+            setattr(self, name, value.copy())
+        self._tunnel_queens = [depths[:] for depths in snapshot.queens]
+
+    def state(self):
+        """Return an ants.GameState that summarizes the game, as
+        AntColony.state does, for comparing the two engines."""
+        effects = {SLOWED: 'slow', STUNNED: 'stun'}
+        places = []
+        for view in list(self.places.values())[1:]:
+            counts = {}
+            for bee in view.bees:
+                effect = effects[self._effect[bee]] if self._affected[bee] \
+                    else ''
+                key = (int(self._bee_armor[bee]), int(self._stun[bee]),
+                       int(self._slow[bee]), effect)
+                counts[key] = counts.get(key, 0) + 1
+            places.append((view.name, self._game_ant_state(view.id),
+                           tuple(sorted(counts.items()))))
+        return ants.GameState(self.time, self.food, self.breached,
+                              self.ants_deployed, self.ants_removed,
+                              int(self._bee_counts[0]), tuple(places))
+
+    def _game_ant_state(self, place, inner=False):
+        code, armor, digesting, imposter = self._ant_state(place, inner)
+        if code < 0:
+            return None
+        contained = None if inner else self._game_ant_state(place, True)
+        return (self.kinds[code].name, int(armor), int(digesting),
+                bool(imposter), contained)
+
+
+Observation = namedtuple('Observation', 'food ants bee_counts bee_armor done')
+
+
+class ColonyBatch(object):
+    """A batch of n independent games of one layout and assault plan, played
+    in lockstep for training strategies.
+
+    Every array of game state has one row per game.  Each call to step takes
+    one deployment per game, plays one turn of every unfinished game with
+    array operations over the whole batch, and returns an Observation:
+
+    food -- the food of each game, shape (n,)
+    ants -- the kind of the ant in each place, or -1, shape (n, places)
+    bee_counts -- the number of bees in each place, shape (n, places)
+    bee_armor -- the total armor of the bees in each place, shape (n, places)
+    done -- whether each game is over, shape (n,)
+
+    The places are those of place_names, in the order they were registered,
+    and ant kinds index ant_types.  A finished game no longer changes.
+
+    The rules are those of ArrayColony, except that a contained ant that
+    expires, such as an imposter QueenAnt inside a BodyguardAnt, is removed
+    instead of raising an error.  Random
+    choices come from one NumPy generator for the whole batch.  If seeds are
+    given instead, game i makes its random choices with random.Random(seeds[i])
+    just as an AntColony seeded with seeds[i] would, which is slower but makes
+    each game reproducible with the object engine.
+
+    >>> import ants
+    >>> batch = ColonyBatch(3, ants.test_layout, ants.make_test_assault_plan,
+    ...                     seed=0)
+    >>> thrower = list(batch.ant_types).index('Thrower')
+    >>> obs = batch.step([0, 0, 0], [thrower, -1, -1])
+    >>> obs.food.tolist(), obs.ants[:, 0].tolist()
+    ([0, 4, 4], [1, -1, -1])
+    >>> while not obs.done.all():
+    ...     obs = batch.step([0, 0, 0], [-1, -1, -1])
+    >>> batch.breached.tolist()
+    [False, True, True]
+    """
+
+    def __init__(self, n, layout, make_plan, ant_types=None, food=4, seed=None,
+                 seeds=None):
+        if ant_types is None:
+            ant_types = ants.ant_types()
+        template = ArrayColony(None, ants.Hive(make_plan()), ant_types, layout)
+        self.n = n
+        self.ant_types = template.ant_types
+        self.kinds = template.kinds
+        self.place_names = list(template.places)[1:template.queen_id]
+        self.queen_id = template.queen_id
+        self.starting_food = food
+        self._exit, self._water = template._exit, template._water
+        self._tunnel, self._depth = template._tunnel, template._depth
+        self._tunnels = [np.array(t, np.int64) for t in template._tunnels]
+        self._hive_exits = np.array(template._hive_exits, np.int64)
+        self._waves, self._armor = template._waves, template._bee_armor
+        self._targets = template._targets
+        # Attributes of each kind of ant; kind -1 (no ant) is the last entry
+        def table(attribute, default=0):
+            values = [getattr(kind, attribute, default) for kind in self.kinds]
+            return np.array(values + [default])
+        self._cost, self._ant_armor0 = table('food_cost'), table('armor')
+        self._action, self._reduce = table('action'), table('reduce_armor')
+        self._damage, self._digest = table('damage'), table('time_to_digest')
+        self._min_range, self._max_range = table('min_range'), table('max_range')
+        self._blocks_path = table('blocks_path', False)
+        self._container = table('container', False)
+        self._watersafe = table('watersafe', False)
+        self._is_queen = table('is_queen', False)
+        self.random = np.random.default_rng(seed)
+        self._randoms = None
+        if seeds is not None:
+            self._randoms = [random.Random(s) for s in seeds]
+            assert len(self._randoms) == n, 'One seed is needed per game'
+        self.reset()
+
+    def reset(self):
+        """Start every game over and return the first Observation."""
+        n, places, bees = self.n, self.queen_id + 1, len(self._armor)
+        self.time = 0
+        self.food = np.full(n, self.starting_food, np.int64)
+        self.done = np.zeros(n, bool)
+        self.queen_count = np.zeros(n, np.int64)
+        self._queen_places = np.zeros((n, places), bool)
+        self._queen_places[:, self.queen_id] = True
+        for prefix in ('_ant', '_inner'):
+            setattr(self, prefix + '_kind', np.full((n, places), -1, np.int64))
+            setattr(self, prefix + '_armor', np.zeros((n, places), np.int64))
+            setattr(self, prefix + '_digesting', np.zeros((n, places), np.int64))
+            setattr(self, prefix + '_imposter', np.zeros((n, places), bool))
+        self._bee_armor = np.tile(self._armor, (n, 1))
+        self._bee_place = np.zeros((n, bees), np.int64)
+        self._bee_order = np.tile(np.arange(bees, dtype=np.int64), (n, 1))
+        self._next_order = np.full(n, bees, np.int64)
+        self._stun = np.zeros((n, bees), np.int64)
+        self._slow = np.zeros((n, bees), np.int64)
+        self._effect = np.zeros((n, bees), np.int64)
+        self._affected = np.zeros((n, bees), bool)
+        self._moved_from = None
+        self._count_bees()
+        self.done |= self.game_over
+        self._launch()
+        return self.observe()
+
+    def step(self, places, kinds):
+        """Deploy an ant of kinds[i] to place places[i] of game i, then play
+        one turn of every game and return an Observation.  A kind of -1 skips
+        deploying; deployments without enough food or room are skipped."""
+        self._deploy(np.asarray(places, np.int64) + 1,
+                     np.asarray(kinds, np.int64))
+        self._ants_act()
+        self._bees_act()
+        self.time += 1
+        self.done |= self.game_over
+        self._launch()
+        return self.observe()
+
+    def observe(self):
+        """Return an Observation of every game."""
+        alive = self._bee_place >= 0
+        armor = np.bincount(self._flat(self._bee_place)[alive],
+                            self._bee_armor[alive],
+                            self.n * (self.queen_id + 1))
+        armor = armor.reshape(self.n, -1).astype(np.int64)
+        tunnels = slice(1, self.queen_id)
+        return Observation(self.food.copy(), self._ant_kind[:, tunnels].copy(),
+                           self._bee_counts[:, tunnels].copy(),
+                           armor[:, tunnels], self.done.copy())
+
+    @property
+    def breached(self):
+        """Whether any bee has reached the queen, for each game."""
+        return ((self._bee_counts > 0) & self._queen_places).any(axis=1)
+
+    @property
+    def game_over(self):
+        bees = self._bee_counts[:, :self.queen_id].sum(axis=1)
+        return self.breached | (bees == 0)
+
+    # Random choices
+
+    def _integers(self, rows, high):
+        """Return random integers below high, which has a row of limits for
+        each game in rows, drawn in order for each game."""
+        if self._randoms is None:
+            return self.random.integers(high)
+        high = np.asarray(high)
+        draws = np.empty(high.shape, np.int64)
+        for i, row in enumerate(rows.tolist()):
+            limits = high[i].reshape(-1)
+            draws[i] = choices(self._randoms[row], int(limits[0]), len(limits)) \
+                if high.ndim > 1 else self._randoms[row].choice(range(limits[0]))
+        return draws
+
+    def _random_bees(self, rows, places):
+        """Return a random bee in each place of the game in the same position
+        of rows, or -1 if there is none."""
+        counts = self._bee_counts[rows, places]
+        bees = np.full(len(rows), -1, np.int64)
+        some = counts > 0
+        rows, places = rows[some], places[some]
+        if len(rows):
+            index = self._integers(rows, counts[some])
+            order = np.where(self._bee_place[rows] == places[:, None],
+                             self._bee_order[rows], np.iinfo(np.int64).max)
+            arrived = np.argsort(order, axis=1)
+            bees[some] = arrived[np.arange(len(rows)), index]
+        return bees
+
+    # Bees
+
+    def _flat(self, places):
+        """Index (game, place) pairs of a flattened (n, places) array."""
+        return np.arange(self.n)[:, None] * (self.queen_id + 1) + places
+
+    def _count_bees(self):
+        alive = self._bee_place >= 0
+        counts = np.bincount(self._flat(self._bee_place)[alive],
+                             minlength=self.n * (self.queen_id + 1))
+        self._bee_counts = counts.reshape(self.n, -1)
+
+    def _launch(self):
+        wave = self._waves.get(self.time)
+        rows = np.flatnonzero(~self.done)
+        if wave is None or not len(wave) or not len(rows):
+            return
+        start = 0
+        for count, target in self._targets.get(self.time, [(len(wave), None)]):
+            bees = wave[start:start+count]
+            start += count
+            if target is None:
+                chosen = np.full((len(rows), count), len(self._hive_exits))
+                chosen = self._integers(rows, chosen)
+            elif isinstance(target, int):
+                chosen = target
+            elif self._randoms is None:
+                weights = np.array(target, float)
+                draws = self.random.random((len(rows), count)) * weights[-1]
+                chosen = np.searchsorted(weights, draws, side='right')
+            else:
+                chosen = np.array([self._randoms[row].choices(
+                    range(len(self._hive_exits)), cum_weights=target, k=count)
+                    for row in rows.tolist()], np.int64)
+            self._bee_place[rows[:, None], bees] = self._hive_exits[chosen]
+        self._bee_order[rows[:, None], wave] = \
+            self._next_order[rows, None] + np.arange(len(wave))
+        self._next_order[rows] += len(wave)
+        self._count_bees()
+
+    def _hurt_bees(self, rows, bees, amounts):
+        """Reduce the armor of each bee of the game in the same position of
+        rows by amounts, removing bees with no armor remaining."""
+        self._bee_armor[rows, bees] -= amounts
+        expired = self._bee_armor[rows, bees] <= 0
+        rows, bees = rows[expired], bees[expired]
+        np.subtract.at(self._bee_counts, (rows, self._bee_place[rows, bees]), 1)
+        self._bee_place[rows, bees] = -1
+
+    def _hurt_place(self, rows, places, amounts):
+        """Reduce the armor of every bee in places, one for each game in
+        rows.  While bees act, bees that have moved in from places that have
+        not yet acted do not count."""
+        present = self._bee_place[rows] == places[:, None]
+        if self._moved_from is not None:
+            present &= self._moved_from[rows] < places[:, None]
+        index, bees = np.nonzero(present)
+        self._hurt_bees(rows[index], bees, amounts[index])
+
+    def _bees_act(self):
+        places = self._bee_place
+        acting = (places > 0) & (places < self.queen_id) & ~self.done[:, None]
+        affected = acting & self._affected
+        moves = acting & (~self._affected | ((self._effect == SLOWED) &
+                                             (self.time % 2 == 0)))
+        blocks = self._blocks_path[self._ant_kind]
+        blocked = np.take_along_axis(blocks, np.maximum(places, 0), axis=1)
+        movers = moves & ~blocked
+        self._moved_from = np.where(movers, places, 0)
+        places[movers] = self._exit[places[movers]]
+        stingers = moves & blocked
+        at = np.where(stingers, places, 0)
+        for place in np.unique(at[stingers]).tolist():
+            self._sting(place, at == place)
+        moved = self._moved_from > 0
+        scale = int(self._next_order.max()) + 1
+        key = np.where(moved, self._moved_from * scale + self._bee_order,
+                       np.iinfo(np.int64).max)
+        self._bee_order = np.where(moved, self._next_order[:, None] +
+                                   self._ranks(key), self._bee_order)
+        self._next_order += moved.sum(axis=1)
+        self._moved_from = None
+        self._tick_effects(affected)
+        self._count_bees()
+
+    @staticmethod
+    def _ranks(key):
+        """Return the rank of each entry of key within its row."""
+        ranks = np.empty(key.shape, np.int64)
+        positions = np.broadcast_to(np.arange(key.shape[1]), key.shape)
+        np.put_along_axis(ranks, np.argsort(key, axis=1), positions, axis=1)
+        return ranks
+
+    def _sting(self, place, stingers):
+        """The stingers (a mask of bees) in place take their turns, in order
+        of arrival; see ArrayColony._sting."""
+        rows = np.flatnonzero(stingers.any(axis=1))
+        while len(rows):
+            kind = self._ant_kind[rows, place]
+            armor = self._ant_armor[rows, place]
+            free = ~self._blocks_path[kind]
+            queen = ~free & (armor <= 0) & self._is_queen[kind] & \
+                ~self._ant_imposter[rows, place]
+            count = stingers[rows].sum(axis=1)
+            need = np.maximum(armor, 1)
+            short = ~free & ~queen & (count < need)
+            sting = queen | short
+            self._ant_armor[rows[sting], place] -= count[sting]
+            go = rows[free]
+            self._moved_from[go] = np.where(stingers[go], place,
+                                            self._moved_from[go])
+            self._bee_place[go] = np.where(stingers[go], self._exit[place],
+                                           self._bee_place[go])
+            stingers[rows[free | sting]] = False
+            die = ~free & ~sting
+            rows, need = rows[die], need[die]
+            key = np.where(stingers[rows], self._bee_order[rows],
+                           np.iinfo(np.int64).max)
+            stingers[rows] &= self._ranks(key) >= need[:, None]
+            self._ant_armor[rows, place] -= need - 1
+            self._hurt(rows, np.full(len(rows), place), np.ones(len(rows), int))
+            stingers[rows] &= self._bee_place[rows] == place
+            rows = rows[stingers[rows].any(axis=1)]
+
+    def _tick_effects(self, bees):
+        """Count down the status effects of bees (a mask) that acted while
+        affected; see ArrayColony._tick_effects."""
+        self._stun -= bees & (self._stun >= 1)
+        self._slow -= bees & (self._slow >= 1)
+        done = bees & (self._stun == 0) & (self._slow == 0)
+        current = np.where(self._effect == SLOWED, self._slow, self._stun)
+        switch = bees & ~done & (current == 0)
+        self._affected &= ~done
+        self._effect = np.where(switch, SLOWED + STUNNED - self._effect,
+                                self._effect)
+
+    # Ants
+
+    def _queen_behind(self, rows, places):
+        """Whether a QueenAnt is deeper in the tunnel of each place."""
+        queens = self._is_queen[self._ant_kind[rows]]
+        same = self._tunnel == self._tunnel[places][:, None]
+        deeper = self._depth > self._depth[places][:, None]
+        return (queens & same & deeper).any(axis=1)
+
+    def _adjusted(self, rows, places, damage):
+        return np.where(self._queen_behind(rows, places), 2 * damage, damage)
+
+    def _set_ants(self, rows, places, state, inner=False):
+        """Set the ant (or contained ant) in each place of the game in the
+        same position of rows from a (kinds, armor, digesting, imposter)
+        state of arrays."""
+        prefix = '_inner' if inner else '_ant'
+        for name, values in zip(('_kind', '_armor', '_digesting', '_imposter'),
+                                state):
+            getattr(self, prefix + name)[rows, places] = values
+
+    def _ant_states(self, rows, places, inner=False):
+        prefix = '_inner' if inner else '_ant'
+        return tuple(getattr(self, prefix + name)[rows, places] for name in
+                     ('_kind', '_armor', '_digesting', '_imposter'))
+
+    def _remove(self, rows, places):
+        empty = (-1, 0, 0, False)
+        self._set_ants(rows, places, empty)
+        self._set_ants(rows, places, empty, True)
+
+    def _add(self, rows, places, state):
+        """Add ants to places, as Place.add_insect and Water.add_insect, and
+        return whether each ant fit in its place."""
+        kinds = state[0]
+        outer = self._ant_kind[rows, places]
+        empty = outer < 0
+        into = ~empty & self._container[outer] & \
+            (self._inner_kind[rows, places] < 0) & ~self._container[kinds]
+        wrap = ~empty & ~into & self._container[kinds] & ~self._container[outer]
+        self._set_ants(rows[wrap], places[wrap],
+                       self._ant_states(rows[wrap], places[wrap]), True)
+        top = empty | wrap
+        self._set_ants(rows[top], places[top], [s[top] for s in state])
+        self._set_ants(rows[into], places[into], [s[into] for s in state], True)
+        wet = self._water[places] & ~self._watersafe[kinds]
+        self._set_ants(rows[into & wet], places[into & wet],
+                       (-1, 0, 0, False), True)
+        drown = top & wet
+        if drown.any():
+            rows, places = rows[drown], places[drown]
+            self._hurt(rows, places, self._ant_armor[rows, places])
+        return top | into
+
+    def _hurt(self, rows, places, amounts):
+        """Reduce the armor of the ant in each place by amounts, as its
+        reduce_armor method would; see ArrayColony._hurt."""
+        kinds = self._ant_kind[rows, places]
+        armor = self._ant_armor[rows, places]
+        handoff = (self._reduce[kinds] == GUARD) & (amounts >= armor) & \
+            (self._inner_kind[rows, places] >= 0)
+        if handoff.any():
+            r, p = rows[handoff], places[handoff]
+            inner = self._ant_states(r, p, True)
+            self._remove(r, p)
+            self._add(r, p, inner)
+        rest = ~handoff
+        rows, places, amounts = rows[rest], places[rest], amounts[rest]
+        kinds, armor = kinds[rest], armor[rest]
+        burn = (self._reduce[kinds] == FIRE) & (armor <= amounts)
+        if burn.any():
+            r, p = rows[burn], places[burn]
+            self._hurt_place(r, p, self._adjusted(r, p, self._damage[kinds[burn]]))
+        armor = armor - amounts
+        self._ant_armor[rows, places] = armor
+        stays = self._is_queen[kinds] & ~self._ant_imposter[rows, places]
+        expired = (armor <= 0) & ~stays
+        self._remove(rows[expired], places[expired])
+
+    def _deploy(self, places, kinds):
+        rows = np.flatnonzero(~self.done & (kinds >= 0))
+        places, kinds = places[rows], kinds[rows]
+        afford = self.food[rows] >= self._cost[kinds]
+        rows, places, kinds = rows[afford], places[afford], kinds[afford]
+        queens = self._is_queen[kinds]
+        imposter = queens & (self.queen_count[rows] > 0)
+        zeros = np.zeros(len(rows), np.int64)
+        fits = self._add(rows, places,
+                         (kinds, self._ant_armor0[kinds], zeros, imposter))
+        self.queen_count[rows[queens & fits]] += 1
+        self.food[rows[fits]] -= self._cost[kinds[fits]]
+
+    def _ants_act(self):
+        for place in range(1, self.queen_id):
+            rows = np.flatnonzero(~self.done & (self._ant_kind[:, place] >= 0)
+                                  & (self._ant_armor[:, place] > 0))
+            if not len(rows):
+                continue
+            kinds = self._ant_kind[rows, place]
+            inner = self._action[kinds] == GUARD
+            kinds = np.where(inner, self._inner_kind[rows, place], kinds)
+            acts = kinds >= 0
+            self._act(rows[acts], place, kinds[acts], inner[acts])
+
+    def _act(self, rows, place, kinds, inner):
+        """The ants of kinds in place take their actions, one in each game
+        of rows; inner is whether each is contained in a BodyguardAnt."""
+        action = self._action[kinds]
+        places = np.full(len(rows), place)
+        self.food[rows[action == HARVEST]] += 1
+        ninja = action == NINJA
+        self._hurt_place(rows[ninja], places[ninja], self._damage[kinds[ninja]])
+        hungry = action == HUNGRY
+        if hungry.any():
+            self._eat(rows[hungry], place, kinds[hungry], inner[hungry])
+        queen = action == QUEEN
+        imposter = queen & np.where(inner, self._inner_imposter[rows, place],
+                                    self._ant_imposter[rows, place])
+        outer = imposter & ~inner
+        self._hurt(rows[outer], places[outer],
+                   self._ant_armor[rows[outer], place])
+        expired = imposter & inner
+        self._set_ants(rows[expired], places[expired], (-1, 0, 0, False), True)
+        self._queen_places[rows[queen & ~imposter], place] = True
+        throws = ((action == THROW) | (action == SLOW) | (action == STUN) |
+                  (queen & ~imposter))
+        rows, kinds = rows[throws], kinds[throws]
+        bees = self._nearest_bees(rows, place, kinds)
+        hit = bees >= 0
+        rows, kinds, bees = rows[hit], kinds[hit], bees[hit]
+        action = self._action[kinds]
+        for effect, code, duration in ((SLOWED, SLOW, 3), (STUNNED, STUN, 1)):
+            r, b = rows[action == code], bees[action == code]
+            timers = self._slow if effect == SLOWED else self._stun
+            timers[r, b] = duration
+            self._effect[r, b] = effect
+            self._affected[r, b] = True
+        damage = (action == THROW) | (action == QUEEN)
+        rows, kinds, bees = rows[damage], kinds[damage], bees[damage]
+        places = np.full(len(rows), place)
+        self._hurt_bees(rows, bees,
+                        self._adjusted(rows, places, self._damage[kinds]))
+
+    def _eat(self, rows, place, kinds, inner):
+        """HungryAnts in place eat a random bee unless digesting."""
+        digesting = np.where(inner, self._inner_digesting[rows, place],
+                             self._ant_digesting[rows, place])
+        busy = digesting > 0
+        digesting -= busy
+        hungry = np.flatnonzero(~busy)
+        bees = self._random_bees(rows[hungry],
+                                 np.full(len(hungry), place))
+        eaten = hungry[bees >= 0]
+        bees = bees[bees >= 0]
+        self._hurt_bees(rows[eaten], bees, self._bee_armor[rows[eaten], bees])
+        digesting[eaten] = self._digest[kinds[eaten]]
+        self._inner_digesting[rows[inner], place] = digesting[inner]
+        self._ant_digesting[rows[~inner], place] = digesting[~inner]
+
+    def _nearest_bees(self, rows, place, kinds):
+        """Return a random bee of the nearest place in range that holds bees
+        for the thrower of kinds in place, one for each game of rows, or -1
+        if there is none."""
+        tunnel = self._tunnels[self._tunnel[place]]
+        near = self._depth[place] + self._min_range[kinds]
+        far = np.minimum(near + self._max_range[kinds], len(tunnel) - 1)
+        depth = np.arange(len(tunnel))
+        found = (self._bee_counts[rows[:, None], tunnel] > 0) & \
+            (depth >= near[:, None]) & (depth <= far[:, None])
+        some = found.any(axis=1)
+        bees = np.full(len(rows), -1, np.int64)
+        bees[some] = self._random_bees(rows[some],
+                                       tunnel[found[some].argmax(axis=1)])
+        return bees
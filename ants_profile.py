@@ -0,0 +1,164 @@
+"""The ants_profile module measures where the time of each turn goes.
+
+A Profiler attached to an AntColony plays each turn of the colony through
+AntColony.phases, which yields as each phase ends, timing these phases with
+time.perf_counter:
+
+    hive       Hive.strategy launching the bees of a wave
+    strategy   the strategy deploying and removing ants
+    ants_list  building the list of ants in play (AntColony.ants)
+    ants       the actions of the ants
+    bees_list  building the list of bees in play (AntColony.bees)
+    bees       the actions of the bees, and joining swarms
+
+Each turn is recorded as a TurnProfile, with the seconds spent in each phase
+and the numbers of ant and bee actions.  The Profiler also adds up the
+actions and seconds of each type of ant.  Profiles are saved as JSON, or as
+CSV with a row for each turn.  A colony without a Profiler is not slowed.
+
+Profiles work with any strategy, including ants_gui, though the strategy
+phase of a GUI game includes the time spent waiting for clicks.  For example,
+
+    python3 ants.py -f --profile game.json
+    python3 ants_gui.py -f --profile game.csv
+    python3 ants_profile.py my_strategies.greedy -s insane -n 100
+"""
+
+import ants
+import csv
+import json
+import time
+from collections import OrderedDict, namedtuple
+from ucb import main
+
+PHASES = ('hive', 'strategy', 'ants_list', 'ants', 'bees_list', 'bees')
+
+# The seconds spent in each phase of the turn at time, and the actions taken
+TurnProfile = namedtuple('TurnProfile',
+                         ('time',) + PHASES + ('ant_actions', 'bee_actions'))
+
+
+class Profiler(object):
+    """Times the phases of the turns of the colonies it is attached to.
+
+    >>> colony = ants.AntColony(lambda colony: None,
+    ...                         ants.Hive(ants.make_test_assault_plan()),
+    ...                         ants.ant_types(), ants.test_layout)
+    >>> colony.deploy_ant('tunnel_0_0', 'Thrower')
+    >>> profiler = Profiler(colony)
+    >>> colony.simulate()
+    >>> len(profiler.turns), sum(t.ant_actions for t in profiler.turns)
+    (8, 8)
+    >>> profiler.ant_types['Thrower'][0]
+    8
+    """
+
+    def __init__(self, colony=None):
+        self.turns = []  # A TurnProfile for each turn played
+        self.ant_types = OrderedDict()  # Ant name -> [actions, seconds]
+        if colony is not None:
+            self.attach(colony)
+
+    def attach(self, colony):
+        """Profile the turns of colony from now on."""
+        colony.profiler = self
+
+    def detach(self, colony):
+        """Stop profiling colony."""
+        colony.profiler = None
+
+    def turn(self, colony):
+        """Play one turn of colony by its phases and record it."""
+        clock = time.perf_counter
+        seconds = {}  # Phase -> seconds
+        ant_count = bee_count = 0
+        start = last = clock()
+        for step in colony.phases(actions=True):
+            now = clock()
+            if isinstance(step, str):  # The end of a phase
+                seconds[step] = now - start
+                start = now
+            elif step.is_ant():
+                ant_count += 1
+                cost = self.ant_types.get(step.name)
+                if cost is None:
+                    cost = self.ant_types[step.name] = [0, 0.0]
+                cost[0] += 1
+                cost[1] += now - last
+            else:
+                bee_count += 1
+            last = now
+        self.turns.append(TurnProfile(
+            colony.time - 1, *[seconds[phase] for phase in PHASES],
+            ant_actions=ant_count, bee_actions=bee_count))
+
+    def totals(self):
+        """Return an OrderedDict of the seconds spent in each phase."""
+        return OrderedDict((phase, sum(getattr(t, phase) for t in self.turns))
+                           for phase in PHASES)
+
+    def as_dict(self):
+        """Return the profile as a dict of lists, numbers and strings."""
+        return OrderedDict([
+            ('totals', self.totals()),
+            ('ant_types', OrderedDict(
+                (name, OrderedDict([('actions', n), ('seconds', seconds)]))
+                for name, (n, seconds) in self.ant_types.items())),
+            ('turns', [t._asdict() for t in self.turns]),
+        ])
+
+    def write_json(self, file):
+        json.dump(self.as_dict(), file, indent=1)
+
+    def write_csv(self, file):
+        """Write a header and a row for each turn to file."""
+        writer = csv.writer(file)
+        writer.writerow(TurnProfile._fields)
+        writer.writerows(self.turns)
+
+    def save(self, path):
+        """Save the profile to path, as CSV if it ends with .csv and as JSON
+        otherwise."""
+        with open(path, 'w', newline='') as file:
+            if path.endswith('.csv'):
+                self.write_csv(file)
+            else:
+                self.write_json(file)
+
+    def report(self):
+        """Return a summary of the profile for a person to read."""
+        lines = []
+        totals = self.totals()
+        whole = sum(totals.values()) or 1
+        for phase, seconds in totals.items():
+            lines.append('{0:12} {1:9.4f}s {2:6.1%}'.format(
+                phase, seconds, seconds / whole))
+        for name, (n, seconds) in self.ant_types.items():
+            lines.append('{0:12} {1:9d} actions {2:8.2f}us each'.format(
+                name, n, 1e6 * seconds / n))
+        return '\n'.join(lines)
+
+
+@main
+def run(*args):
+    import argparse
+    import ants_tournament
+    parser = argparse.ArgumentParser(description='Profile Ants games')
+    parser.add_argument('strategy',
+                        help='module.function path of the strategy to play')
+    parser.add_argument('--scenario', '-s', default='full',
+                        choices=list(ants.SCENARIOS))
+    parser.add_argument('--games', '-n', type=int, default=10)
+    parser.add_argument('--output', '-o', help='a .json or .csv file')
+    args = parser.parse_args(args)
+    strategy = ants_tournament.load_strategy(args.strategy)
+    layout, make_plan = ants.SCENARIOS[args.scenario]
+    profiler = Profiler()
+    for seed in range(args.games):
+        colony = ants.AntColony(strategy, ants.Hive(make_plan()),
+                                ants.ant_types(), layout, seed=seed)
+        profiler.attach(colony)
+        colony.simulate()
+    print(profiler.report())
+    if args.output:
+        profiler.save(args.output)
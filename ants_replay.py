@@ -0,0 +1,160 @@
+"""The ants_replay module records games and plays them back.
+
+A recording is a text file with one JSON value per line.  The first line is
+an object with the seed, layout, assault plan and starting food of the game.
+Each following line is a list for one call made by the strategy, in order:
+
+    [time, "deploy", place name, ant type name]
+    [time, "remove", place name]
+
+The last line, written when the game ends, is an object with the winner and
+the final time.  Only calls that changed the colony are recorded.
+
+The seed fixes every random choice of the game, so replaying the recorded
+calls against a new colony reproduces the game exactly.  For example,
+
+    python3 ants_replay.py record game.txt -f --gui
+    python3 ants_replay.py play game.txt
+    python3 ants_replay.py play game.txt --gui --seconds 0.5
+"""
+
+import ants
+import json
+from collections import OrderedDict
+from ucb import main
+
+
+class Recorder(object):
+    """Writes the deployments and removals of a colony to a file.
+
+    layout -- the layout function the colony was built with
+    make_plan -- the assault plan constructor of the colony's Hive
+    """
+
+    def __init__(self, colony, file, layout, make_plan):
+        self.file = file
+        self.write(OrderedDict([('seed', colony.seed),
+                                ('layout', layout.__name__),
+                                ('plan', make_plan.__name__),
+                                ('food', colony.food)]))
+        colony.subscribe(ants.Deploy, self.deploy)
+        colony.subscribe(ants.Remove, self.remove)
+        colony.subscribe(ants.GameOver, self.game_over)
+
+    def write(self, value):
+        self.file.write(json.dumps(value, separators=(',', ':')) + '\n')
+
+    def deploy(self, event):
+        self.write([event.time, 'deploy', event.place.name, event.ant.name])
+
+    def remove(self, event):
+        self.write([event.time, 'remove', event.place.name])
+
+    def game_over(self, event):
+        self.write(OrderedDict([('winner', event.winner),
+                                ('time', event.time)]))
+
+
+class Replay(object):
+    """A recorded game, read from a file.
+
+    >>> import io
+    >>> recording = io.StringIO()
+    >>> def strategy(colony):
+    ...     if colony.time == 1:
+    ...         colony.deploy_ant('tunnel_0_0', 'Thrower')
+    >>> colony = record(strategy, ants.test_layout,
+    ...                 ants.make_test_assault_plan, recording, seed=7)
+    >>> colony.simulate()
+    >>> print(recording.getvalue(), end='')
+    {"seed":7,"layout":"test_layout","plan":"make_test_assault_plan","food":4}
+    [1,"deploy","tunnel_0_0","Thrower"]
+    {"winner":"ants","time":8}
+    >>> replay = Replay(io.StringIO(recording.getvalue()))
+    >>> replay.play().time
+    8
+    """
+
+    def __init__(self, file):
+        lines = [json.loads(line) for line in file if line.strip()]
+        header = lines[0]
+        self.seed, self.food = header['seed'], header['food']
+        self.layout = getattr(ants, header['layout'])
+        self.make_plan = getattr(ants, header['plan'])
+        self.actions = {}  # time -> list of recorded calls
+        self.result = None
+        for line in lines[1:]:
+            if isinstance(line, dict):
+                self.result = line
+            else:
+                self.actions.setdefault(line[0], []).append(line[1:])
+
+    def strategy(self, colony):
+        """Make the recorded calls for the current turn of colony."""
+        for action in self.actions.get(colony.time, ()):
+            if action[0] == 'deploy':
+                colony.deploy_ant(action[1], action[2])
+            else:
+                colony.remove_ant(action[1])
+
+    def colony(self, strategy=None):
+        """Return a new colony for the recorded game, played by strategy."""
+        return ants.AntColony(strategy or self.strategy,
+                              ants.Hive(self.make_plan()), ants.ant_types(),
+                              self.layout, self.food, self.seed)
+
+    def play(self):
+        """Replay the game at full speed and return the finished colony.
+        Raises an AssertionError if the game does not end as recorded."""
+        colony = self.colony()
+        colony.simulate()
+        if self.result is not None:
+            winner = 'bees' if colony.queen.breached else 'ants'
+            assert (winner, colony.time) == (self.result['winner'],
+                                             self.result['time']), \
+                'Replay diverged from the recording'
+        return colony
+
+
+def record(strategy, layout, make_plan, file, seed=None, food=4):
+    """Return a new colony played by strategy that records to file."""
+    colony = ants.AntColony(strategy, ants.Hive(make_plan()),
+                            ants.ant_types(), layout, food, seed)
+    Recorder(colony, file, layout, make_plan)
+    return colony
+
+
+@main
+def run(*args):
+    import argparse
+    parser = argparse.ArgumentParser(description='Record or replay Ants games')
+    parser.add_argument('command', choices=['record', 'play'])
+    parser.add_argument('file', help='the recording')
+    parser.add_argument('--gui', action='store_true', help='use ants_gui')
+    parser.add_argument('--seconds', type=float, default=None,
+                        help='seconds per turn when replaying in the GUI')
+    args, game_args = parser.parse_known_args(args)
+    if args.gui:
+        import ants_gui
+    if args.command == 'record':
+        strategy = ants_gui.AntsGUI().strategy if args.gui \
+            else ants.interactive_strategy
+        layout, make_plan, seed = ants.read_options(game_args)
+        with open(args.file, 'w') as file:
+            colony = record(strategy, layout, make_plan, file, seed)
+            ants.print_events(colony)
+            colony.simulate()
+    else:
+        with open(args.file) as file:
+            replay = Replay(file)
+        if args.gui:
+            seconds = args.seconds or ants_gui.STRATEGY_SECONDS
+            gui = ants_gui.AntsGUI(replay.strategy, seconds)
+            colony = replay.colony(gui.strategy)
+            ants.print_events(colony)
+            colony.simulate()
+        else:
+            colony = replay.play()
+            winner = 'bees' if colony.queen.breached else 'ants'
+            print('Replayed {0} turns; the {1} won.'.format(colony.time,
+                                                            winner))
@@ -0,0 +1,136 @@
+"""The ants_tournament module plays strategies against scenarios in parallel.
+
+A tournament is every combination of strategy, scenario and seed.  Games are
+independent, so they are sharded into chunks and played by a pool of worker
+processes.  Results stream back as chunks finish and can be summarized into
+win rates and turn-count distributions per (strategy, scenario) pair.
+
+Each strategy is given a label, which names it in the results.  Strategies
+are sent to workers by pickling, so they must be functions defined at the
+top level of some module, or objects such as ants_mcts.MCTS instances and
+functools.partial objects of such functions.  For example,
+
+    python3 ants_tournament.py -n 1000 -s full -s insane my_strategies.greedy
+"""
+
+import ants
+import importlib
+import os
+from collections import Counter, OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from ucb import main
+
+Summary = namedtuple('Summary', 'games wins win_rate mean_turns turns')
+
+
+def play_chunk(jobs):
+    """Play a list of (label, strategy, scenario, seed) jobs and return a
+    list of (label, seed, GameResult) triples.  Runs in a worker process."""
+    results = []
+    for label, strategy, scenario, seed in jobs:
+        layout, make_plan = ants.SCENARIOS[scenario]
+        result = ants.play_game(layout, make_plan, strategy, scenario, seed)
+        results.append((label, seed, result))
+    return results
+
+
+def make_jobs(strategies, scenarios, seeds):
+    """Return every (label, strategy, scenario, seed) job of a tournament,
+    given a mapping from labels to strategies."""
+    return [(label, strategy, scenario, seed)
+            for label, strategy in strategies.items()
+            for scenario in scenarios for seed in seeds]
+
+
+def play_tournament(strategies, scenarios, seeds, workers=None, chunk_size=64):
+    """Play every strategy on every scenario once per seed, yielding
+    (label, seed, GameResult) triples as games finish.
+
+    Results arrive in completion order, not submission order.
+
+    strategies -- a mapping from the label of each strategy to the strategy
+    scenarios -- names from ants.SCENARIOS
+    seeds -- one game is played per seed for each strategy and scenario
+    workers -- number of worker processes; 0 plays in this process
+    chunk_size -- number of games each worker plays per task
+    """
+    jobs = make_jobs(strategies, scenarios, seeds)
+    return map_chunks(play_chunk, jobs, workers, chunk_size)
+
+
+def map_chunks(function, items, workers=None, chunk_size=64, ordered=False):
+    """Call function on lists of chunk_size items in a pool of worker
+    processes, and yield each element of the lists it returns.
+
+    function -- a top-level function of a list of items that returns a list
+    workers -- number of worker processes; 0 calls function in this process
+    ordered -- whether to yield results in the order of items; otherwise they
+               arrive as chunks finish
+
+    >>> list(map_chunks(sorted, [3, 1, 2], workers=0, chunk_size=2))
+    [1, 3, 2]
+    """
+    items = list(items)
+    chunks = [items[i:i+chunk_size] for i in range(0, len(items), chunk_size)]
+    if workers == 0:
+        for chunk in chunks:
+            yield from function(chunk)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(function, chunk) for chunk in chunks]
+        for future in futures if ordered else as_completed(futures):
+            yield from future.result()
+
+
+def summarize(results):
+    """Return an OrderedDict from (label, scenario) to a Summary of the games
+    played, given (label, seed, GameResult) triples.
+
+    >>> R = ants.GameResult
+    >>> results = [('f', 0, R('test', 'ants', 8, 0, 0, 2)),
+    ...            ('f', 1, R('test', 'bees', 6, 0, 1, 0))]
+    >>> summarize(results)[('f', 'test')]
+    Summary(games=2, wins=1, win_rate=0.5, mean_turns=7.0, turns=Counter({8: 1, 6: 1}))
+    """
+    turns, wins = OrderedDict(), Counter()
+    for label, _, result in results:
+        key = (label, result.scenario)
+        turns.setdefault(key, Counter())[result.turns] += 1
+        if result.winner == 'ants':
+            wins[key] += 1
+    summaries = OrderedDict()
+    for key, counts in turns.items():
+        games = sum(counts.values())
+        total_turns = sum(t * n for t, n in counts.items())
+        summaries[key] = Summary(games, wins[key], wins[key] / games,
+                                 total_turns / games, counts)
+    return summaries
+
+
+def load_strategy(path):
+    """Return the strategy function named by a 'module.function' path."""
+    module_name, _, name = path.rpartition('.')
+    return getattr(importlib.import_module(module_name), name)
+
+
+@main
+def run(*args):
+    import argparse
+    parser = argparse.ArgumentParser(description='Run an Ants tournament')
+    parser.add_argument('strategy', nargs='+',
+                        help='module.function paths of strategies to play')
+    parser.add_argument('--scenario', '-s', action='append',
+                        choices=list(ants.SCENARIOS),
+                        help='scenarios to play (default: all)')
+    parser.add_argument('--games', '-n', type=int, default=100,
+                        help='games per strategy and scenario')
+    parser.add_argument('--workers', '-j', type=int, default=os.cpu_count())
+    args = parser.parse_args(args)
+    strategies = OrderedDict((path, load_strategy(path))
+                             for path in args.strategy)
+    scenarios = args.scenario or list(ants.SCENARIOS)
+    results = play_tournament(strategies, scenarios, range(args.games),
+                              args.workers)
+    for (label, scenario), s in summarize(results).items():
+        print('{0:20} {1:14} win rate {2:6.1%}  mean turns {3:5.1f}'.format(
+              label, scenario, s.win_rate, s.mean_turns))
@@ -2,10 +2,30 @@
 
 import unittest
 import doctest
+import functools
 import os
+import pickle
+import random
 import sys
 from ucb import main
 import ants
+import ants_benchmark
+import ants_diff
+import ants_layout
+import ants_mcts
+import ants_profile
+import ants_replay
+import ants_tournament
+try:
+    import ants_numpy
+except ImportError:  # NumPy is not installed
+    ants_numpy = None
+
+
+def thrower_strategy(colony):
+    """Deploy one ThrowerAnt at the start of the first tunnel."""
+    if colony.time == 0:
+        colony.deploy_ant('tunnel_0_0', 'Thrower')
 
 
 class AntTest(unittest.TestCase):
@@ -647,6 +667,1388 @@ class TestExtraCredit(AntTest):
                              'Status effects do not stack')
 
 
+class TestIndexes(AntTest):
+
+    def setUp(self):
+        hive, layout = ants.Hive(ants.make_full_assault_plan()), ants.dry_layout
+        self.colony = ants.AntColony(None, hive, ants.ant_types(), layout)
+        self.colony.debug = True
+
+    def test_hive_bees_indexed(self):
+        self.assertEqual(15, self.colony.bee_count, 'Hive bees not counted')
+        self.assertEqual(self.colony.hive.bees, self.colony.bees)
+
+    def test_order(self):
+        error_msg = 'Indexed insects are not in place order'
+        places = self.colony.places
+        later, earlier = ants.ThrowerAnt(), ants.HarvesterAnt()
+        places['tunnel_2_0'].add_insect(later)
+        places['tunnel_0_5'].add_insect(earlier)
+        self.assertEqual([earlier, later], self.colony.ants, error_msg)
+        bee = ants.Bee(3)
+        places['tunnel_1_1'].add_insect(bee)
+        self.assertIs(bee, self.colony.bees[-1], error_msg)
+        self.colony.hive.bees[0].move_to(places['tunnel_0_7'])
+        self.assertIs(bee, self.colony.bees[-1], error_msg)
+        self.assertEqual(16, self.colony.bee_count)
+
+    def test_removal(self):
+        place = self.colony.places['tunnel_0_0']
+        bee = ants.Bee(1)
+        place.add_insect(bee)
+        place.add_insect(ants.ThrowerAnt())
+        bee.reduce_armor(1)
+        self.colony.remove_ant('tunnel_0_0')
+        self.assertEqual([], self.colony.ants, 'Removed ant still indexed')
+        self.assertEqual(15, self.colony.bee_count, 'Dead bee still counted')
+
+    def test_bodyguard_handoff(self):
+        error_msg = 'Ant index misses the ant a bodyguard leaves behind'
+        place = self.colony.places['tunnel_0_0']
+        ant = ants.ThrowerAnt()
+        place.add_insect(ant)
+        place.add_insect(ants.BodyguardAnt())
+        place.ant.reduce_armor(2)
+        self.assertEqual([ant], self.colony.ants, error_msg)
+
+    def test_stale_index_detected(self):
+        self.colony.places['tunnel_0_0'].bees.append(ants.Bee(1))
+        with self.assertRaises(AssertionError):
+            self.colony.bees
+
+
+class TestRangeIndex(unittest.TestCase):
+
+    def setUp(self):
+        def long_layout(queen, register_place):
+            ants.mixed_layout(queen, register_place, 300, 2, 7)
+        hive = ants.Hive(ants.make_test_assault_plan())
+        self.colony = ants.AntColony(None, hive, ants.ant_types(), long_layout)
+        self.colony.debug = True
+
+    def test_tunnels_and_depths(self):
+        error_msg = 'Places have the wrong tunnel or depth'
+        places = self.colony.places
+        self.assertIsNone(self.colony.hive.tunnel, error_msg)
+        self.assertEqual((0, 0), (places['tunnel_0_0'].tunnel,
+                                  places['tunnel_0_0'].depth), error_msg)
+        self.assertEqual((1, 6), (places['water_1_6'].tunnel,
+                                  places['water_1_6'].depth), error_msg)
+        self.assertEqual((1, 299), (places['tunnel_1_299'].tunnel,
+                                    places['tunnel_1_299'].depth), error_msg)
+
+    def test_nearest_in_long_tunnel(self):
+        places = self.colony.places
+        ant = ants.ThrowerAnt()
+        places['tunnel_1_100'].add_insect(ant)
+        far, near, other = ants.Bee(2), ants.Bee(2), ants.Bee(2)
+        places['tunnel_1_109'].add_insect(far)
+        places['tunnel_1_112'].add_insect(other)
+        places['tunnel_0_105'].add_insect(ants.Bee(2))
+        self.assertIs(far, ant.nearest_bee(self.colony.hive))
+        places['tunnel_1_103'].add_insect(near)
+        self.assertIs(near, ant.nearest_bee(self.colony.hive))
+        near.move_to(places['tunnel_1_99'])
+        far.reduce_armor(2)
+        self.assertIsNone(ant.nearest_bee(self.colony.hive), 'Out of range')
+
+    def test_long_thrower_at_tunnel_end(self):
+        error_msg = 'LongThrower reached past the end of its tunnel'
+        ant = ants.LongThrower()
+        self.colony.places['tunnel_0_297'].add_insect(ant)
+        self.colony.hive.add_insect(ants.Bee(2))
+        self.assertIsNone(ant.nearest_bee(self.colony.hive), error_msg)
+
+
+class TestQueenIndex(AntTest):
+
+    def setUp(self):
+        AntTest.setUp(self)
+        self.colony.debug = True
+        ants.QueenAnt.queen_count = 0
+        self.queen, self.imposter = ants.QueenAnt(), ants.QueenAnt()
+
+    def test_queen_deployed_and_covered(self):
+        error_msg = 'Queen index not updated as the queen is covered'
+        places = self.colony.places
+        ant = ants.ThrowerAnt()
+        places['tunnel_0_2'].add_insect(ant)
+        self.assertEqual(1, ant.adjusted_damage, error_msg)
+        places['tunnel_0_6'].add_insect(self.queen)
+        self.assertEqual(2, ant.adjusted_damage, error_msg)
+        places['tunnel_0_6'].add_insect(ants.BodyguardAnt())
+        self.assertEqual(1, ant.adjusted_damage, error_msg)
+        places['tunnel_0_6'].ant.reduce_armor(2)
+        self.assertEqual(2, ant.adjusted_damage, error_msg)
+
+    def test_imposter_removed(self):
+        error_msg = 'Queen index not updated as an imposter is removed'
+        places = self.colony.places
+        ant = ants.FireAnt()
+        places['tunnel_0_0'].add_insect(ant)
+        places['tunnel_0_4'].add_insect(self.imposter)
+        self.assertEqual(6, ant.adjusted_damage, error_msg)
+        self.imposter.action(self.colony)
+        self.assertEqual(3, ant.adjusted_damage, error_msg)
+
+    def test_queen_ahead(self):
+        error_msg = 'Queen doubles damage of ants behind her'
+        ant = ants.ThrowerAnt()
+        self.colony.places['tunnel_0_1'].add_insect(self.queen)
+        self.colony.places['tunnel_0_2'].add_insect(ant)
+        self.assertEqual(1, ant.adjusted_damage, error_msg)
+
+    def test_queen_per_colony(self):
+        error_msg = 'The queen of one colony made another its imposter'
+        for _ in range(2):
+            colony = ants.AntColony(None, ants.Hive(ants.AssaultPlan()),
+                                    ants.ant_types(), ants.test_layout, 4)
+            colony.deploy_ant('tunnel_0_0', 'Queen')
+            self.assertFalse(colony.ants[0].imposter, error_msg)
+            colony.deploy_ant('tunnel_0_1', 'Queen')
+            self.assertTrue(colony.ants[1].imposter)
+
+
+class TestBreach(AntTest):
+
+    def setUp(self):
+        AntTest.setUp(self)
+        ants.QueenAnt.queen_count = 0
+        self.queen = ants.QueenAnt()
+        self.colony.places['tunnel_0_3'].add_insect(self.queen)
+
+    def test_queen_places_do_not_grow(self):
+        error_msg = 'Queen locations grow with every action'
+        for _ in range(100):
+            self.queen.action(self.colony)
+        self.assertEqual(2, len(self.colony.queen.places), error_msg)
+
+    def test_breach_counts_bees(self):
+        queen_place = self.colony.places['tunnel_0_3']
+        bee = ants.Bee(5)
+        self.colony.places['tunnel_0_4'].add_insect(bee)
+        self.queen.action(self.colony)
+        self.assertFalse(self.colony.queen.breached, 'Breached too early')
+        bee.move_to(queen_place)
+        self.assertTrue(self.colony.queen.breached, 'Breach not detected')
+        self.assertEqual([bee], self.colony.queen.bees)
+        bee.reduce_armor(bee.armor)
+        self.assertFalse(self.colony.queen.breached, 'Dead bee breached')
+
+    def test_bees_present_when_queen_acts(self):
+        self.colony.places['tunnel_0_3'].add_insect(ants.Bee(5))
+        self.queen.action(self.colony)
+        self.assertTrue(self.colony.queen.breached, 'Breach not detected')
+
+    def test_true_queen_stays(self):
+        error_msg = 'Removing the true queen should leave her in place'
+        self.colony.remove_ant('tunnel_0_3')
+        self.assertIs(self.colony.places['tunnel_0_3'], self.queen.place,
+                      error_msg)
+
+
+class TestEvents(AntTest):
+
+    def record(self, *event_types):
+        events = []
+        for event_type in event_types:
+            self.colony.subscribe(event_type, events.append)
+        return events
+
+    def test_throw_and_damage(self):
+        events = self.record(ants.Throw, ants.Damage, ants.Expire)
+        ant, bee = ants.ThrowerAnt(), ants.Bee(1)
+        self.colony.places['tunnel_0_0'].add_insect(ant)
+        self.colony.places['tunnel_0_2'].add_insect(bee)
+        self.colony.time = 5
+        ant.action(self.colony)
+        place = self.colony.places['tunnel_0_2']
+        self.assertEqual([ants.Throw(5, ant, bee), ants.Damage(5, bee, 1),
+                          ants.Expire(5, bee, place)], events)
+
+    def test_deploy_move_sting(self):
+        events = self.record(ants.Deploy, ants.NoFood, ants.Move, ants.Sting)
+        self.colony.deploy_ant('tunnel_0_0', 'Wall')
+        self.colony.deploy_ant('tunnel_0_1', 'Wall')
+        wall = self.colony.places['tunnel_0_0'].ant
+        bee = ants.Bee(3)
+        self.colony.places['tunnel_0_1'].add_insect(bee)
+        bee.action(self.colony)
+        bee.action(self.colony)
+        p0, p1 = self.colony.places['tunnel_0_0'], self.colony.places['tunnel_0_1']
+        self.assertEqual([ants.Deploy(0, wall, p0), ants.NoFood(0, 'Wall', 0),
+                          ants.Move(0, bee, p1, p0), ants.Sting(0, bee, wall)],
+                         events)
+
+    def test_wave_and_game_over(self):
+        events = self.record(ants.Wave, ants.GameOver)
+        self.colony.strategy = lambda colony: None
+        self.colony.simulate()
+        self.assertEqual(['Wave', 'Wave', 'GameOver'],
+                         [type(e).__name__ for e in events])
+        self.assertEqual('bees', events[-1].winner)
+
+    def test_effect(self):
+        events = self.record(ants.Effect)
+        ant, bee = ants.SlowThrower(), ants.Bee(3)
+        self.colony.places['tunnel_0_0'].add_insect(ant)
+        self.colony.places['tunnel_0_1'].add_insect(bee)
+        ant.action(self.colony)
+        self.assertEqual([ants.Effect(0, bee, 'slow', 3)], events)
+
+    def test_unsubscribe(self):
+        events = self.record(ants.Damage)
+        self.colony.unsubscribe(ants.Damage, events.append)
+        self.assertEqual({}, self.colony.listeners, 'Listener not removed')
+        bee = ants.Bee(3)
+        self.colony.places['tunnel_0_0'].add_insect(bee)
+        bee.reduce_armor(1)
+        self.assertEqual([], events)
+
+    def test_print_events(self):
+        import io
+        import contextlib
+        ants.print_events(self.colony)
+        bee = ants.Bee(1)
+        self.colony.places['tunnel_0_0'].add_insect(bee)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            bee.reduce_armor(1)
+            self.colony.deploy_ant('tunnel_0_1', 'Stun')
+        self.assertEqual('Bee(0, tunnel_0_0) ran out of armor and expired\n'
+                         'Not enough food remains to place Stun\n',
+                         out.getvalue())
+
+
+class TestSeed(unittest.TestCase):
+
+    def play(self, seed):
+        """Play a seeded game with HungryAnts that eat random bees, returning
+        the moves that bees made."""
+        def hungry_strategy(colony):
+            if colony.time == 0:
+                colony.deploy_ant('tunnel_2_0', 'Hungry')
+        hive = ants.Hive(ants.make_insane_assault_plan())
+        colony = ants.AntColony(hungry_strategy, hive, ants.ant_types(),
+                                ants.dry_layout, seed=seed)
+        moves = []
+        colony.subscribe(ants.Move, lambda e: moves.append(
+            (e.time, e.destination.name, hive.assault_plan.all_bees.index(e.bee))))
+        colony.simulate()
+        return moves
+
+    def test_same_seed_same_game(self):
+        error_msg = 'Seeded games should play out identically'
+        self.assertEqual(self.play(3), self.play(3), error_msg)
+        self.assertNotEqual(self.play(3), self.play(4), 'Seed is ignored')
+
+    def test_chosen_seed(self):
+        hive = ants.Hive(ants.make_test_assault_plan())
+        colony = ants.AntColony(None, hive, ants.ant_types(), ants.test_layout)
+        self.assertIsInstance(colony.seed, int, 'Unseeded colony has no seed')
+
+    def test_batch_seeds(self):
+        args = (['full', 'insane'], thrower_strategy, 5)
+        self.assertEqual(ants.run_batch(*args, seed=10),
+                         ants.run_batch(*args, seed=10))
+
+    def test_seed_flag(self):
+        import io
+        import contextlib
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            ants.start_with_strategy(['-f', '--seed', '42'], thrower_strategy)
+        self.assertTrue(out.getvalue().startswith('Seed: 42\n'))
+
+
+class TestBatch(unittest.TestCase):
+
+    def test_results(self):
+        results = ants.run_batch(['test'], thrower_strategy, 3)
+        self.assertEqual(3, len(results), 'Wrong number of games played')
+        for result in results:
+            self.assertEqual('test', result.scenario)
+            self.assertEqual('ants', result.winner, 'Thrower should win')
+            self.assertEqual(2, result.bees_killed, 'Bees not all killed')
+            self.assertEqual(0, result.ants_lost)
+            self.assertEqual(0, result.food)
+
+    def test_ants_lost(self):
+        def harvester_strategy(colony):
+            if colony.time == 0:
+                colony.deploy_ant('tunnel_0_7', 'Harvester')
+        layout_and_plan = ants.SCENARIOS['test']
+        result, = ants.run_batch([layout_and_plan], harvester_strategy)
+        self.assertIsNone(result.scenario)
+        self.assertEqual('bees', result.winner)
+        self.assertEqual(1, result.ants_lost, 'Stung harvester not counted')
+
+    def test_container_removed(self):
+        def guard_strategy(colony):
+            if colony.time == 0:
+                colony.food = 8
+                colony.deploy_ant('tunnel_0_0', 'Thrower')
+                colony.deploy_ant('tunnel_0_0', 'Bodyguard')
+            elif colony.time == 1:
+                colony.remove_ant('tunnel_0_0')
+        result, = ants.run_batch(['test'], guard_strategy, seed=0)
+        self.assertEqual('bees', result.winner)
+        self.assertEqual(0, result.ants_lost, 'Removed ants counted as lost')
+
+    def test_silent(self):
+        import io
+        import contextlib
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            ants.run_batch(['full', 'insane'], thrower_strategy, 2)
+        self.assertEqual('', out.getvalue(), 'Batch games should not print')
+
+
+class TestTournament(unittest.TestCase):
+
+    def test_parallel_matches_serial(self):
+        error_msg = 'Worker processes should replay seeded games exactly'
+        args = ({'thrower': thrower_strategy}, ['full', 'insane'], range(6))
+        serial = sorted(ants_tournament.play_tournament(*args, workers=0))
+        parallel = sorted(ants_tournament.play_tournament(*args, workers=2,
+                                                          chunk_size=5))
+        self.assertEqual(12, len(serial))
+        self.assertEqual(serial, parallel, error_msg)
+
+    def test_summarize(self):
+        results = ants_tournament.play_tournament(
+            {'thrower': thrower_strategy}, ['test'], range(4), workers=0)
+        summary = ants_tournament.summarize(results)
+        test = summary[('thrower', 'test')]
+        self.assertEqual(4, test.games)
+        self.assertEqual(1.0, test.win_rate)
+        self.assertEqual(4, sum(test.turns.values()))
+
+    def test_labels(self):
+        error_msg = 'Strategies should be summarized by their labels'
+        strategies = {'function': thrower_strategy,
+                      'partial': functools.partial(thrower_strategy)}
+        results = ants_tournament.play_tournament(strategies, ['test'],
+                                                  range(2), workers=0)
+        summary = ants_tournament.summarize(results)
+        self.assertEqual({('function', 'test'), ('partial', 'test')},
+                         set(summary), error_msg)
+        self.assertEqual([2, 2], [s.games for s in summary.values()])
+
+
+class TestReplay(unittest.TestCase):
+
+    def record(self, seed):
+        """Record a seeded game in which ants are deployed and removed at
+        random, returning the recording and the finished colony."""
+        import io
+        import random
+        choices = random.Random(seed)
+        def random_strategy(colony):
+            names = [n for n in colony.places if n != 'Hive']
+            name = choices.choice(names)
+            if colony.places[name].ant is not None:
+                colony.remove_ant(name)
+            else:
+                ant_type = choices.choice(list(colony.ant_types))
+                if colony.ant_types[ant_type].food_cost <= colony.food:
+                    try:
+                        colony.deploy_ant(name, ant_type)
+                    except Exception:
+                        pass
+        recording = io.StringIO()
+        colony = ants_replay.record(random_strategy, ants.mixed_layout,
+                                    ants.make_full_assault_plan, recording,
+                                    seed, food=30)
+        colony.simulate()
+        return recording.getvalue(), colony
+
+    def test_replay_matches(self):
+        import io
+        for seed in range(5):
+            recording, colony = self.record(seed)
+            replay = ants_replay.Replay(io.StringIO(recording))
+            replayed = replay.play()
+            self.assertEqual(colony.time, replayed.time)
+            self.assertEqual(colony.ants_deployed, replayed.ants_deployed)
+            self.assertEqual(colony.ants_removed, replayed.ants_removed)
+            self.assertEqual([(a.place.name, a.name) for a in colony.ants],
+                             [(a.place.name, a.name) for a in replayed.ants])
+
+    def test_divergence(self):
+        import io
+        recording, colony = self.record(0)
+        lines = recording.splitlines()
+        lines[-1] = lines[-1].replace('"time":', '"time":1')
+        replay = ants_replay.Replay(io.StringIO('\n'.join(lines)))
+        self.assertRaises(AssertionError, replay.play)
+
+    def test_failed_deploy(self):
+        import io
+        error_msg = 'A Queen that was not deployed was counted'
+        def strategy(colony):
+            if colony.time == 0:
+                colony.deploy_ant('tunnel_0_0', 'Thrower')
+                try:
+                    colony.deploy_ant('tunnel_0_0', 'Queen')
+                except AssertionError:
+                    pass  # Two ants in one place
+                self.assertEqual(0, colony.queen_count, error_msg)
+            elif colony.time == 1:
+                colony.deploy_ant('tunnel_0_1', 'Queen')
+        recording = io.StringIO()
+        colony = ants_replay.record(strategy, ants.test_layout,
+                                    ants.make_test_assault_plan, recording,
+                                    seed=1, food=10)
+        colony.simulate()
+        replayed = ants_replay.Replay(io.StringIO(recording.getvalue())).play()
+        for game in (colony, replayed):
+            queens = [a for a in game.ants if isinstance(a, ants.QueenAnt)]
+            self.assertEqual([False], [q.imposter for q in queens], error_msg)
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        hive = ants.Hive(ants.make_insane_assault_plan())
+        self.colony = ants.AntColony(self.strategy, hive, ants.ant_types(),
+                                     ants.mixed_layout, 20, seed=5)
+
+    @staticmethod
+    def strategy(colony):
+        """Deploy or remove an ant at a random place using colony.random."""
+        names = [n for n in colony.places if n != 'Hive']
+        name = colony.random.choice(names)
+        if colony.places[name].ant is not None:
+            colony.remove_ant(name)
+        else:
+            ant_type = colony.random.choice(['Thrower', 'Slow', 'Stun',
+                                             'Queen', 'Wall', 'Hungry'])
+            colony.deploy_ant(name, ant_type)
+
+    def finish(self):
+        """Play the colony to the end and return a summary of its state."""
+        colony = self.colony
+        while not colony.game_over:
+            colony.turn()
+        return (colony.time, colony.food, colony.queen.breached,
+                [(repr(a), a.place.name) for a in colony.ants],
+                [(repr(b), b.effects) for b in colony.bees],
+                colony.queen_count, colony.random.random())
+
+    def test_restore(self):
+        error_msg = 'Restored game did not continue as before'
+        snapshots = []
+        while not self.colony.game_over:
+            snapshots.append(self.colony.snapshot())
+            self.colony.turn()
+        self.colony.random.random()
+        self.colony.queen_count += 1
+        self.colony.restore(snapshots[-1])
+        end = self.finish()
+        self.assertGreater(len(snapshots), 5)
+        for snapshot in reversed(snapshots):
+            self.colony.restore(snapshot)
+            self.assertEqual(end, self.finish(), error_msg)
+
+    def test_effects_restored(self):
+        bee = ants.Bee(3)
+        place = self.colony.places['tunnel_0_4']
+        place.add_insect(bee)
+        snapshot = self.colony.snapshot()
+        ants.apply_effect('stun', bee, 2)
+        bee.action(self.colony)
+        self.colony.restore(snapshot)
+        self.assertEqual({'stun': 0, 'slow': 0}, bee.effects)
+        self.assertIsNone(bee.affected, 'Effect was not removed')
+        bee.action(self.colony)
+        self.assertIs(self.colony.places['tunnel_0_3'], bee.place)
+
+    def test_deploys_undone(self):
+        snapshot = self.colony.snapshot()
+        self.colony.deploy_ant('tunnel_0_0', 'Queen')
+        self.colony.deploy_ant('tunnel_0_1', 'Thrower')
+        self.colony.restore(snapshot)
+        self.assertEqual([], self.colony.ants)
+        self.assertEqual(20, self.colony.food)
+        self.assertEqual(0, self.colony.queen_count)
+        self.colony.deploy_ant('tunnel_0_1', 'Queen')
+        self.assertFalse(self.colony.ants[0].imposter, 'Queen count restored')
+
+    def test_overrides_restored(self):
+        ant = ants.ShortThrower()
+        self.colony.places['tunnel_0_0'].add_insect(ant)
+        snapshot = self.colony.snapshot()
+        ant.max_range = 10
+        self.colony.restore(snapshot)
+        self.assertEqual(2, ant.max_range)
+
+
+class TestSlots(AntTest):
+
+    def test_no_dict(self):
+        error_msg = '{0} has a __dict__'
+        insects = [ant_type() for ant_type in ants.ant_types()]
+        insects += [ants.Bee(3), ants.Place('tunnel'), ants.Water('water'),
+                    self.colony.hive, self.colony.queen]
+        for insect in insects:
+            self.assertFalse(hasattr(insect, '__dict__'),
+                             error_msg.format(type(insect).__name__))
+
+    def test_stats(self):
+        fire, scuba = ants.FireAnt(), ants.ScubaThrower()
+        fire.damage = 5
+        self.assertEqual((5, 3), (fire.damage, ants.FireAnt().damage))
+        self.assertEqual(3, ants.FireAnt.damage)
+        self.assertTrue(scuba.watersafe)
+        self.assertIsNone(scuba.overrides)
+
+
+class TestSwarm(unittest.TestCase):
+
+    def setUp(self):
+        plan = ants.AssaultPlan(swarm=True).add_wave(1, 50)
+        self.colony = ants.AntColony(None, ants.Hive(plan), ants.ant_types(),
+                                     ants.test_layout, seed=0)
+        self.colony.debug = True
+        self.place = self.colony.places['tunnel_0_3']
+        self.swarm = self.colony.hive.bees[0]
+        self.swarm.move_to(self.place)
+
+    def test_group_damage(self):
+        self.place.add_insect(ants.NinjaAnt())
+        self.place.ant.action(self.colony)
+        self.assertEqual([self.swarm], self.place.bees)
+        self.assertEqual(2, self.swarm.armor)
+        self.assertEqual(50, self.colony.bee_count)
+
+    def test_single_out(self):
+        thrower = ants.ThrowerAnt()
+        self.colony.places['tunnel_0_0'].add_insect(thrower)
+        thrower.action(self.colony)
+        self.assertEqual(50, ants.count_bees(self.place.bees))
+        self.assertEqual([1], [b.count for b in self.place.bees if b.armor == 2])
+        self.assertEqual(50, self.colony.bee_count)
+
+    def test_plan_unchanged(self):
+        plan = ants.make_insane_assault_plan().as_swarm()
+        games = []
+        for _ in range(2):
+            colony = ants.AntColony(thrower_strategy, ants.Hive(plan),
+                                    ants.ant_types(), ants.dry_layout, seed=3)
+            colony.simulate()
+            self.assertEqual(34, plan.bee_count)
+            games.append(colony.state())
+        self.assertEqual(games[0], games[1])
+
+    def test_sting_then_move(self):
+        self.place.add_insect(ants.WallAnt())
+        self.swarm.action(self.colony)
+        self.assertIsNone(self.place.ant)
+        self.assertEqual([4], [b.count for b in self.place.bees])
+        exit = self.place.exit
+        self.assertEqual([46], [b.count for b in exit.bees])
+
+    def test_joined(self):
+        self.swarm.split(10)
+        self.place.add_insect(ants.Swarm(3, 5))
+        self.assertEqual(3, len(self.place.bees))
+        self.colony.strategy = lambda colony: None
+        self.colony.turn()
+        self.assertEqual([55], [b.count for b in self.place.exit.bees])
+
+    def test_same_games(self):
+        def strategy(colony):
+            names = [n for n in colony.places if n != 'Hive']
+            name = colony.random.choice(names)
+            if colony.places[name].ant is None:
+                colony.deploy_ant(name, colony.random.choice(
+                    ['Thrower', 'Slow', 'Stun', 'Wall', 'Ninja', 'Fire']))
+        def make_plan():
+            plan = ants.AssaultPlan(3)
+            for time in range(1, 20, 3):
+                plan.add_wave(time, 30)
+            return plan
+        for seed in range(10):
+            games = []
+            for plan in (make_plan(), make_plan().as_swarm()):
+                colony = ants.AntColony(strategy, ants.Hive(plan),
+                                        ants.ant_types(), ants.dry_layout,
+                                        40, seed)
+                colony.simulate()
+                games.append((colony.time, colony.food, colony.bee_count,
+                              colony.queen.breached, repr(colony.ants)))
+            self.assertEqual(games[0], games[1],
+                             'Different outcome with seed {0}'.format(seed))
+
+
+class TestFastForward(unittest.TestCase):
+
+    def setUp(self):
+        plan = ants.AssaultPlan().add_wave(2, 1).add_wave(20, 1)
+        self.colony = ants.AntColony(None, ants.Hive(plan), ants.ant_types(),
+                                     ants.test_layout)
+        self.colony.deploy_ant('tunnel_0_0', 'Harvester')
+        self.colony.strategy = lambda colony: None
+
+    def test_skip_to_wave(self):
+        self.colony.turn()
+        self.assertEqual(1, self.colony.fast_forward())
+        self.assertEqual((2, 4), (self.colony.time, self.colony.food))
+        self.colony.turn()
+        self.assertEqual(0, self.colony.fast_forward(), 'Bee in play')
+
+    def test_watch_food(self):
+        self.colony.watch_food(10)
+        self.colony.watch_food(2)  # Already reached
+        self.colony.places['tunnel_0_0'].ant.action(self.colony)
+        self.colony.time = 3
+        self.assertEqual(7, self.colony.fast_forward())
+        self.assertEqual((10, 10), (self.colony.time, self.colony.food))
+        self.assertEqual(10, self.colony.fast_forward())
+        self.assertEqual((20, 20), (self.colony.time, self.colony.food))
+
+    def test_busy_ants(self):
+        self.colony.time = 3
+        self.colony.deploy_ant('tunnel_0_1', 'Queen')
+        self.assertEqual(0, self.colony.fast_forward(), 'Queen not yet acted')
+        self.colony.places['tunnel_0_1'].ant.action(self.colony)
+        self.assertEqual(17, self.colony.fast_forward())
+
+    def test_same_games(self):
+        def strategy(colony):
+            if colony.time == 0:
+                colony.deploy_ant('tunnel_0_0', 'Harvester')
+            elif colony.bee_count > ants.count_bees(colony.hive.bees):
+                name = colony.random.choice(list(colony.places)[1:])
+                if colony.places[name].ant is None:
+                    colony.deploy_ant(name, colony.random.choice(
+                        ['Thrower', 'Hungry', 'Wall', 'Ninja', 'Bodyguard']))
+        for seed in range(5):
+            games = []
+            for fast_forward in (False, True):
+                plan = ants.AssaultPlan()
+                for time in range(5, 200, 17):
+                    plan.add_wave(time, 2)
+                colony = ants.AntColony(strategy, ants.Hive(plan),
+                                        ants.ant_types(), ants.dry_layout,
+                                        10, seed)
+                colony.simulate(fast_forward)
+                games.append((colony.time, colony.food,
+                              colony.bees_remaining, repr(colony.ants)))
+            self.assertEqual(games[0], games[1])
+
+
+class TestLazyPlan(unittest.TestCase):
+
+    def setUp(self):
+        plan = ants.make_full_assault_plan().as_lazy()
+        self.hive = ants.Hive(plan)
+        self.colony = ants.AntColony(lambda colony: None, self.hive,
+                                     ants.ant_types(), ants.dry_layout)
+        self.colony.debug = True
+
+    def test_waves_made_on_launch(self):
+        self.assertEqual([], self.hive.bees)
+        self.assertEqual(0, self.colony.bee_count)
+        self.assertEqual(15, self.colony.bees_remaining)
+        self.assertFalse(self.colony.game_over)
+        for _ in range(3):
+            self.colony.turn()
+        self.assertEqual(1, self.colony.bee_count)
+        self.assertEqual(14, self.hive.bees_pending)
+        self.assertEqual(15, self.colony.bees_remaining)
+
+    def test_all_bees(self):
+        error_msg = 'A lazy plan should list the bees of its waves'
+        bees = self.hive.assault_plan.all_bees
+        self.assertTrue(all(isinstance(b, ants.Bee) for b in bees), error_msg)
+        eager = ants.make_full_assault_plan().all_bees
+        self.assertEqual(list(map(repr, eager)), list(map(repr, bees)))
+
+    def test_snapshot_pending(self):
+        snapshot = self.colony.snapshot()
+        for _ in range(5):
+            self.colony.turn()
+        self.colony.restore(snapshot)
+        self.assertEqual(15, self.hive.bees_pending)
+        self.assertEqual([], self.colony.bees)
+
+    def test_same_games(self):
+        def strategy(colony):
+            name = colony.random.choice(list(colony.places)[1:])
+            if colony.places[name].ant is None:
+                colony.deploy_ant(name, colony.random.choice(
+                    ['Harvester', 'Thrower', 'Slow', 'Wall', 'Scuba']))
+        for scenario in ('full', 'insane_water'):
+            layout, make_plan = ants.SCENARIOS[scenario]
+            for seed in range(5):
+                games = []
+                for plan in (make_plan(), make_plan().as_lazy()):
+                    colony = ants.AntColony(strategy, ants.Hive(plan),
+                                            ants.ant_types(), layout, 10, seed)
+                    colony.simulate()
+                    games.append((colony.time, colony.food,
+                                  colony.bees_remaining, repr(colony.ants)))
+                self.assertEqual(games[0], games[1])
+
+
+class TestProfiler(unittest.TestCase):
+
+    def play(self, seed, profiler=None):
+        colony = ants.AntColony(thrower_strategy,
+                                ants.Hive(ants.make_insane_assault_plan()),
+                                ants.ant_types(), ants.dry_layout, seed=seed)
+        if profiler is not None:
+            profiler.attach(colony)
+        colony.simulate()
+        return colony
+
+    def test_same_game(self):
+        profiler = ants_profile.Profiler()
+        for seed in range(3):
+            plain, profiled = self.play(seed), self.play(seed, profiler)
+            self.assertEqual((plain.time, plain.bee_count, repr(plain.ants)),
+                             (profiled.time, profiled.bee_count,
+                              repr(profiled.ants)))
+        self.assertGreater(sum(t.bee_actions for t in profiler.turns), 0)
+        self.assertEqual(['Thrower'], list(profiler.ant_types))
+        self.assertEqual(sum(t.ant_actions for t in profiler.turns),
+                         profiler.ant_types['Thrower'][0])
+        self.assertEqual(list(ants_profile.PHASES), list(profiler.totals()))
+
+    def test_detach(self):
+        profiler = ants_profile.Profiler()
+        colony = self.play(0, profiler)
+        turns = len(profiler.turns)
+        self.assertEqual(colony.time, turns)
+        profiler.detach(colony)
+        colony.turn()
+        self.assertEqual(turns, len(profiler.turns))
+
+    def test_export(self):
+        import csv
+        import io
+        import json
+        profiler = ants_profile.Profiler()
+        colony = self.play(1, profiler)
+        out = io.StringIO()
+        profiler.write_json(out)
+        profile = json.loads(out.getvalue())
+        self.assertEqual(colony.time, len(profile['turns']))
+        self.assertEqual(list(range(colony.time)),
+                         [t['time'] for t in profile['turns']])
+        out = io.StringIO()
+        profiler.write_csv(out)
+        rows = list(csv.reader(io.StringIO(out.getvalue())))
+        self.assertEqual(list(ants_profile.TurnProfile._fields), rows[0])
+        self.assertEqual(colony.time + 1, len(rows))
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_script(self):
+        colonies = [ants_benchmark.play(ants.mixed_layout,
+                                        ants.make_full_assault_plan, 3)
+                    for _ in range(2)]
+        self.assertEqual(repr(colonies[0].ants), repr(colonies[1].ants))
+        self.assertGreater(colonies[0].ants_deployed, 0)
+        script = colonies[0].strategy
+        self.assertEqual(['tunnel_0_0', 'tunnel_1_0', 'tunnel_2_0'],
+                         script.places[:3])
+        self.assertNotIn('water_0_2', script.places)
+
+    def test_stress_plan(self):
+        plan = ants_benchmark.make_stress_plan(25, 10)
+        self.assertEqual(25, plan.bee_count)
+        self.assertEqual([3] * 5 + [2] * 5, [len(plan[t]) for t in sorted(plan)])
+
+    def test_scaling(self):
+        results = ants_benchmark.scaling('tunnels', (1, 2), games=1)
+        self.assertEqual([1, 2], list(results))
+        for result in results.values():
+            self.assertEqual(1, result.games)
+            self.assertGreater(result.turns, 0)
+            self.assertGreater(result.peak, 0)
+
+
+class TestDiff(unittest.TestCase):
+
+    def test_engines_agree(self):
+        engines = list(ants_diff.ENGINES)[1:]
+        self.assertEqual([], list(ants_diff.fuzz(engines, range(30), 0)))
+
+    def test_fuzz_case(self):
+        case = ants_diff.fuzz_case(4)
+        self.assertEqual(case, ants_diff.fuzz_case(4))
+        self.assertIn(case.scenario, ants.SCENARIOS)
+        names = ants_diff.place_names(ants.SCENARIOS[case.scenario][0])
+        self.assertTrue(all(move[2] in names for move in case.moves))
+
+    def test_shrink(self):
+        class WeakWalls(ants.AntColony):
+            def deploy_ant(self, place_name, ant_type_name):
+                ants.AntColony.deploy_ant(self, place_name, ant_type_name)
+                ant = self.places[place_name].ant
+                if ant is not None and ant.name == 'Wall':
+                    ant.armor = 3
+        def engine(strategy, plan, layout, food, seed):
+            return WeakWalls(strategy, ants.Hive(plan), ants.ant_types(),
+                             layout, food, seed)
+        ants_diff.ENGINES['weak'] = engine
+        try:
+            found = list(ants_diff.fuzz(['weak'], range(20), 0))
+            self.assertTrue(found)
+            small = ants_diff.shrink(found[0])
+        finally:
+            del ants_diff.ENGINES['weak']
+        self.assertEqual(1, len(small.case.moves))
+        self.assertEqual('Wall', small.case.moves[0][3])
+        self.assertEqual(4, small.case.food)
+        self.assertIn('Wall', ants_diff.describe(small))
+
+
+class TestLayout(unittest.TestCase):
+
+    def places(self, layout):
+        """Return (name, type, exit name, entrance) for each registered place."""
+        registered = []
+        queen = ants.Place('AntQueen')
+        layout(queen, lambda place, entrance: registered.append(
+            (place.name, type(place), place.exit.name, entrance)))
+        return registered
+
+    def test_same_as_fixed_layouts(self):
+        spec = ants_layout.LayoutSpec()
+        self.assertEqual(self.places(ants.dry_layout),
+                         self.places(ants_layout.generate(spec)))
+        self.assertEqual(self.places(ants.mixed_layout),
+                         self.places(ants_layout.generate(spec._replace(moat=3))))
+
+    def test_seeded(self):
+        spec = ants_layout.parse_spec('tunnels=4 length=2-9 branches=3 '
+                                      'levels=3 water=0.2')
+        first = self.places(ants_layout.generate(spec, 8))
+        self.assertEqual(first, self.places(ants_layout.generate(spec, 8)))
+        self.assertNotEqual(first, self.places(ants_layout.generate(spec, 9)))
+
+    def test_tree(self):
+        spec = ants_layout.LayoutSpec(tunnels=2, length=(1, 4), branches=3,
+                                      levels=4, water=0.3)
+        colony = ants.AntColony(None, ants.Hive(ants.AssaultPlan()),
+                                ants.ant_types(), ants_layout.generate(spec))
+        queen = colony.queen.colony_location
+        exits = {}
+        for place in list(colony.places.values())[1:]:
+            exits[place.exit] = exits.get(place.exit, 0) + 1
+            steps = 0
+            while place is not queen:
+                place, steps = place.exit, steps + 1
+            self.assertLessEqual(steps, 16)
+        self.assertEqual(2, exits[queen])
+        self.assertGreater(max(exits.values()), 1, 'No branches')
+        leaves = [p for p in colony.places.values() if p not in exits]
+        self.assertEqual(leaves[1:], colony.bee_entrances)
+        self.assertTrue(any(isinstance(p, ants.Water) for p in leaves))
+
+
+class TestLayoutGraph(unittest.TestCase):
+
+    def colony(self, layout=ants.mixed_layout):
+        return ants.AntColony(None, ants.Hive(ants.make_test_assault_plan()),
+                              ants.ant_types(), layout)
+
+    def test_shared(self):
+        first, second = self.colony(), self.colony()
+        self.assertIs(first.graph, second.graph)
+        self.assertIsNot(first.places['tunnel_0_0'],
+                         second.places['tunnel_0_0'])
+        self.assertEqual(first.graph, pickle.loads(pickle.dumps(first.graph)))
+
+    def test_ids(self):
+        colony = self.colony()
+        graph = colony.graph
+        for i, place in enumerate(colony.places.values()):
+            self.assertEqual(i, place.id)
+            self.assertEqual(i, graph.ids[place.name])
+            self.assertIs(place, colony.find_place(i))
+        self.assertEqual((8, 16, 24), graph.bee_entrances)
+        for place in colony.bee_entrances:
+            self.assertIs(colony.hive, place.entrance)
+        self.assertIs(colony.queen.colony_location,
+                      colony.places['tunnel_0_0'].exit)
+
+    def test_tunnels(self):
+        colony = self.colony(ants_layout.generate(ants_layout.LayoutSpec(
+            tunnels=2, length=(1, 4), branches=3, levels=3)))
+        for tunnel, places in enumerate(colony._tunnels):
+            for depth, place in enumerate(places):
+                self.assertEqual((tunnel, depth), (place.tunnel, place.depth))
+                self.assertEqual(place.entrance is colony.hive,
+                                 depth == len(places) - 1)
+        self.assertIsNone(colony.hive.tunnel)
+
+    def test_deploy_by_id(self):
+        colony = self.colony()
+        colony.food = 10
+        place = colony.places['tunnel_1_3']
+        colony.deploy_ant(place.id, 'Thrower')
+        self.assertEqual('Thrower', place.ant.name)
+        colony.remove_ant(place.id)
+        self.assertIsNone(place.ant)
+
+
+class TestWaveTargets(unittest.TestCase):
+
+    def launch(self, plan, seed=0):
+        """Return the number of bees in each bee entrance of dry_layout after
+        the bees of plan launch at time 1."""
+        colony = ants.AntColony(lambda colony: None, ants.Hive(plan),
+                                ants.ant_types(), ants.dry_layout, seed=seed)
+        colony.time = 1
+        colony.hive.strategy(colony)
+        return [ants.count_bees(p.bees) for p in colony.bee_entrances]
+
+    def test_entrance(self):
+        plan = ants.AssaultPlan().add_wave(1, 3, target=2)
+        self.assertEqual([0, 0, 3], self.launch(plan))
+        self.assertEqual([0, 0, 3], self.launch(plan.as_swarm()))
+        self.assertEqual([0, 0, 3], self.launch(plan.as_lazy()))
+
+    def test_weights(self):
+        plan = ants.AssaultPlan().add_wave(1, 300, target=[1, 0, 2])
+        counts = self.launch(plan.as_swarm())
+        self.assertEqual(0, counts[1])
+        self.assertLess(counts[0], counts[2])
+
+    def test_mixed_wave(self):
+        plan = ants.AssaultPlan().add_wave(1, 2).add_wave(1, 4, target=0)
+        plan.add_wave(1, 1, target=1)
+        self.assertEqual([(2, None), (4, 0), (1, 1)], plan.targets[1])
+        for seed in range(5):
+            counts = self.launch(plan, seed)
+            self.assertEqual(7, sum(counts))
+            self.assertGreaterEqual(counts[0], 4)
+            self.assertGreaterEqual(counts[1], 1)
+        regrouped = plan.as_swarm()
+        self.assertEqual(plan.targets, regrouped.targets)
+        self.assertEqual([2, 4, 1], [bee.count for bee in regrouped[1]])
+
+    def test_invalid(self):
+        plan = ants.AssaultPlan()
+        for target in (True, False, -1, [1, -1, 1], [0, 0, 0]):
+            with self.assertRaises(ValueError):
+                plan.add_wave(1, 2, target=target)
+        self.assertEqual({}, plan)
+        for target in (3, [1, 1], [1, 1, 1, 1]):
+            plan = ants.AssaultPlan().add_wave(1, 2, target=target)
+            with self.assertRaises(ValueError):
+                self.launch(plan)
+            with self.assertRaises(ValueError):
+                self.launch(plan.as_swarm())
+            if ants_numpy is not None:
+                with self.assertRaises(ValueError):
+                    ants_numpy.ArrayColony(None, ants.Hive(plan),
+                                           ants.ant_types(), ants.dry_layout)
+        self.assertEqual([0, 0, 2], self.launch(
+            ants.AssaultPlan().add_wave(1, 2, target=[0, 0, 1])))
+
+    def test_untargeted(self):
+        plan = ants.make_full_assault_plan().add_wave(20, 2, target=None)
+        self.assertEqual({}, plan.targets)
+        self.assertEqual({}, plan.as_lazy().targets)
+
+
+class TestEffectData(AntTest):
+
+    def setUp(self):
+        AntTest.setUp(self)
+        self.bee = ants.Bee(3)
+        self.colony.places['tunnel_0_4'].add_insect(self.bee)
+
+    def moves(self, bee, turns):
+        """Return the places of bee after each of turns actions."""
+        places = []
+        for _ in range(turns):
+            bee.action(self.colony)
+            self.colony.time += 1
+            places.append(bee.place.name)
+        return places
+
+    def test_stun_then_slow(self):
+        ants.apply_effect('slow', self.bee, 3)
+        ants.apply_effect('stun', self.bee, 1)
+        self.assertEqual(['tunnel_0_4', 'tunnel_0_4', 'tunnel_0_3',
+                          'tunnel_0_2', 'tunnel_0_1'], self.moves(self.bee, 5))
+        self.assertIsNone(self.bee.effect)
+        self.assertEqual({'stun': 0, 'slow': 0}, self.bee.effects)
+
+    def test_reapplied(self):
+        ants.apply_effect('stun', self.bee, 2)
+        self.moves(self.bee, 1)
+        ants.apply_effect('stun', self.bee, 2)
+        self.assertEqual(2, self.bee.stun)
+        self.assertEqual(['tunnel_0_4', 'tunnel_0_4', 'tunnel_0_3'],
+                         self.moves(self.bee, 3))
+
+    def test_pickled(self):
+        ants.apply_effect('slow', self.bee, 3)
+        copy = pickle.loads(pickle.dumps(self.bee))
+        self.assertEqual(('slow', self.bee.effects), (copy.effect, copy.effects))
+        self.colony.places['tunnel_0_6'].add_insect(copy)
+        self.assertEqual(['tunnel_0_3', 'tunnel_0_3', 'tunnel_0_2'],
+                         self.moves(self.bee, 3))
+        self.colony.time = 0
+        self.assertEqual(['tunnel_0_5', 'tunnel_0_5', 'tunnel_0_4'],
+                         self.moves(copy, 3))
+
+
+class TestStateHash(unittest.TestCase):
+
+    def colony(self, plan):
+        colony = ants.AntColony(TestSnapshot.strategy, ants.Hive(plan),
+                                ants.ant_types(), ants.mixed_layout, 20, 3)
+        colony.debug = True  # Check the incremental hash on each update
+        return colony
+
+    def hashes(self, colony):
+        hashes = []
+        while not colony.game_over:
+            colony.turn()
+            hashes.append(colony.state_hash())
+        return hashes
+
+    def test_same_positions(self):
+        plan = ants.make_insane_assault_plan()
+        hashes = self.hashes(self.colony(plan))
+        self.assertGreater(len(set(hashes)), len(hashes) // 2)
+        self.assertEqual(hashes, self.hashes(self.colony(plan.as_swarm())))
+        self.assertEqual(hashes, self.hashes(self.colony(plan.as_lazy())))
+
+    def test_changes(self):
+        colony = self.colony(ants.make_full_assault_plan())
+        colony.food = 10
+        start = colony.state_hash()
+        colony.deploy_ant('tunnel_0_3', 'Wall')
+        deployed = colony.state_hash()
+        self.assertNotEqual(start, deployed)
+        colony.places['tunnel_0_3'].ant.reduce_armor(1)
+        self.assertNotEqual(deployed, colony.state_hash())
+        colony.remove_ant('tunnel_0_3')
+        colony.food += 4
+        self.assertEqual(start, colony.state_hash())
+
+    def test_restored(self):
+        colony = self.colony(ants.make_full_assault_plan())
+        for _ in range(4):
+            colony.turn()
+        snapshot, start = colony.snapshot(), colony.state_hash()
+        later = self.hashes(colony)
+        colony.restore(snapshot)
+        self.assertEqual(start, colony.state_hash())
+        self.assertEqual(later, self.hashes(colony))
+
+    def test_table(self):
+        table = ants.TranspositionTable(capacity=3)
+        for key in range(5):
+            table[key] = str(key)
+        self.assertEqual([2, 3, 4], [k for k in range(5) if k in table])
+        table.get(2)
+        table[5] = '5'
+        self.assertEqual([2, 4, 5], [k for k in range(6) if k in table])
+        calls = []
+        def evaluate(colony):
+            calls.append(colony.time)
+            return colony.food
+        colony = self.colony(ants.make_full_assault_plan())
+        snapshot = colony.snapshot()
+        for _ in range(2):
+            self.assertEqual(20, table.lookup(colony, evaluate))
+            colony.turn()
+            colony.restore(snapshot)
+        self.assertEqual([0], calls)
+
+
+class TestMCTS(unittest.TestCase):
+
+    def colony(self, strategy, scenario='full', seed=5):
+        layout, make_plan = ants.SCENARIOS[scenario]
+        return ants.AntColony(strategy, ants.Hive(make_plan()),
+                              ants.ant_types(), layout, seed=seed)
+
+    def play(self, colony, turns=None):
+        states = []
+        while not colony.game_over and len(states) != turns:
+            colony.turn()
+            states.append(colony.state())
+        return states
+
+    def test_pickled(self):
+        colony = ants.AntColony(TestSnapshot.strategy,
+                                ants.Hive(ants.make_full_assault_plan()),
+                                ants.ant_types(), ants_benchmark.long_layout,
+                                seed=2)
+        colony.subscribe(ants.Move, lambda event: None)
+        for _ in range(3):
+            colony.turn()
+        copy = pickle.loads(pickle.dumps(colony))
+        self.assertIsNone(copy.strategy)
+        self.assertEqual({}, copy.listeners)
+        place = copy.places['tunnel_1_7']
+        self.assertIs(copy.places['tunnel_1_6'], place.exit)
+        self.assertIs(place, copy.places['tunnel_1_8'].exit)
+        copy.strategy = colony.strategy
+        self.assertEqual(self.play(colony, 20), self.play(copy, 20))
+
+    def test_legal_moves(self):
+        colony = self.colony(None, 'water')
+        colony.food = 8
+        colony.deploy_ant('tunnel_0_0', 'Thrower')
+        moves = ants_mcts.legal_moves(colony)
+        self.assertIsNone(moves[0])
+        self.assertIn(('remove', 1), moves)
+        self.assertIn(('deploy', 1, 'Bodyguard'), moves)
+        self.assertNotIn(('deploy', 1, 'Harvester'), moves)
+        water = colony.places['water_0_2'].id
+        self.assertNotIn(('deploy', water, 'Harvester'), moves)
+        colony.food = 5
+        self.assertIn(('deploy', water, 'Scuba'),
+                      ants_mcts.legal_moves(colony))
+        for move in ants_mcts.legal_moves(colony)[1:]:
+            self.assertNotIn(move[-1], ('Remover', 'Stun'))
+
+    def test_same_search(self):
+        moves = []
+        for _ in range(2):
+            strategy = ants_mcts.MCTS(rollouts=40, seed=7)
+            self.play(self.colony(strategy))
+            moves.append([report.move for report in strategy.reports])
+        self.assertEqual(moves[0], moves[1])
+        self.assertTrue(all(r.rollouts == 40 for r in strategy.reports))
+
+    def test_real_game(self):
+        strategy = ants_mcts.MCTS(rollouts=20, seed=1, table=100)
+        def search(colony):
+            before = colony.state()
+            move = strategy.choose(colony)
+            self.assertEqual(before, colony.state())
+            ants_mcts.play_move(colony, move)
+        states = self.play(self.colony(search))
+        moves = dict((r.time, r.move) for r in strategy.reports)
+        def replay(colony):
+            ants_mcts.play_move(colony, moves[colony.time])
+        self.assertEqual(states, self.play(self.colony(replay)))
+
+    def test_workers(self):
+        strategy = ants_mcts.MCTS(workers=2, rollouts=10, seed=3)
+        try:
+            colony = self.colony(strategy)
+            colony.turn()
+            colony.turn()
+        finally:
+            strategy.close()
+        self.assertEqual([20, 20], [r.rollouts for r in strategy.reports])
+        self.assertGreater(strategy.rollouts_per_second, 0)
+        self.assertIn('2 turns searched with 40 rollouts', strategy.report())
+
+    def test_swarm_outcome(self):
+        plan = ants.AssaultPlan(swarm=True).add_wave(1, 50)
+        values = []
+        def outcome(colony):
+            values.append(ants_mcts.outcome(colony))
+        strategy = ants_mcts.MCTS(rollouts=30, seed=2, playout=outcome)
+        colony = ants.AntColony(strategy, ants.Hive(plan), ants.ant_types(),
+                                ants.dry_layout, seed=3)
+        for _ in range(4):
+            colony.turn()
+        self.assertEqual(50, colony.bee_total)
+        self.assertTrue(values)
+        self.assertTrue(all(0 <= value <= 1 for value in values))
+        self.assertTrue(all(0 <= r.value <= 1 for r in strategy.reports))
+
+    def test_queen_outcome(self):
+        error_msg = 'Bees at the QueenAnt were counted twice'
+        def strategy(colony):
+            if colony.time == 0:
+                colony.deploy_ant('tunnel_0_6', 'Queen')
+        plan = ants.AssaultPlan().add_wave(1, 2, target=0)
+        colony = ants.AntColony(strategy, ants.Hive(plan), ants.ant_types(),
+                                ants.test_layout, seed=0)
+        colony.simulate()
+        self.assertTrue(colony.queen.breached)
+        self.assertEqual(2, colony.bees_remaining)
+        self.assertEqual(0.0, ants_mcts.outcome(colony), error_msg)
+
+    def test_wins(self):
+        strategy = ants_mcts.MCTS(rollouts=200, seed=0)
+        result = ants.play_game(ants.test_layout, ants.make_test_assault_plan,
+                                strategy, seed=4)
+        self.assertEqual('ants', result.winner)
+        self.assertEqual(result.turns, len(strategy.reports))
+
+
+@unittest.skipIf(ants_numpy is None, 'NumPy is not installed')
+class TestArrayColony(unittest.TestCase):
+
+    @staticmethod
+    def strategy(colony):
+        """Deploy and remove ants of every type at random places."""
+        names = [n for n in colony.places if n != 'Hive']
+        for _ in range(colony.random.randrange(3)):
+            name = colony.random.choice(names)
+            if colony.places[name].ant is not None and \
+                    colony.random.random() < 0.2:
+                colony.remove_ant(name)
+            else:
+                try:
+                    colony.deploy_ant(name, colony.random.choice(
+                        list(colony.ant_types)))
+                except AssertionError:
+                    pass  # Two ants in one place
+
+    def play(self, engine, layout, make_plan, seed, food):
+        colony = engine(self.strategy, ants.Hive(make_plan()),
+                        ants.ant_types(), layout, food, seed)
+        try:
+            colony.simulate()
+        except AssertionError:
+            return 'error'
+        breached = engine is ants.AntColony and colony.queen.breached or \
+            engine is not ants.AntColony and colony.breached
+        return (colony.time, colony.food, breached, colony.ants_deployed,
+                colony.ants_removed,
+                [(a.name, a.armor) for a in colony.ants])
+
+    def assertSameGames(self, layout, make_plan, seeds, food):
+        for seed in seeds:
+            args = (layout, make_plan, seed, food)
+            self.assertEqual(self.play(ants.AntColony, *args),
+                             self.play(ants_numpy.ArrayColony, *args),
+                             'Different outcome with seed {0}'.format(seed))
+
+    def test_scenarios(self):
+        for layout, make_plan in ants.SCENARIOS.values():
+            self.assertSameGames(layout, make_plan, range(20), 30)
+
+    def test_thousands_of_bees(self):
+        def make_plan():
+            plan = ants.AssaultPlan(2)
+            for time in range(1, 11):
+                plan.add_wave(time, 200)
+            return plan
+        self.assertSameGames(ants.mixed_layout, make_plan, range(5), 200)
+
+    def test_wave_targets(self):
+        def make_plan():
+            plan = ants.AssaultPlan(2)
+            for time in range(1, 11):
+                plan.add_wave(time, 3).add_wave(time, 2, target=time % 3)
+                plan.add_wave(time, 4, target=[time, 1, 0])
+            return plan
+        self.assertSameGames(ants.mixed_layout, make_plan, range(10), 30)
+
+    def test_places(self):
+        hive = ants.Hive(ants.make_test_assault_plan())
+        colony = ants_numpy.ArrayColony(None, hive, ants.ant_types(),
+                                        ants.test_layout, food=8)
+        colony.deploy_ant('tunnel_0_1', 'Thrower')
+        colony.deploy_ant('tunnel_0_1', 'Bodyguard')
+        place = colony.places['tunnel_0_1']
+        self.assertEqual(['Hive'] + ['tunnel_0_' + str(i) for i in range(8)],
+                         list(colony.places))
+        self.assertEqual('Bodyguard', place.ant.name)
+        self.assertEqual('Thrower', place.ant.ant.name)
+        self.assertIs(colony.places['tunnel_0_0'], place.exit)
+        self.assertEqual([], place.bees)
+        self.assertEqual(2, colony.bee_count)
+
+    def test_snapshot(self):
+        hive = ants.Hive(ants.make_insane_assault_plan())
+        colony = ants_numpy.ArrayColony(self.strategy, hive, ants.ant_types(),
+                                        ants.dry_layout, 20, seed=2)
+        for _ in range(5):
+            colony.turn()
+        snapshot = colony.snapshot()
+        colony.simulate()
+        end = (colony.time, colony.food, colony.ants)
+        colony.restore(snapshot)
+        colony.simulate()
+        self.assertEqual(end, (colony.time, colony.food, colony.ants))
+
+    def test_unsupported(self):
+        class Lazy(ants.Ant):
+            name = 'Lazy'
+            implemented = False  # Keep it out of ant_types
+            def action(self, colony):
+                colony.food -= 1
+        hive = ants.Hive(ants.make_test_assault_plan())
+        self.assertRaises(ValueError, ants_numpy.ArrayColony, None, hive,
+                          [Lazy], ants.test_layout)
+
+
+@unittest.skipIf(ants_numpy is None, 'NumPy is not installed')
+class TestColonyBatch(unittest.TestCase):
+
+    def test_same_as_colonies(self):
+        seeds = list(range(12))
+        for layout, make_plan in ants.SCENARIOS.values():
+            batch = ants_numpy.ColonyBatch(len(seeds), layout, make_plan,
+                                           food=30, seeds=seeds)
+            rng = random.Random(0)
+            places, kinds = len(batch.place_names), len(batch.kinds)
+            actions = [[(rng.randrange(places), rng.randrange(-kinds, kinds))
+                        for _ in seeds] for _ in range(100)]
+            ended = [None] * len(seeds)
+            while not batch.done.all():
+                obs = batch.step(*zip(*actions[batch.time]))
+                for i in range(len(seeds)):
+                    if obs.done[i] and ended[i] is None:
+                        ended[i] = (batch.time, int(obs.food[i]),
+                                    bool(batch.breached[i]),
+                                    obs.ants[i].tolist())
+            for i, seed in enumerate(seeds):
+                def strategy(colony):
+                    place, kind = actions[colony.time][i]
+                    if kind >= 0:
+                        try:
+                            colony.deploy_ant(batch.place_names[place],
+                                              batch.kinds[kind].name)
+                        except AssertionError:
+                            pass  # Two ants in one place
+                colony = ants.AntColony(strategy, ants.Hive(make_plan()),
+                                        ants.ant_types(), layout, 30, seed)
+                try:
+                    colony.simulate()
+                except AssertionError:
+                    continue  # A contained ant expired
+                codes = dict((kind.name, code) for code, kind in
+                             enumerate(batch.kinds))
+                placed = [colony.places[name].ant for name in batch.place_names]
+                self.assertEqual((colony.time, colony.food,
+                                  colony.queen.breached,
+                                  [-1 if ant is None else codes[ant.name]
+                                   for ant in placed]),
+                                 ended[i],
+                                 'Different outcome with seed {0}'.format(seed))
+
+    def test_observations(self):
+        batch = ants_numpy.ColonyBatch(5, ants.mixed_layout,
+                                       ants.make_test_assault_plan, seed=1)
+        obs = batch.reset()
+        places = len(batch.place_names)
+        self.assertEqual((5, places), obs.ants.shape)
+        self.assertEqual((5, places), obs.bee_counts.shape)
+        self.assertEqual([4] * 5, obs.food.tolist())
+        harvester = list(batch.ant_types).index('Harvester')
+        obs = batch.step([0] * 5, [harvester, -1, -1, -1, -1])
+        self.assertEqual([3, 4, 4, 4, 4], obs.food.tolist())
+        self.assertEqual(harvester, obs.ants[0, 0])
+        while not obs.done.all():
+            obs = batch.step([0] * 5, [-1] * 5)
+        self.assertTrue(batch.breached[1:].all())
+        self.assertEqual(3 * obs.bee_counts.sum(), obs.bee_armor.sum())
+
+
 @main
 def main(*args):
     import argparse
@@ -654,6 +2056,14 @@ def main(*args):
     parser.add_argument('--verbose', '-v', action='store_true')
     args = parser.parse_args()
     doctest.testmod(ants, verbose=args.verbose)
+    doctest.testmod(ants_tournament, verbose=args.verbose)
+    doctest.testmod(ants_replay, verbose=args.verbose)
+    doctest.testmod(ants_profile, verbose=args.verbose)
+    doctest.testmod(ants_diff, verbose=args.verbose)
+    doctest.testmod(ants_layout, verbose=args.verbose)
+    doctest.testmod(ants_mcts, verbose=args.verbose)
+    if ants_numpy is not None:
+        doctest.testmod(ants_numpy, verbose=args.verbose)
     stdout = sys.stdout
     with open(os.devnull, 'w') as sys.stdout:
         verbosity = 2 if args.verbose else 1